@@ -1,17 +1,19 @@
 # pylint: disable=missing-docstring,comparison-with-callable
 import argparse
 import datetime as dt
+import hashlib
 import io
 import json as jsonlib
 import os
 import shlex
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Any, Callable, Iterable, Sequence
+from typing import Any, Callable, Sequence
 from unittest import mock
 from zoneinfo import ZoneInfo
 
 import gbpcli
+import requests
 import rich.console
 from ariadne import graphql_sync
 from django.test.client import RequestFactory
@@ -26,6 +28,7 @@
 from gentoo_build_publisher.cli import apikey
 from gentoo_build_publisher.graphql import schema
 from gentoo_build_publisher.jenkins import (
+    ArtifactStream,
     Jenkins,
     JenkinsConfig,
     JenkinsMetadata,
@@ -64,18 +67,30 @@ def __init__(self, config: JenkinsConfig):
 
         self.artifact_builder = ArtifactFactory()
         self.scheduled_builds: list[tuple[str, dict[str, Any]]] = []
-        mock_jenkins_session = mock.MagicMock(wraps=MockJenkinsSession())
+        self.jenkins_session = MockJenkinsSession()
+        mock_jenkins_session = mock.MagicMock(wraps=self.jenkins_session)
         mock_jenkins_session.auth = config.auth
         self.session = mock_jenkins_session
         self.root = mock_jenkins_session.root
 
-    def download_artifact(self, build: Build) -> Iterable[bytes]:
-        with mock.patch.object(self.session, "get") as mock_get:
-            mock_get.return_value.iter_content.side_effect = (
-                lambda *args, **kwargs: self.artifact_builder.get_artifact(build)
-            )
-            self.mock_get = mock_get
-            return super().download_artifact(build)
+    def download_artifact(
+        self, build: Build, *, start: int = 0, validator: str | None = None
+    ) -> ArtifactStream:
+        artifacts = self.jenkins_session.artifacts
+        path = self.url.artifact(build).path
+
+        # Resumed downloads need the same artifact as the download they resume
+        if not start or path not in artifacts:
+            artifacts[path] = self.artifact_builder.get_artifact(build).getvalue()
+
+        self.mock_get = self.session.get
+        return super().download_artifact(build, start=start, validator=validator)
+
+    def artifact_sha256(self, build: Build) -> str:
+        """Return the SHA-256 digest of the artifact last served for the build"""
+        artifact = self.jenkins_session.artifacts[self.url.artifact(build).path]
+
+        return hashlib.sha256(artifact).hexdigest()
 
     def get_logs(self, build: Build) -> str:
         with mock.patch.object(self.session, "get") as mock_get:
@@ -102,6 +117,16 @@ def __init__(self) -> None:
         self.root = Tree()
         self.responses: dict[tuple[str, str], Response] = {}
 
+        # Artifacts served, by URL path. Range requests are honored if range_support
+        self.artifacts: dict[str, bytes] = {}
+        self.range_support = True
+
+        # For each artifact response, the bytes sent before the connection drops
+        self.disconnects: list[int] = []
+
+        # Whether a "<artifact>.sha256" checksum is published next to each artifact
+        self.checksums = True
+
     @staticmethod
     def response(status_code: int, content: bytes = b"") -> Response:
         response: Response = mock.MagicMock(wraps=Response)()
@@ -115,6 +140,14 @@ def mock_response(self, method: str, path: str, response: Response) -> None:
 
     def head(self, url: str, *args: Any, **kwargs: Any) -> Response:
         path = URL(url).path
+
+        if (artifact := self.artifacts.get(path)) is not None:
+            response = Response()
+            response.status_code = 200
+            response.headers["ETag"] = self.etag(artifact)
+
+            return response
+
         project_path = self.project_path(path)
 
         try:
@@ -154,6 +187,12 @@ def get(self, url: str, *args, **kwargs) -> Response:
         if response := self.responses.get(("GET", url_obj.path)):
             return response
 
+        if (artifact := self.artifacts.get(url_obj.path)) is not None:
+            return self.artifact_response(artifact, kwargs.get("headers") or {})
+
+        if url_obj.suffix == ".sha256":
+            return self.checksum_response(url_obj.path.removesuffix(".sha256"))
+
         if url_obj.name != "config.xml":
             return self.response(400)
 
@@ -169,6 +208,71 @@ def get(self, url: str, *args, **kwargs) -> Response:
     def project_path(self, url_path: str) -> ProjectPath:
         return ProjectPath("/".join(url_path.split("/job/")))
 
+    @staticmethod
+    def etag(artifact: bytes) -> str:
+        return f'"{hashlib.sha256(artifact).hexdigest()[:16]}"'
+
+    def artifact_response(self, artifact: bytes, headers: dict[str, str]) -> Response:
+        status_code = 200
+        etag = self.etag(artifact)
+
+        if (
+            self.range_support
+            and (byte_range := headers.get("Range"))
+            and headers.get("If-Range", etag) == etag
+        ):
+            start = int(byte_range.removeprefix("bytes=").removesuffix("-"))
+
+            if start >= len(artifact):
+                return self.response(416)
+
+            artifact = artifact[start:]
+            status_code = 206
+
+        response = Response()
+        response.status_code = status_code
+        response.headers["ETag"] = etag
+        response.raw = DisconnectingStream(
+            artifact, self.disconnects.pop(0) if self.disconnects else None
+        )
+
+        return response
+
+    def checksum_response(self, artifact_path: str) -> Response:
+        artifact = self.artifacts.get(artifact_path)
+
+        if artifact is None or not self.checksums:
+            return self.response(404)
+
+        name = artifact_path.rpartition("/")[2]
+        response = Response()
+        response.status_code = 200
+        response.encoding = "utf-8"
+        response._content = (  # pylint: disable=protected-access
+            f"{hashlib.sha256(artifact).hexdigest()}  {name}\n".encode()
+        )
+
+        return response
+
+
+class DisconnectingStream(io.BytesIO):
+    """BytesIO that drops the "connection" after the given number of bytes are read"""
+
+    def __init__(self, content: bytes, limit: int | None = None) -> None:
+        super().__init__(content)
+        self.limit = limit
+
+    def read(self, size: int | None = -1) -> bytes:
+        if self.limit is None:
+            return super().read(size)
+
+        if (remaining := self.limit - self.tell()) <= 0:
+            raise requests.exceptions.ConnectionError("Connection reset by peer")
+
+        return super().read(
+            remaining if size is None or size < 0 else min(size, remaining)
+        )
+
 
 class Tree:
     """Simple tree structure"""
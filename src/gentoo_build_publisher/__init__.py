@@ -63,7 +63,10 @@
         "orphans": "gentoo_build_publisher.checks:orphans",
         "inconsistent_tags": "gentoo_build_publisher.checks:inconsistent_tags",
         "dirty_temp": "gentoo_build_publisher.checks:dirty_temp",
+        "trash_backlog": "gentoo_build_publisher.checks:trash_backlog",
         "corrupt_gbp_json": "gentoo_build_publisher.checks:corrupt_gbp_json",
+        "orphaned_objects": "gentoo_build_publisher.checks:orphaned_objects",
+        "artifact_cache": "gentoo_build_publisher.checks:artifact_cache",
     },
     "priority": 0,
     "link": "https://github.com/enku/gentoo-build-publisher",
@@ -16,19 +16,25 @@
 Storage and Record are removed.
 """
 
+import itertools
 import logging
 import math
 import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import UTC, datetime
-from difflib import Differ
-from typing import Any, Iterable, Self
+from typing import Any, Callable, Iterable, Iterator, Self
 
-from gentoo_build_publisher.jenkins import Jenkins, JenkinsMetadata
+from gentoo_build_publisher.jenkins import (
+    ArtifactChangedError,
+    Jenkins,
+    JenkinsMetadata,
+)
 from gentoo_build_publisher.machines import MachineInfo
 from gentoo_build_publisher.records import BuildRecord, RecordNotFound, Repo
 from gentoo_build_publisher.settings import Settings
 from gentoo_build_publisher.signals import dispatcher
-from gentoo_build_publisher.storage import Storage
+from gentoo_build_publisher.storage import Storage, StreamExtractError
 from gentoo_build_publisher.types import (
     TAG_SYM,
     Build,
@@ -36,13 +42,17 @@
     ChangeState,
     GBPMetadata,
     Package,
+    PackageHistory,
     PackageMetadata,
 )
-from gentoo_build_publisher.utils.time import utctime
+from gentoo_build_publisher.utils.time import StageTimer, utctime
 
 logger = logging.getLogger(__name__)
 
 TAGGED_PLUS_OR_MINUS_N = re.compile(r"(.+|)?([+-])(\d+$)")
+LINK_DEST_TAGS = ("", "stable")
+LINK_DEST_RECENT = 3
+DELTA_CHAIN_MAX = 8
 
 
 class BuildPublisher:  # pylint: disable=too-many-public-methods
@@ -155,12 +165,10 @@ def resolve_tag(self, tag_name: str) -> BuildRecord | None:
 
         if match := TAGGED_PLUS_OR_MINUS_N.match(tag):
             tag, sign, offset = match.groups()
-            adjacent = records.next if sign == "+" else records.previous
+            nth = records.nth_next if sign == "+" else records.nth_previous
 
-            if record := self.resolve_tag(f"{machine}{TAG_SYM}{tag}"):
-                for _ in range(int(offset)):
-                    if (record := adjacent(record)) is None:
-                        break
+            if (record := self.resolve_tag(f"{machine}{TAG_SYM}{tag}")) and int(offset):
+                record = nth(record, int(offset))
             return record
 
         try:
@@ -172,7 +180,7 @@ def published(self, build: Build) -> bool:
         """Return True if this Build is published"""
         return self.storage.published(build)
 
-    def pull(
+    def pull(  # pylint: disable=too-many-locals
         self,
         build: Build,
         *,
@@ -197,18 +205,56 @@ def pull(
         # and b) may get deleted if the pull fails
         dispatcher.emit("prepull", build=Build(build.machine, build.build_id))
 
-        self.storage.extract_artifact(
-            build,
-            self.jenkins.download_artifact(build),
-            self.repo.build_records.previous(record),
-        )
+        link_dests = self.link_dests(record)
+        timer = StageTimer()
 
-        logger.info("Pulled build %s", build)
+        def fetch[T](stage: str, func: Callable[[Build], T]) -> T:
+            with timer(stage):
+                return func(build)
 
-        for tag in tags or []:
-            self.tag(build, tag)
+        # A cached artifact, from a failed pull, is extracted instead of downloading,
+        # unless Jenkins has since replaced it
+        cache = self.storage.artifact_cache
+        cached = (
+            build in cache
+            and cache.get(build, self.jenkins.get_artifact_validator(build)) is not None
+        )
+        byte_stream: Iterable[bytes] = () if cached else self.download_artifact(build)
+        checksum = self.jenkins.get_artifact_checksum(build)
 
-        record, packages, gbp_metadata = self._update_build_metadata(record)
+        # The Jenkins metadata and logs are fetched while the artifact is downloaded
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            jenkins_metadata = executor.submit(
+                fetch, "metadata", self.jenkins.get_metadata
+            )
+            logs = executor.submit(fetch, "logs", self.jenkins.get_logs)
+
+            try:
+                digest = self.storage.extract_artifact(
+                    build, byte_stream, link_dests, timer=timer, checksum=checksum
+                )
+            except StreamExtractError:
+                logger.warning("Streaming extract of %s failed. Using temp file", build)
+                byte_stream = self.download_artifact(build, stream=False)
+                digest = self.storage.extract_artifact(
+                    build,
+                    byte_stream,
+                    link_dests,
+                    stream=False,
+                    timer=timer,
+                    checksum=checksum,
+                )
+
+            for tag in tags or []:
+                self.tag(build, tag)
+
+            with timer("record"):
+                record, packages, gbp_metadata = self._update_build_metadata(
+                    record, jenkins_metadata.result(), logs.result(), digest
+                )
+
+        self.storage.artifact_cache.discard(build)
+        logger.info("Pulled build %s (%s)", build, timer)
 
         dispatcher.emit(
             "postpull", build=record, packages=packages, gbp_metadata=gbp_metadata
@@ -216,14 +262,71 @@ def pull(
 
         return True
 
+    def download_artifact(
+        self, build: Build, *, stream: bool | None = None
+    ) -> Iterable[bytes]:
+        """Download the build's artifact, resuming the download of its partial artifact
+
+        If the artifact has changed since the partial artifact was downloaded, the
+        partial artifact is discarded and the artifact is downloaded from the start.
+        """
+        start = self.storage.download_offset(build, stream=stream)
+        validator = self.storage.download_validator(build) if start else None
+
+        try:
+            return self.jenkins.download_artifact(
+                build, start=start, validator=validator
+            )
+        except ArtifactChangedError:
+            logger.warning("Artifact of %s has changed. Downloading it again", build)
+            self.storage.discard_partial_artifact(build)
+
+            return self.jenkins.download_artifact(build)
+
+    def link_dests(self, record: BuildRecord) -> list[Build]:
+        """Return the builds, in order of preference, to hard link the record's files from
+
+        These are: the previous completed build, the published build, the builds tagged
+        with LINK_DEST_TAGS, and then the LINK_DEST_RECENT most recent completed builds
+        of the record's machine. Only pulled builds are included.
+        """
+        machine = record.machine
+        records = self.repo.build_records
+        candidates: list[Build | None] = [records.previous(record)]
+
+        for tag in LINK_DEST_TAGS:
+            try:
+                candidates.append(self.storage.resolve_tag(f"{machine}{TAG_SYM}{tag}"))
+            except FileNotFoundError:
+                pass
+
+        candidates.extend(records.recent(machine, LINK_DEST_RECENT))
+
+        link_dests: dict[str, Build] = {}
+        for candidate in candidates:
+            if candidate is None or candidate.id in (record.id, *link_dests):
+                continue
+            if self.storage.pulled(candidate):
+                link_dests[candidate.id] = Build(candidate.machine, candidate.build_id)
+
+        return list(link_dests.values())
+
     def _update_build_metadata(
-        self, record: BuildRecord
+        self,
+        record: BuildRecord,
+        jenkins_metadata: JenkinsMetadata | None = None,
+        logs: str | None = None,
+        artifact_sha256: str | None = None,
     ) -> tuple[BuildRecord, list[Package] | None, GBPMetadata | None]:
         packages: list[Package] | None = None
         gbp_metadata: GBPMetadata | None = None
-        jenkins_metadata = self.jenkins.get_metadata(record)
+
+        if jenkins_metadata is None:
+            jenkins_metadata = self.jenkins.get_metadata(record)
+        if logs is None:
+            logs = self.jenkins.get_logs(record)
+
         built = utctime(datetime.fromtimestamp(jenkins_metadata.timestamp / 1000, UTC))
-        logs = self.jenkins.get_logs(record)
         record = self.save(record, logs=logs, completed=utctime(), built=built)
 
         try:
@@ -231,26 +334,50 @@ def _update_build_metadata(
         except LookupError:
             pass
         else:
-            gbp_metadata = self.gbp_metadata(jenkins_metadata, packages)
+            gbp_metadata = self.gbp_metadata(
+                jenkins_metadata, packages, artifact_sha256=artifact_sha256
+            )
             self.storage.set_metadata(record, gbp_metadata)
+            self._save_delta(record)
 
         return record, packages, gbp_metadata
 
+    def _save_delta(self, record: BuildRecord) -> None:
+        """Save the record's package delta against its previous build, if pulled"""
+        previous = self.repo.build_records.previous(record)
+
+        if previous is None or not self.storage.pulled(previous):
+            return
+
+        try:
+            changes = list(self._compare_packages(previous, record))
+            self.storage.set_delta(record, previous, changes)
+        except LookupError:
+            logger.warning("Could not save package delta of build %s", record)
+
     def pulled(self, build: Build) -> bool:
         """Return true if the Build has been pulled"""
         return self.storage.pulled(build) and self.record(build).completed is not None
 
-    def delete(self, build: Build) -> None:
-        """Delete this build"""
+    def delete(self, build: Build, *, keep_partial: bool = False) -> None:
+        """Delete this build
+
+        If `keep_partial` is True, the build's partially downloaded artifact is kept so
+        that pulling the build again resumes the download.
+        """
         dispatcher.emit("predelete", build=build)
         self.repo.build_records.delete(build)
-        self.storage.delete(build)
+        self.storage.delete(build, keep_partial=keep_partial)
         dispatcher.emit("postdelete", build=build)
 
     def get_packages(self, build: Build) -> list[Package]:
         """Return the list of packages for this build"""
         return self.storage.get_packages(build)
 
+    def get_package(self, build: Build, cpv: str, build_id: int) -> Package:
+        """Return the build's package with the given cpv and (binpkg) build_id"""
+        return self.storage.get_package(build, cpv, build_id)
+
     def schedule_build(self, machine: str, **params: Any) -> str | None:
         """Schedule a build on jenkins for the given machine name"""
         return self.jenkins.schedule_build(machine, **params)
@@ -260,20 +387,202 @@ def search(self, machine: str, field: str, key: str) -> list[BuildRecord]:
         return list(self.repo.build_records.search(machine, field, key))
 
     def diff_binpkgs(self, left: Build, right: Build) -> Iterable[Change]:
-        """Compare two package's binpkgs and generate the differences"""
+        """Compare two package's binpkgs and generate the differences
+
+        Packages are compared by their cpvb and changes are generated in cpvb order.
+
+        Each pulled build stores its package delta against its previous build. If these
+        chain from one build to the other within DELTA_CHAIN_MAX steps, the diff is
+        composed from them. Otherwise the builds' packages are compared.
+        """
         if left == right:
             return
 
+        yield from self._diff_binpkgs(left, right, self._completed_first(left, right))
+
+    def _diff_binpkgs(
+        self, left: Build, right: Build, forward: bool | None
+    ) -> Iterable[Change]:
+        """diff_binpkgs() given whether left is older than right
+
+        If the order of the builds is not known (forward is None) the builds' packages
+        are compared.
+        """
+        changes = (
+            None
+            if forward is None
+            else self._compose_deltas(left, right, forward=forward)
+        )
+
+        if changes is not None:
+            yield from changes
+        else:
+            yield from self._compare_packages(left, right)
+
+    def _completed_first(self, left: Build, right: Build) -> bool | None:
+        """Return whether left completed before right
+
+        If either build has not completed, return None.
+        """
+        left_completed = self.record(left).completed
+        right_completed = self.record(right).completed
+
+        if left_completed is None or right_completed is None:
+            return None
+
+        return left_completed < right_completed
+
+    def _compose_deltas(
+        self, left: Build, right: Build, *, forward: bool
+    ) -> list[Change] | None:
+        """Return the changes from left to right composed from stored package deltas
+
+        The deltas are walked back from the newer build, right if forward else left.
+        If they do not chain to the older build, return None.
+        """
+        left = Build(left.machine, left.build_id)
+        right = Build(right.machine, right.build_id)
+
+        if forward:
+            changes = self._delta_chain(left, right)
+        elif (changes := self._delta_chain(right, left)) is not None:
+            # Right is older than left. Invert the changes
+            changes = [
+                replace(change, status=ChangeState(-change.status.value))
+                for change in changes
+            ]
+
+        if changes is None:
+            return None
+
+        return sorted(changes, key=lambda change: change.item)
+
+    def _delta_chain(self, older: Build, newer: Build) -> list[Change] | None:
+        """Return the net changes of the package deltas from newer back to older"""
+        deltas: list[list[Change]] = []
+        build = newer
+
+        while build != older:
+            if build.machine != older.machine or len(deltas) == DELTA_CHAIN_MAX:
+                return None
+            try:
+                build, changes = self.storage.get_delta(build)
+            except LookupError:
+                return None
+            deltas.append(changes)
+
+        net: dict[str, Change] = {}
+        for changes in reversed(deltas):
+            for change in changes:
+                # A package added and then removed (or vice versa) is no change
+                if net.pop(change.item, None) is None:
+                    net[change.item] = change
+
+        return [
+            replace(
+                change,
+                package=replace(
+                    change.package,
+                    build=older if change.status is ChangeState.REMOVED else newer,
+                ),
+            )
+            for change in net.values()
+        ]
+
+    def _compare_packages(self, left: Build, right: Build) -> Iterable[Change]:
+        """Generate the differences of the builds' packages by sort-merging them
+
+        A package REMOVED from left comes before one ADDED in right with a greater cpvb.
+        """
         l_map = {package.cpvb(): package for package in self.get_packages(left)}
         r_map = {package.cpvb(): package for package in self.get_packages(right)}
-        code_map = {"-": "REMOVED", "+": "ADDED"}
-        diff = Differ().compare([f"{p}\n" for p in l_map], [f"{p}\n" for p in r_map])
+        l_keys = sorted(l_map)
+        r_keys = sorted(r_map)
+        i = j = 0
+
+        while i < len(l_keys) and j < len(r_keys):
+            if l_keys[i] == r_keys[j]:
+                i += 1
+                j += 1
+            elif l_keys[i] < r_keys[j]:
+                yield Change(l_keys[i], ChangeState.REMOVED, l_map[l_keys[i]])
+                i += 1
+            else:
+                yield Change(r_keys[j], ChangeState.ADDED, r_map[r_keys[j]])
+                j += 1
+
+        for cpvb in l_keys[i:]:
+            yield Change(cpvb, ChangeState.REMOVED, l_map[cpvb])
+        for cpvb in r_keys[j:]:
+            yield Change(cpvb, ChangeState.ADDED, r_map[cpvb])
+
+    def diff_range(
+        self, machine: str, start: str, end: str
+    ) -> Iterator[PackageHistory]:
+        """Generate the package history over the machine's builds from start to end
+
+        The completed builds from the start build_id through the end build_id are
+        walked once and each consecutive pair is diffed with diff_binpkgs(), so every
+        build's packages (or stored delta) are loaded only once. The packages that
+        changed within the range are generated in cpvb order.
+
+        If start is after end the builds are walked backwards. Raise RecordNotFound if
+        either is not a completed build of the machine.
+        """
+        log: dict[str, list[tuple[Build, Change]]] = {}
+        builds, forward = self._build_range(machine, start, end)
+
+        for left, right in itertools.pairwise(builds):
+            for change in self._diff_binpkgs(left, right, forward):
+                log.setdefault(change.item, []).append((right, change))
+
+        for item in sorted(log):
+            added: Build | None = None
+            removed: Build | None = None
+
+            for build, change in log[item]:
+                if change.status is ChangeState.ADDED and added is None:
+                    added = build
+                elif change.status is ChangeState.REMOVED:
+                    removed = build
+
+            yield PackageHistory(
+                item=item,
+                package=log[item][-1][1].package,
+                added=added,
+                removed=removed,
+                builds=tuple(build for build, _ in log[item]),
+            )
+
+    def _build_range(
+        self, machine: str, start: str, end: str
+    ) -> tuple[list[Build], bool]:
+        """Return the machine's completed builds from start through end
+
+        Also return whether the builds are in the order they completed (forward).
+        """
+        records = self.repo.build_records
+        first, last = (self._completed_record(Build(machine, i)) for i in (start, end))
+        assert first.built and last.built
+
+        if forward := first.built <= last.built:
+            builds = records.between(first, last)
+        else:
+            builds = records.between(last, first)[::-1]
 
-        for item in diff:
-            if change_state := code_map.get(item[0]):
-                cpvb = item[2:].rstrip()
-                src = l_map if change_state == "REMOVED" else r_map
-                yield Change(cpvb, ChangeState[change_state], src[cpvb])
+        return [Build(record.machine, record.build_id) for record in builds], forward
+
+    def _completed_record(self, build: Build) -> BuildRecord:
+        """Return the record of the completed (and built) build
+
+        Raise RecordNotFound if there is no such record.
+        """
+        record = self.repo.build_records.get(build)
+
+        if not (record.completed and record.built):
+            raise RecordNotFound(build)
+
+        return record
 
     def machines(self, *, names: Iterable[str] | None = None) -> list[MachineInfo]:
         """Return list of machines with metadata
@@ -297,9 +606,16 @@ def portage_profile(self, build: Build) -> str:
 
     @staticmethod
     def gbp_metadata(
-        jenkins_metadata: JenkinsMetadata, packages: list[Package]
+        jenkins_metadata: JenkinsMetadata,
+        packages: list[Package],
+        *,
+        artifact_sha256: str | None = None,
     ) -> GBPMetadata:
-        """Generate GBPMetadata given JenkinsMetadata and Packages"""
+        """Generate GBPMetadata given JenkinsMetadata and Packages
+
+        `artifact_sha256` is the SHA-256 digest of the artifact the build was pulled
+        from, if known.
+        """
         built: list[Package] = []
         jenkins_built_time = math.floor(jenkins_metadata.timestamp / 1000)
         total = len(packages)
@@ -310,10 +626,14 @@ def gbp_metadata(
                 built.append(package)
             size += package.size
 
-        pkg_metadata = PackageMetadata(total=total, size=size, built=built)
+        pkg_metadata = PackageMetadata(total=total, size=size, built=tuple(built))
         duration = jenkins_metadata.duration
 
-        return GBPMetadata(build_duration=duration, packages=pkg_metadata)
+        return GBPMetadata(
+            build_duration=duration,
+            packages=pkg_metadata,
+            artifact_sha256=artifact_sha256,
+        )
 
     def build_metadata(self, build: Build) -> GBPMetadata:
         """Return the GBPMetadata for the given build.
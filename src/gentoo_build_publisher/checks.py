@@ -2,6 +2,7 @@
 
 import itertools
 import json
+import os
 from pathlib import Path
 from typing import Callable
 
@@ -25,19 +26,18 @@ def build_content(console: Console) -> CheckResult:
         *(publisher.repo.build_records.for_machine(machine) for machine in machines)
     )
 
+    snapshot = publisher.storage.snapshot()
+
     for record in records:
         missing: list[Path] = []
-        for path in [
-            publisher.storage.get_path(record, content) for content in Content
-        ]:
-            if not path.exists():
-                aux = publisher.storage.get_path(record, Content.AUX)
-                if path == aux and record.completed:
-                    warnings += 1
-                    console.err.print(f"Path missing for {record}: {path}. Creating")
-                    path.mkdir(parents=True)
-                else:
-                    missing.append(path)
+        for content in snapshot.missing(record):
+            path = publisher.storage.get_path(record, content)
+            if content is Content.AUX and record.completed:
+                warnings += 1
+                console.err.print(f"Path missing for {record}: {path}. Creating")
+                path.mkdir(parents=True)
+            else:
+                missing.append(path)
 
         if missing:
             console.err.print(f"Path missing for {record}: {missing}")
@@ -52,23 +52,25 @@ def build_content(console: Console) -> CheckResult:
 def orphans(console: Console) -> CheckResult:
     """Check orphans (builds with no records)"""
     errors = 0
+    storage = publisher.storage
+    snapshot = storage.snapshot()
 
     for content in Content:
-        directory = publisher.storage.root / content.value
-
-        for path in directory.iterdir():
-            if "." in path.name and not path.is_symlink():
-                build = Build(*path.name.split(".", 1))
-
-                try:
-                    publisher.repo.build_records.get(build)
-                except RecordNotFound:
-                    console.err.print(f"Record missing for {path}")
-                    errors += 1
-            elif path.is_symlink() and not path.exists():
-                console.err.print(f"Broken tag: {path}")
+        directory = storage.root / content.value
+
+        for name in sorted(snapshot.builds[content]):
+            build = Build(*name.split(".", 1))
+
+            try:
+                publisher.repo.build_records.get(build)
+            except RecordNotFound:
+                console.err.print(f"Record missing for {directory / name}")
                 errors += 1
 
+        for name in sorted(snapshot.broken[content]):
+            console.err.print(f"Broken tag: {directory / name}")
+            errors += 1
+
     return errors, 0
 
 
@@ -76,19 +78,13 @@ def inconsistent_tags(console: Console) -> CheckResult:
     """Check for tags that have inconsistent targets"""
     errors = 0
 
-    tags: dict[str, set[str]] = {}
-
-    for path in [publisher.storage.root / content.value for content in Content]:
-        for item in path.iterdir():
-            if not item.is_symlink():
-                continue
-
-            if (tag := item.name) not in tags:
-                tags[tag] = set()
-
-            build = item.resolve().name
-
-            tags[tag].add(build)
+    snapshot = publisher.storage.snapshot()
+    tags = {
+        tag: snapshot.targets(tag)
+        for tag in dict.fromkeys(
+            name for symlinks in snapshot.symlinks.values() for name in symlinks
+        )
+    }
 
     for tag, targets in tags.items():
         if len(targets) != 1:
@@ -111,6 +107,24 @@ def dirty_temp(console: Console) -> CheckResult:
     return 0, warnings
 
 
+def trash_backlog(console: Console) -> CheckResult:
+    """Warn if deleted builds are awaiting removal from the trash"""
+    trash = publisher.storage.trash
+    size = 0
+
+    if not next(trash.glob("*"), None):
+        return 0, 0
+
+    for dirpath, _, filenames in os.walk(trash):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            size += os.stat(path, follow_symlinks=False).st_size
+
+    console.err.print(f"Warning: {trash} has {size} bytes awaiting removal.")
+
+    return 0, 1
+
+
 def corrupt_gbp_json(console: Console) -> CheckResult:
     """Check that the gbp.json file is not corrupt"""
     errors = 0
@@ -143,3 +157,30 @@ def corrupt_gbp_json(console: Console) -> CheckResult:
                 errors += 1
 
     return errors, warnings
+
+
+def orphaned_objects(console: Console) -> CheckResult:
+    """Warn about objects in the object store that no build references"""
+    warnings = 0
+
+    for dirpath, _, filenames in os.walk(publisher.storage.objects):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+
+            if os.stat(path, follow_symlinks=False).st_nlink == 1:
+                console.err.print(f"Warning: object {path} is not referenced.")
+                warnings += 1
+
+    return 0, warnings
+
+
+def artifact_cache(console: Console) -> CheckResult:
+    """Report the size of the artifact cache"""
+    cache = publisher.storage.artifact_cache
+
+    if cache.maxsize:
+        console.err.print(
+            f"Artifact cache {cache.path} uses {cache.size()} of {cache.maxsize} bytes."
+        )
+
+    return 0, 0
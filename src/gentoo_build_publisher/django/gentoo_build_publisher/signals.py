@@ -4,6 +4,7 @@
 
 from gentoo_build_publisher import worker
 from gentoo_build_publisher.signals import dispatcher
+from gentoo_build_publisher.worker import tasks
 
 
 def update_stats_cache() -> None:
@@ -20,6 +21,11 @@ def background_update_stats_cache(**_kwargs: Any) -> None:
     worker.run(update_stats_cache)
 
 
+def background_empty_trash(**_kwargs: Any) -> None:
+    """Run empty_trash in the background"""
+    worker.run(tasks.empty_trash)
+
+
 def init() -> None:
     """Bind signal handlers with the dispatcher"""
     dispatcher.bind(
@@ -30,3 +36,4 @@ def init() -> None:
         tagged=background_update_stats_cache,
         untagged=background_update_stats_cache,
     )
+    dispatcher.bind(postdelete=background_empty_trash)
@@ -117,20 +117,16 @@ def binpkg(  # pylint: disable=too-many-arguments
     b: int,
 ) -> HttpResponse:
     """Redirect to the URL of the given build's given package"""
+    if not pv.startswith(f"{p}-"):
+        raise Http404
+
     build = Build(machine=machine, build_id=build_id)
 
     try:
-        packages = publisher.get_packages(build)
+        package = publisher.get_package(build, f"{c}/{pv}", b)
     except LookupError as error:
         raise Http404 from error
 
-    cpv = f"{c}/{pv}"
-    try:
-        # This is wonky. We need to create an API for this
-        [package] = [p for p in packages if p.cpv == cpv and p.build_id == b]
-    except ValueError as error:
-        raise Http404 from error
-
     url = utils.get_url_for_package(build, package, request)
 
     return redirect(url, permanent=True)
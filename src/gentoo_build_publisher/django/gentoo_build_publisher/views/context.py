@@ -186,7 +186,7 @@ class BuildView:
     machine: str
     build_id: str
     gradient_colors: Gradient
-    packages_built: list[Package]
+    packages_built: tuple[Package, ...]
     total_package_size: int
     published: bool
     tags: list[str]
@@ -12,6 +12,8 @@
 from gentoo_build_publisher.types import Build, Package
 from gentoo_build_publisher.utils import string
 
+from .utils import build_record
+
 type Info = GraphQLResolveInfo
 
 BUILD = ObjectType("Build")
@@ -19,28 +21,28 @@
 
 
 @BUILD.field("built")
-def built(build: Build, _info: Info) -> dt.datetime | None:
-    return publisher.record(build).built
+def built(build: Build, info: Info) -> dt.datetime | None:
+    return build_record(info, build).built
 
 
 @BUILD.field("completed")
-def completed(build: Build, _info: Info) -> dt.datetime | None:
-    return publisher.record(build).completed
+def completed(build: Build, info: Info) -> dt.datetime | None:
+    return build_record(info, build).completed
 
 
 @BUILD.field("keep")
-def keep(build: Build, _info: Info) -> bool:
-    return publisher.record(build).keep
+def keep(build: Build, info: Info) -> bool:
+    return build_record(info, build).keep
 
 
 @BUILD.field("logs")
-def logs(build: Build, _info: Info) -> str | None:
-    return publisher.record(build).logs
+def logs(build: Build, info: Info) -> str | None:
+    return build_record(info, build).logs
 
 
 @BUILD.field("notes")
-def notes(build: Build, _info: Info) -> str | None:
-    return publisher.record(build).note
+def notes(build: Build, info: Info) -> str | None:
+    return build_record(info, build).note
 
 
 @BUILD.field("packages")
@@ -59,7 +61,7 @@ def packages(build: Build, _info: Info, build_id: bool = False) -> list[str] | N
 
 
 @BUILD.field("packagesBuilt")
-def packages_built(build: Build, _info: Info) -> list[Package] | None:
+def packages_built(build: Build, _info: Info) -> tuple[Package, ...] | None:
     gbp_metadata = publisher.build_metadata(build)
 
     return gbp_metadata.packages.built
@@ -76,8 +78,8 @@ def pulled(build: Build, _info: Info) -> bool:
 
 
 @BUILD.field("submitted")
-def submitted(build: Build, _info: Info) -> dt.datetime:
-    return publisher.record(build).submitted or dt.datetime.now(tz=dt.UTC)
+def submitted(build: Build, info: Info) -> dt.datetime:
+    return build_record(info, build).submitted or dt.datetime.now(tz=dt.UTC)
 
 
 @BUILD.field("tags")
@@ -86,10 +88,8 @@ def tags(build: Build, _info: Info) -> list[str]:
 
 
 @BUILD.field("packageDetail")
-def package_detail(build: Build, _info: Info) -> list[Package]:
-    build_record = publisher.record(build)
-
-    return publisher.get_packages(build_record)
+def package_detail(build: Build, info: Info) -> list[Package]:
+    return publisher.get_packages(build_record(info, build))
 
 
 @BUILD.field("profile")
@@ -7,9 +7,9 @@
 
 from gentoo_build_publisher import plugins, publisher, utils
 from gentoo_build_publisher.machines import MachineInfo
-from gentoo_build_publisher.records import BuildRecord
+from gentoo_build_publisher.records import BuildRecord, RecordNotFound
 from gentoo_build_publisher.stats import Stats
-from gentoo_build_publisher.types import TAG_SYM, Build
+from gentoo_build_publisher.types import TAG_SYM, Build, PackageHistory
 
 type Info = GraphQLResolveInfo
 type Object = dict[str, Any]
@@ -65,6 +65,19 @@ def diff(_obj: Any, _info: Info, left: str, right: str) -> Object | None:
     return {"left": left_build, "right": right_build, "items": list(items)}
 
 
+@QUERY.field("diffRange")
+def diff_range(
+    _obj: Any, _info: Info, machine: str, **kwargs: str
+) -> list[PackageHistory]:
+    # "from" is a Python keyword
+    start, end = kwargs["from"], kwargs["to"]
+
+    try:
+        return list(publisher.diff_range(machine, start, end))
+    except RecordNotFound as error:
+        raise GraphQLError(f"Build does not exist: {error}") from error
+
+
 @QUERY.field("search")
 def search(
     _obj: Any, _info: Info, machine: str, field: str, key: str
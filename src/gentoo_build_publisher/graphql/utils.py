@@ -9,12 +9,13 @@
 from typing import Any, Callable
 
 import ariadne
-from graphql import GraphQLError, GraphQLResolveInfo
+from graphql import GraphQLError, GraphQLResolveInfo, OperationType
 
 from gentoo_build_publisher import publisher, utils
 from gentoo_build_publisher.plugins import get_plugins
-from gentoo_build_publisher.records import RecordNotFound
+from gentoo_build_publisher.records import BuildRecord, RecordNotFound
 from gentoo_build_publisher.settings import Settings
+from gentoo_build_publisher.types import Build
 
 type Info = GraphQLResolveInfo
 type Resolver = Callable[..., Any]
@@ -73,6 +74,30 @@ def wrapper(obj: Any, info: Info, **kwargs: Any) -> Any:
 )
 
 
+def build_record(info: Info, build: Build) -> BuildRecord:
+    """Return the BuildRecord for the given build
+
+    Within a query, records are kept in the request context keyed by (machine,
+    build_id) so that each build's record is fetched at most once per request no
+    matter how many of its fields are resolved. Mutations change records so they
+    always fetch.
+    """
+    if isinstance(build, BuildRecord):
+        return build
+
+    if info.operation.operation != OperationType.QUERY:
+        return publisher.record(build)
+
+    records: dict[tuple[str, str], BuildRecord]
+    records = info.context.setdefault("build_records", {})
+    key = (build.machine, build.build_id)
+
+    if (record := records.get(key)) is None:
+        record = records[key] = publisher.record(build)
+
+    return record
+
+
 def load_schema() -> tuple[list[str], list[ariadne.ObjectType]]:
     """Load all GraphQL schema for Gentoo Build Publisher
 
@@ -7,7 +7,7 @@
 from dataclasses import dataclass
 from functools import partial
 from pathlib import PurePosixPath
-from typing import Any, Iterable, Self
+from typing import Any, Iterator, Self
 
 import requests
 from yarl import URL
@@ -22,9 +22,40 @@
 
 COPY_ARTIFACT_PLUGIN = "copyartifact@1.47"
 HTTP_NOT_FOUND = 404
+HTTP_PARTIAL_CONTENT = 206
+HTTP_RANGE_NOT_SATISFIABLE = 416
+DOWNLOAD_RESUME_ATTEMPTS = 5
+DOWNLOAD_RESUMABLE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
 PATH_SEPARATOR = "/"
 
 
+class ArtifactChangedError(Exception):
+    """The artifact has changed since the download being resumed was started"""
+
+
+class ArtifactStream:  # pylint: disable=too-few-public-methods
+    """The chunks of bytes of a (possibly resumed) artifact download
+
+    `start` is the byte offset the download starts from. `validator` is the artifact's
+    strong ETag or, failing that, its Last-Modified header. It is sent as If-Range when
+    the download is resumed so that the bytes of a changed artifact are never spliced
+    onto those of the original. It is None if the response has neither.
+    """
+
+    def __init__(
+        self, chunks: Iterator[bytes], start: int, validator: str | None
+    ) -> None:
+        self.chunks = chunks
+        self.start = start
+        self.validator = validator
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.chunks
+
+
 @dataclass(frozen=True, slots=True)
 class JenkinsConfig:
     """Configuration for JenkinsBuild"""
@@ -108,6 +139,9 @@ class URLBuilder:
 
     formatters: dict[str, str] = {
         "artifact": "job/{arg.machine}/{arg.build_id}/artifact/{config.artifact_name}",
+        "artifact_checksum": (
+            "job/{arg.machine}/{arg.build_id}/artifact/{config.artifact_name}.sha256"
+        ),
         "build": "job/{arg.machine}/{arg.build_id}",
         "build_scheduler": "job/{arg}/build",
         "logs": "job/{arg.machine}/{arg.build_id}/consoleText",
@@ -161,15 +195,128 @@ def project_root(self) -> ProjectPath:
             PATH_SEPARATOR.join(url_path.split(f"{PATH_SEPARATOR}job{PATH_SEPARATOR}"))
         )
 
-    def download_artifact(self, build: Build) -> Iterable[bytes]:
-        """Download and yield the build artifact in chunks of bytes"""
+    def download_artifact(
+        self, build: Build, *, start: int = 0, validator: str | None = None
+    ) -> ArtifactStream:
+        """Download and yield the build artifact in chunks of bytes
+
+        If `start` is given, the artifact is downloaded from that byte offset. An HTTP
+        Range request is used for this. If Jenkins does not honor it, the leading bytes
+        are downloaded but not yielded.
+
+        `validator` is the ArtifactStream.validator of the download being resumed. If
+        given, it is sent as If-Range and ArtifactChangedError is raised if the artifact
+        has since changed.
+
+        If the connection drops mid-download, the download is resumed from where it
+        left off (up to DOWNLOAD_RESUME_ATTEMPTS times).
+        """
         url = self.url.artifact(build)
-        http_response = request_and_raise(self.session.get, url, stream=True)
+        http_response = self._request_artifact(url, start, validator)
+        if validator is None and http_response is not None:
+            validator = artifact_validator(http_response)
 
-        return http_response.iter_content(
-            chunk_size=self.config.download_chunk_size, decode_unicode=False
+        return ArtifactStream(
+            self._iter_artifact(url, http_response, start, validator), start, validator
         )
 
+    def _request_artifact(
+        self, url: URL, start: int, validator: str | None
+    ) -> requests.Response | None:
+        """Request the artifact from the given offset
+
+        Return None if there is nothing to download from that offset.
+        """
+        if not start:
+            return request_and_raise(self.session.get, url, stream=True)
+
+        headers = {"Range": f"bytes={start}-"}
+        if validator:
+            headers["If-Range"] = validator
+
+        http_response = request_and_raise(
+            self.session.get,
+            url,
+            stream=True,
+            headers=headers,
+            exclude=[HTTP_RANGE_NOT_SATISFIABLE],
+        )
+
+        if http_response.status_code == HTTP_RANGE_NOT_SATISFIABLE:
+            return None
+
+        # The full artifact is sent if it no longer matches If-Range
+        if (
+            validator
+            and http_response.status_code != HTTP_PARTIAL_CONTENT
+            and artifact_validator(http_response) != validator
+        ):
+            http_response.close()
+            raise ArtifactChangedError(url)
+
+        return http_response
+
+    def _iter_artifact(
+        self,
+        url: URL,
+        http_response: requests.Response | None,
+        start: int,
+        validator: str | None,
+    ) -> Iterator[bytes]:
+        offset = start
+        attempts = 0
+
+        while http_response is not None:
+            # The server did not honor the Range request. Skip what we already have
+            skip = offset if http_response.status_code != HTTP_PARTIAL_CONTENT else 0
+
+            try:
+                for chunk in http_response.iter_content(
+                    chunk_size=self.config.download_chunk_size, decode_unicode=False
+                ):
+                    if skip:
+                        chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                        if not chunk:
+                            continue
+                    offset += len(chunk)
+                    yield chunk
+                return
+            except DOWNLOAD_RESUMABLE_EXCEPTIONS:
+                if (attempts := attempts + 1) > DOWNLOAD_RESUME_ATTEMPTS:
+                    raise
+                logger.warning(
+                    "Download of %s dropped at byte %s. Resuming", url, offset
+                )
+                http_response = self._request_artifact(url, offset, validator)
+
+    def get_artifact_validator(self, build: Build) -> str | None:
+        """Return the current validator (see artifact_validator()) of the build's artifact
+
+        This is a HEAD request, so the artifact is not downloaded.
+        """
+        url = self.url.artifact(build)
+        http_response = request_and_raise(self.session.head, url, allow_redirects=True)
+
+        return artifact_validator(http_response)
+
+    def get_artifact_checksum(self, build: Build) -> str | None:
+        """Return the SHA-256 checksum Jenkins publishes for the build's artifact
+
+        This is the artifact's name plus ".sha256", in the format written by sha256sum.
+        Return None if the build has no such file.
+        """
+        url = self.url.artifact_checksum(build)
+        http_response = request_and_raise(
+            self.session.get, url, exclude=[HTTP_NOT_FOUND]
+        )
+
+        if http_response.status_code == HTTP_NOT_FOUND:
+            return None
+
+        fields = http_response.text.split()
+
+        return fields[0] if fields else None
+
     def get_logs(self, build: Build) -> str:
         """Get and return the build's jenkins logs"""
         url = self.url.logs(build)
@@ -352,6 +499,21 @@ def create_machine_job(self, job: MachineJob) -> None:
         self.create_item(machine_path, xml.build_machine(job))
 
 
+def artifact_validator(http_response: requests.Response) -> str | None:
+    """Return the validator to resume the artifact response with, if any
+
+    That is the response's ETag, unless it is weak (weak ETags are not allowed in
+    If-Range), or else its Last-Modified header.
+    """
+    headers = http_response.headers
+    etag = headers.get("ETag")
+
+    if etag and not etag.startswith("W/"):
+        return etag
+
+    return headers.get("Last-Modified")
+
+
 def build_params_list(
     job_params: dict[str, Any], build_params: dict[str, Any]
 ) -> list[dict[str, Any]]:
@@ -7,10 +7,11 @@
 from typing import TYPE_CHECKING
 
 from gentoo_build_publisher.records import BuildRecord
-from gentoo_build_publisher.types import Build
+from gentoo_build_publisher.types import TAG_SYM, Build
 
 if TYPE_CHECKING:
     from gentoo_build_publisher.build_publisher import BuildPublisher
+    from gentoo_build_publisher.storage import StorageSnapshot
 
 
 class MachineInfo:
@@ -24,8 +25,11 @@ class MachineInfo:
         published_build: Build | None
     """
 
-    def __init__(self, machine: str) -> None:
+    def __init__(
+        self, machine: str, *, snapshot: "StorageSnapshot | None" = None
+    ) -> None:
         self.machine = machine
+        self.snapshot = snapshot
 
     @cached_property
     def build_count(self) -> int:
@@ -44,16 +48,36 @@ def latest_build(self) -> BuildRecord | None:
 
     @cached_property
     def published_build(self) -> Build | None:
-        """The latest published build, or None"""
+        """The latest published build, or None
+
+        The machine's published symlinks are resolved directly rather than checking
+        each of the machine's builds.
+        """
         publisher = self.publisher
-        builds = (Build.from_id(b.id) for b in self.builds if publisher.published(b))
-        return next(builds, None)
+
+        try:
+            build = publisher.storage.resolve_tag(f"{self.machine}{TAG_SYM}")
+        except FileNotFoundError:
+            return None
+
+        return build if publisher.repo.build_records.exists(build) else None
 
     @cached_property
     def tags(self) -> list[str]:
-        """All the machines build tags"""
-        publisher = self.publisher
-        return sorted(tag for build in self.builds for tag in publisher.tags(build))
+        """All the machines build tags
+
+        If the MachineInfo was given a StorageSnapshot, the tags are taken from it.
+        """
+        if self.snapshot is None:
+            publisher = self.publisher
+            return sorted(tag for build in self.builds for tag in publisher.tags(build))
+
+        build_ids = {build.id for build in self.builds}
+        tags = self.snapshot.tags(self.machine)
+
+        return sorted(
+            tag for tag, target in tags.items() if tag and target in build_ids
+        )
 
     @cached_property
     def publisher(self) -> "BuildPublisher":
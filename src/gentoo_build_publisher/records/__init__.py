@@ -71,6 +71,39 @@ def previous(
     def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None:
         """Return the next build in the db or None"""
 
+    def nth_previous(
+        self, build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build before the given build in the db or None
+
+        `n` must be a positive integer. `nth_previous(build, 1)` is
+        `previous(build)`.
+        """
+
+    def nth_next(
+        self, build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build after the given build in the db or None
+
+        `n` must be a positive integer. `nth_next(build, 1)` is `next(build)`.
+        """
+
+    def between(
+        self, first: BuildRecord, last: BuildRecord, completed: bool = True
+    ) -> list[BuildRecord]:
+        """Return the builds of first's machine built from first through last
+
+        Builds are ordered by their built timestamp, oldest first. The list is empty
+        if last was built before first. Raise ValueError if either build has not been
+        built.
+        """
+
+    def recent(self, machine: str, n: int) -> list[BuildRecord]:
+        """Return (up to) the n most recently completed builds of the given machine
+
+        Builds are ordered by their completed timestamp, most recent first.
+        """
+
     def latest(self, machine: str, completed: bool = False) -> BuildRecord | None:
         """Return the latest build for the given machine name.
 
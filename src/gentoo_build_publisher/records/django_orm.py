@@ -108,6 +108,23 @@ def previous(
         self, build: BuildRecord, completed: bool = True
     ) -> BuildRecord | None:
         """Return the previous build in the db or None"""
+        return self.nth_previous(build, 1, completed)
+
+    def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None:
+        """Return the next build in the db or None"""
+        return self.nth_next(build, 1, completed)
+
+    @staticmethod
+    def nth_previous(
+        build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build before the given build in the db or None
+
+        This is a single query using OFFSET.
+        """
+        if n < 1:
+            raise ValueError(f"n must be a positive integer: {n}")
+
         field_lookups: dict[str, Any] = {
             "built__isnull": False,
             "machine": build.machine,
@@ -122,14 +139,23 @@ def previous(
         query = RELATED.filter(**field_lookups).order_by("-built")
 
         try:
-            build_model: BuildModel = query[0]
+            build_model: BuildModel = query[n - 1]
         except IndexError:
             return None
 
         return build_model.record()
 
-    def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None:
-        """Return the next build in the db or None"""
+    @staticmethod
+    def nth_next(
+        build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build after the given build in the db or None
+
+        This is a single query using OFFSET.
+        """
+        if n < 1:
+            raise ValueError(f"n must be a positive integer: {n}")
+
         field_lookups: dict[str, Any] = {"machine": build.machine}
 
         if build.built:
@@ -141,12 +167,46 @@ def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None
         query = RELATED.filter(**field_lookups).order_by("built")
 
         try:
-            build_model: BuildModel = query[0]
+            build_model: BuildModel = query[n - 1]
         except IndexError:
             return None
 
         return build_model.record()
 
+    @staticmethod
+    def between(
+        first: BuildRecord, last: BuildRecord, completed: bool = True
+    ) -> list[BuildRecord]:
+        """Return the builds of first's machine built from first through last
+
+        This is a single query bounded by the built timestamps.
+        """
+        if not (first.built and last.built):
+            raise ValueError(f"Builds must have been built: {first}, {last}")
+
+        field_lookups: dict[str, Any] = {
+            "machine": first.machine,
+            "built__range": (first.built, last.built),
+        }
+
+        if completed:
+            field_lookups["completed__isnull"] = False
+
+        query = RELATED.filter(**field_lookups).order_by("built", "submitted")
+
+        return [build_model.record() for build_model in query]
+
+    @staticmethod
+    def recent(machine: str, n: int) -> list[BuildRecord]:
+        """Return (up to) the n most recently completed builds of the given machine
+
+        This is a single query using LIMIT.
+        """
+        query = RELATED.filter(machine=machine, completed__isnull=False)
+        query = query.order_by("-completed")
+
+        return [build_model.record() for build_model in query[:n]]
+
     @staticmethod
     def latest(machine: str, completed: bool = False) -> BuildRecord | None:
         """Return the latest build for the given machine name.
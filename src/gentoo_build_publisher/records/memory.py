@@ -1,5 +1,6 @@
 """Memory-based RecordDB implementation"""
 
+import bisect
 import datetime as dt
 import typing as t
 from dataclasses import replace
@@ -89,47 +90,85 @@ def previous(
         self, build: BuildRecord, completed: bool = True
     ) -> BuildRecord | None:
         """Return the previous build in the db or None"""
-        machine = build.machine
-        records = []
-
-        for record in self.for_machine(machine):
-            if completed and not record.completed:
-                continue
-            if not record.built:
-                continue
-            if build.built and record.built >= build.built:
-                continue
-            records.append(record)
+        return self.nth_previous(build, 1, completed)
 
-        if not records:
-            return None
+    def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None:
+        """Return the next build in the db or None"""
+        return self.nth_next(build, 1, completed)
 
-        records.sort(key=record_key)
+    def nth_previous(
+        self, build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build before the given build in the db or None"""
+        if n < 1:
+            raise ValueError(f"n must be a positive integer: {n}")
 
-        return records[-1]
+        records = self._built_records(build, completed)
+        index = (
+            bisect.bisect_left(records, build.built, key=built_key)
+            if build.built
+            else len(records)
+        )
 
-    def next(self, build: BuildRecord, completed: bool = True) -> BuildRecord | None:
-        """Return the next build in the db or None"""
-        machine = build.machine
-        records = []
-
-        for record in self.for_machine(machine):
-            if record.build_id == build.build_id:
-                continue
-            if completed and not record.completed:
-                continue
-            if not record.built:
-                continue
-            if build.built and record.built < build.built:
-                continue
-            records.append(record)
+        return records[index - n] if n <= index else None
 
-        if not records:
-            return None
+    def nth_next(
+        self, build: BuildRecord, n: int, completed: bool = True
+    ) -> BuildRecord | None:
+        """Return the nth build after the given build in the db or None"""
+        if n < 1:
+            raise ValueError(f"n must be a positive integer: {n}")
+
+        records = self._built_records(build, completed)
+        index = (
+            bisect.bisect_left(records, build.built, key=built_key)
+            if build.built
+            else 0
+        )
+
+        return records[index + n - 1] if index + n <= len(records) else None
+
+    def _built_records(self, build: BuildRecord, completed: bool) -> list[BuildRecord]:
+        """Return the other built records of the build's machine ordered by built"""
+        records = [
+            record
+            for record in self.for_machine(build.machine)
+            if record.built
+            and record.build_id != build.build_id
+            and (record.completed or not completed)
+        ]
+        records.sort(key=built_key)
 
-        records.sort(key=record_key)
+        return records
+
+    def between(
+        self, first: BuildRecord, last: BuildRecord, completed: bool = True
+    ) -> list[BuildRecord]:
+        """Return the builds of first's machine built from first through last"""
+        if not (first.built and last.built):
+            raise ValueError(f"Builds must have been built: {first}, {last}")
+
+        records = [
+            record
+            for record in self.builds.get(first.machine, {}).values()
+            if record.built
+            and first.built <= record.built <= last.built
+            and (record.completed or not completed)
+        ]
+        records.sort(key=built_key)
+
+        return records
+
+    def recent(self, machine: str, n: int) -> list[BuildRecord]:
+        """Return (up to) the n most recently completed builds of the given machine"""
+        records = [
+            record
+            for record in self.builds.get(machine, {}).values()
+            if record.completed
+        ]
+        records.sort(key=completed_key, reverse=True)
 
-        return records[0]
+        return records[:n]
 
     def latest(self, machine: str, completed: bool = False) -> BuildRecord | None:
         """Return the latest build for the given machine name.
@@ -185,6 +224,20 @@ def record_key(record: BuildRecord) -> int | str:
         return record.build_id
 
 
+def built_key(record: BuildRecord) -> dt.datetime:
+    """Sort key function for records that have been built"""
+    assert record.built
+
+    return record.built
+
+
+def completed_key(record: BuildRecord) -> dt.datetime:
+    """Sort key function for records that have been completed"""
+    assert record.completed
+
+    return record.completed
+
+
 class ApiKeyDB:
     """Implements the ApiKeyDB Protocol using RAM as a backing store"""
 
@@ -25,6 +25,12 @@ class Settings(BaseSettings):
     JENKINS_DOWNLOAD_CHUNK_SIZE: int = JENKINS_DEFAULT_CHUNK_SIZE
     JENKINS_USER: str | None = None
     RECORDS_BACKEND: str = "django"
+    STORAGE_ARTIFACT_CACHE_SIZE: int = 0  # bytes
+    STORAGE_ATOMIC_PUBLISH: bool = False
+    STORAGE_COPY_THREADS: int = 1
+    STORAGE_DEDUP: bool = False
+    STORAGE_METADATA_CACHE_SIZE: int = 16 * 1024 * 1024  # bytes
+    STORAGE_STREAM_EXTRACT: bool = False
     WORKER_BACKEND: str = "celery"
     API_KEY_ENABLE: bool = True
     API_KEY_LENGTH: int = 24
@@ -1,12 +1,14 @@
 # pylint: disable=missing-docstring
 import datetime as dt
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Self, cast
 
 from gentoo_build_publisher import publisher
 from gentoo_build_publisher.cache import cache
 from gentoo_build_publisher.machines import MachineInfo
 from gentoo_build_publisher.records import BuildRecord
+from gentoo_build_publisher.storage import StorageSnapshot
 from gentoo_build_publisher.types import Build, Package
 from gentoo_build_publisher.utils.time import SECONDS_PER_DAY, lapsed, localtime
 
@@ -95,9 +97,14 @@ def with_cache(cls) -> Self:
 class StatsCollector:
     """Interface to collect statistics about the Publisher"""
 
+    @cached_property
+    def snapshot(self) -> StorageSnapshot:
+        """The StorageSnapshot shared by the collector's MachineInfo objects"""
+        return publisher.storage.snapshot()
+
     def machine_info(self, machine: MachineName) -> MachineInfoDataClass:
         """Return the MachineInfo object for the given machine"""
-        m = MachineInfo(machine)
+        m = MachineInfo(machine, snapshot=self.snapshot)
 
         return MachineInfoDataClass(
             machine=m.machine,
@@ -1,13 +1,27 @@
 """Storage (filesystem) interface for Gentoo Build Publisher"""
 
+# pylint: disable=too-many-lines
 from __future__ import annotations
 
+import errno
+import fcntl
+import hashlib
 import logging
+import mmap
+import os
 import shutil
+import tarfile
 import tempfile
+import threading
+import time
+import uuid
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import IO, Iterable, Self
+from typing import IO, Any, Iterable, Mapping, NamedTuple, Self, Sequence
 
 import orjson
 
@@ -16,19 +30,299 @@
 from gentoo_build_publisher.types import (
     TAG_SYM,
     Build,
+    Change,
+    ChangeState,
     Content,
     GBPMetadata,
+    LinkStats,
     Package,
     PackageMetadata,
 )
-from gentoo_build_publisher.utils import fs, string
+from gentoo_build_publisher.utils import fs
+from gentoo_build_publisher.utils.time import StageTimer
 
 INVALID_TEST_PATH = Path("__testing__")
 GBP_METADATA_FILENAME = "gbp.json"
+LINK_STATS_FILENAME = "gbp-link-stats.json"
+PACKAGES_FILENAME = "gbp-packages.json"
+DELTA_FILENAME = "gbp-delta.json"
+PACKAGES_CACHE_SIZE = 64
+METADATA_CACHE_SIZE = 16 * 1024 * 1024  # bytes (of gbp.json)
+# Directory mtimes have (kernel tick) granularity so changes within the same tick can
+# go unnoticed. Cached symlink state is only used if the binpkgs mtime was this old
+# when it was scanned.
+SYMLINKS_SETTLE_NS = 2_000_000_000
+# Partial artifacts that have not been written to for this long are no longer expected
+# to be resumed and are removed by empty_trash()
+PARTIAL_ARTIFACT_MAX_AGE = 24 * 60 * 60  # seconds
+# The Packages index fields that we need to create a Package
+PACKAGE_FIELDS = frozenset(
+    [b"CPV", b"REPO", b"PATH", b"BUILD_ID", b"SIZE", b"BUILD_TIME"]
+)
 logger = logging.getLogger(__name__)
 
 
-class Storage:
+class StreamExtractError(Exception):
+    """The artifact byte stream could not be extracted as it was streamed"""
+
+
+class ArtifactChecksumError(Exception):
+    """The artifact's SHA-256 digest does not match its published checksum"""
+
+
+class PartialArtifactError(Exception):
+    """The build's partial artifact is in use, or was changed, by another pull"""
+
+
+class CacheInfo(NamedTuple):
+    """MetadataCache statistics"""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class MetadataCache:
+    """Bounded LRU cache of builds' GBPMetadata
+
+    Entries are keyed on the build and the (st_mtime_ns, st_size) of the gbp.json file
+    they were read from. The cache is bounded by the total size of those files rather
+    than the number of entries.
+    """
+
+    def __init__(self, maxsize: int = METADATA_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._currsize = 0
+        self._entries: OrderedDict[str, tuple[tuple[int, int], GBPMetadata]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, build: Build, key: tuple[int, int]) -> GBPMetadata | None:
+        """Return the build's cached metadata if still valid for key, else None"""
+        with self._lock:
+            entry = self._entries.get(build.id)
+
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(build.id)
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, build: Build, key: tuple[int, int], metadata: GBPMetadata) -> None:
+        """Cache the build's metadata, evicting least-recently used entries"""
+        size = key[1]
+
+        if size > self.maxsize:
+            return
+
+        with self._lock:
+            self._discard(build)
+            self._entries[build.id] = (key, metadata)
+            self._currsize += size
+
+            while self._currsize > self.maxsize:
+                _, ((_, evicted_size), _) = self._entries.popitem(last=False)
+                self._currsize -= evicted_size
+
+    def discard(self, build: Build) -> None:
+        """Remove the build's metadata from the cache (if it exists)"""
+        with self._lock:
+            self._discard(build)
+
+    def clear(self) -> None:
+        """Empty the cache and reset its statistics"""
+        with self._lock:
+            self._entries.clear()
+            self._currsize = self.hits = self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return the cache statistics"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, self._currsize)
+
+    def _discard(self, build: Build) -> None:
+        if entry := self._entries.pop(build.id, None):
+            self._currsize -= entry[0][1]
+
+
+class ArtifactCache:
+    """Size-bounded LRU cache of downloaded build artifacts
+
+    This keeps artifacts across failed pulls so that retrying a pull need not download
+    the artifact again. Each artifact is a file in the cache directory named after its
+    build. Files are "used" by touching their mtime, and the least-recently used are
+    evicted once the total size exceeds maxsize. A maxsize of 0 disables the cache.
+
+    Jenkins can replace a build's artifact, so the validator (e.g. ETag) that it was
+    served with is saved alongside each artifact. get() ignores (and discards) an
+    artifact whose validator does not match the one given.
+    """
+
+    validator_suffix = ".validator"
+
+    def __init__(self, path: Path, maxsize: int = 0) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def __contains__(self, build: Build) -> bool:
+        return self.maxsize > 0 and self._path(build).exists()
+
+    def get(self, build: Build, validator: str | None = None) -> Path | None:
+        """Return the path of the build's cached artifact, if any
+
+        If `validator` is given and the artifact was not cached with it, the artifact is
+        stale. It is discarded and None is returned.
+        """
+        if not self.maxsize:
+            return None
+
+        path = self._path(build)
+
+        if validator is not None and self.validator(build) != validator:
+            logger.info("Cached artifact for build %s has changed", build)
+            self.discard(build)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def validator(self, build: Build) -> str | None:
+        """Return the validator the build's cached artifact was saved with, if any"""
+        try:
+            return self._validator_path(build).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def add(
+        self, build: Build, artifact: Path, validator: str | None = None
+    ) -> Path | None:
+        """Move the artifact file into the cache and return its new path
+
+        `validator` is what the artifact was served with (see get()).
+
+        Least-recently used artifacts are evicted to make room. If the artifact does not
+        fit in the cache, it is left in place and None is returned.
+        """
+        if not self.maxsize or artifact.stat().st_size > self.maxsize:
+            return None
+
+        path = self._path(build)
+        with self._lock:
+            if validator is None:
+                self._validator_path(build).unlink(missing_ok=True)
+            else:
+                self._validator_path(build).write_text(validator, encoding="utf-8")
+            os.replace(artifact, path)
+            os.utime(path)
+            self._evict()
+
+        return path
+
+    def discard(self, build: Build) -> None:
+        """Remove the build's artifact from the cache, if present"""
+        self._path(build).unlink(missing_ok=True)
+        self._validator_path(build).unlink(missing_ok=True)
+
+    def size(self) -> int:
+        """Return the total size, in bytes, of the cached artifacts"""
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _path(self, build: Build) -> Path:
+        return self.path / str(build)
+
+    def _validator_path(self, build: Build) -> Path:
+        return self.path / f"{build}{self.validator_suffix}"
+
+    def _entries(self) -> list[tuple[str, os.stat_result]]:
+        try:
+            with os.scandir(self.path) as entries:
+                return [
+                    (entry.path, entry.stat())
+                    for entry in entries
+                    if not entry.name.endswith(self.validator_suffix)
+                ]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime_ns)
+        size = sum(stat.st_size for _, stat in entries)
+
+        for path, stat in entries:
+            if size <= self.maxsize:
+                break
+            os.unlink(path)
+            Path(f"{path}{self.validator_suffix}").unlink(missing_ok=True)
+            size -= stat.st_size
+
+
+@dataclass(frozen=True)
+class StorageSnapshot:
+    """A point-in-time view of the builds and symlinks in Storage
+
+    Created by Storage.snapshot() with a single directory scan per `Content`.
+    """
+
+    builds: Mapping[Content, frozenset[str]]
+    """Per Content, the ids of the builds (non-symlink entries) present"""
+
+    symlinks: Mapping[Content, Mapping[str, str]]
+    """Per Content, the symlink names and their real paths"""
+
+    broken: Mapping[Content, frozenset[str]]
+    """Per Content, the names of symlinks whose targets do not exist"""
+
+    def pulled(self, build: Build) -> bool:
+        """Return True if the build exists for all `Content`"""
+        return all(build.id in self.builds[item] for item in Content)
+
+    def missing(self, build: Build) -> list[Content]:
+        """Return the `Content` that does not exist for the given build"""
+        return [item for item in Content if build.id not in self.builds[item]]
+
+    def targets(self, name: str) -> set[str]:
+        """Return the names of the targets of the symlink over all `Content`"""
+        return {
+            os.path.basename(symlinks[name])
+            for symlinks in self.symlinks.values()
+            if name in symlinks
+        }
+
+    def tags(self, machine: str) -> dict[str, str]:
+        """Return the machine's tags and the ids of the builds they point to
+
+        The published "tag" is the empty string. Partial tags and tags whose
+        symlinks point to different builds are not included.
+        """
+        tags: dict[str, str] = {}
+
+        for name in self.symlinks[Content.BINPKGS]:
+            symlink_machine, tag_sym, tag = name.partition(TAG_SYM)
+
+            if symlink_machine != machine or (tag_sym and not tag):
+                continue
+
+            if len(targets := self.targets(name)) == 1 and all(
+                name in self.symlinks[item] for item in Content
+            ):
+                tags[tag] = targets.pop()
+
+        return tags
+
+
+class Storage:  # pylint: disable=too-many-public-methods,too-many-instance-attributes
     """Filesystem storage for Gentoo Build Publisher
 
     Gentoo Build Publisher hosts files (repos, binpkgs, etc).  There is a "root"
@@ -41,13 +335,17 @@ class Storage:
     │   └── lighthouse.19
     ├── binpkgs
     │   └── lighthouse.19
+    ├── builds
+    │   └── lighthouse.19
     ├── etc-portage
     │   └── lighthouse.19
+    ├── objects
     ├── repos
     │   └── lighthouse.19
     │       ├── gentoo
     │       └── marduk
     ├── tmp
+    ├── trash
     └── var-lib-portage
         └── lighthouse.19
 
@@ -56,33 +354,95 @@ class Storage:
     if a build "lighthouse.19" was pulled, there exists a ./binpkgs/lighthouse.19
     directory containing the build's binary packages, a ./repos/lighthouse.19 directory
     containing the ebuild repos used for that build, etc. The tmp/ directory, as the
-    name implies, is for temporary storage.
+    name implies, is for temporary storage. Deleted builds are moved into the trash/
+    directory before they are removed in the background.
 
     The aux directory is for auxiliary data that can be used by plugins.
 
+    If deduplication is enabled, the objects/ directory is a content-addressed store.
+    Every file pulled is hard linked to its canonical object there, so identical files
+    are stored only once regardless of which machine (or build) they came from.
+
     When a build is published, for example "lighthouse.19", then for each of its
     respective directories in Content there exists a symbolic link with just the name of
     the machine, for example, "lighthouse".  Likewise, a tag to a build is a symbolic
     link with the name of the machine, the @ sign and the tag. For example if the build
     "lighthouse.19" had a tag "prod" then for each of it's directories there would be a
     symbolic link lighthouse@prod -> lighthouse.19.
+
+    If the artifact cache is enabled, the artifacts/ directory holds the downloaded
+    artifacts of builds whose pulls have not (yet) completed. See ArtifactCache.
+
+    If atomic publishing is enabled, each build also has a builds/ directory holding a
+    symbolic link to each of its Content directories, and a tag is a single symbolic
+    link to that directory, e.g. builds/lighthouse@prod -> lighthouse.19. The symbolic
+    links in the Content directories are then links through it, e.g.
+    binpkgs/lighthouse@prod -> ../builds/lighthouse@prod/binpkgs, so re-tagging
+    switches all Content at once with a single rename.
     """
 
-    def __init__(self, root: Path):
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        root: Path,
+        *,
+        stream: bool = False,
+        copy_threads: int = 1,
+        dedup: bool = False,
+        metadata_cache_size: int = METADATA_CACHE_SIZE,
+        atomic_publish: bool = False,
+        artifact_cache_size: int = 0,
+    ):
         if root != INVALID_TEST_PATH:
-            fs.init_root(root, ["tmp", *(content.value for content in Content)])
+            subdirs = ["tmp", *(content.value for content in Content)]
+            subdirs += ["objects"] if dedup else []
+            subdirs += ["builds"] if atomic_publish else []
+            subdirs += ["artifacts"] if artifact_cache_size else []
+            fs.init_root(root, subdirs)
         self.root = root
+        self.stream = stream
+        self.copy_threads = copy_threads
+        self.dedup = dedup
+        self.atomic_publish = atomic_publish
+        self.metadata_cache = MetadataCache(metadata_cache_size)
+        self.artifact_cache = ArtifactCache(root / "artifacts", artifact_cache_size)
+        self._symlinks: (
+            tuple[tuple[int, ...], int, dict[str, tuple[Path, ...]]] | None
+        ) = None
+        self._symlinks_lock = threading.Lock()
 
     @classmethod
     def from_settings(cls, settings: Settings) -> Self:
         """Instantiate from settings"""
-        return cls(settings.STORAGE_PATH)
+        return cls(
+            settings.STORAGE_PATH,
+            stream=settings.STORAGE_STREAM_EXTRACT,
+            copy_threads=settings.STORAGE_COPY_THREADS,
+            dedup=settings.STORAGE_DEDUP,
+            metadata_cache_size=settings.STORAGE_METADATA_CACHE_SIZE,
+            atomic_publish=settings.STORAGE_ATOMIC_PUBLISH,
+            artifact_cache_size=settings.STORAGE_ARTIFACT_CACHE_SIZE,
+        )
 
     @property
     def temp(self) -> Path:
         """Return the path of the temporary files directory in Storage"""
         return self.root / "tmp"
 
+    @property
+    def trash(self) -> Path:
+        """Return the path of the directory deleted builds are moved to"""
+        return self.root / "trash"
+
+    @property
+    def builds(self) -> Path:
+        """Return the path of the per-build directories used for atomic publishing"""
+        return self.root / "builds"
+
+    @property
+    def objects(self) -> Path:
+        """Return the path of the content-addressed object store"""
+        return self.root / "objects"
+
     @lru_cache(maxsize=256 * len(Content))
     def get_path(
         self, build: Build, content: Content, *, tag: str | None = None
@@ -99,42 +459,391 @@ def get_path(
         name = f"{build.machine}{TAG_SYM}{tag}" if tag else build.machine
         return self.root.joinpath(content.value, name)
 
-    def extract_artifact(
-        self, build: Build, byte_stream: Iterable[bytes], previous: Build | None = None
-    ) -> None:
+    def extract_artifact(  # pylint: disable=too-many-arguments
+        self,
+        build: Build,
+        byte_stream: Iterable[bytes],
+        previous: Build | Sequence[Build] | None = None,
+        *,
+        stream: bool | None = None,
+        timer: StageTimer | None = None,
+        checksum: str | None = None,
+    ) -> str | None:
         """Pull and unpack the artifact
 
-        If `previous_build` is given, then if a file exists in that location it will be
-        hard linked to the extracted tree instead of being copied from the artifact.
-        This is similar to the "--link-dest" argument in rsync and is used to save disk
-        space.
+        If `previous` is given, then if a file exists in that build it will be hard
+        linked to the extracted tree instead of being copied from the artifact. This is
+        similar to the "--link-dest" argument in rsync and is used to save disk space.
+        Like rsync, `previous` can be a list of builds. Each file is linked from the
+        first of them that has an identical file.
+
+        The number of bytes linked and copied are recorded in the build's aux
+        directory. See get_link_stats().
+
+        If `stream` is True (defaults to the Storage's `stream` attribute) then the
+        artifact is extracted as it is downloaded instead of first being saved to a
+        temporary file. It is extracted into a staging directory in tmp/ that is moved
+        into place only once the whole artifact has been extracted, so a failure part
+        way leaves nothing behind. If the stream cannot be extracted,
+        StreamExtractError is raised. Since the byte stream has then been (partially)
+        consumed, the caller should retry with a fresh byte stream and `stream=False`.
+
+        If the build's artifact is in the artifact cache, it is extracted from there and
+        the byte stream is not read. Otherwise, when not streaming, the downloaded
+        artifact is added to the cache.
+
+        The byte stream is read ahead in a separate thread so that the download
+        overlaps with writing (or extracting) it. If a `timer` is given, the time spent
+        in each stage is recorded in it.
+
+        The artifact is hashed as it is read. If a `checksum` (SHA-256 hex digest) is
+        given and the artifact does not match it, ArtifactChecksumError is raised. When
+        not streaming this happens before the artifact is extracted. When streaming,
+        it happens before the staging directory is moved into place.
+
+        Return the artifact's SHA-256 hex digest, or None if the build was already
+        pulled.
         """
         if self.pulled(build):
-            return
+            return None
 
         logger.info("Extracting build: %s", build)
+        link_dests = [previous] if isinstance(previous, Build) else list(previous or [])
+        counter = fs.LinkCounter()
+        timer = timer or StageTimer()
+        digest = hashlib.sha256()
+
+        if build not in self.artifact_cache and (
+            self.stream if stream is None else stream
+        ):
+            self._extract_streaming(
+                build,
+                byte_stream,
+                link_dests,
+                counter,
+                digest=digest,
+                checksum=checksum,
+                timer=timer,
+            )
+        else:
+            artifact = self._download(build, byte_stream, digest, checksum, timer)
+            self._extract_file(build, artifact, link_dests, counter, timer)
 
-        artifact_file = tempfile.NamedTemporaryFile(dir=self.temp, suffix=".tar.gz")
-        artifact_dir = tempfile.TemporaryDirectory(dir=self.temp)
-        with artifact_file, artifact_dir:
-            dirpath = Path(artifact_dir.name)
+        link_stats = LinkStats(linked=counter.linked, copied=counter.copied)
+        path = self.get_path(build, Content.AUX) / LINK_STATS_FILENAME
+        path.write_bytes(orjson.dumps(link_stats))  # pylint: disable=no-member
 
-            fs.save_stream(byte_stream, artifact_file)
-            fs.extract(Path(artifact_file.name), dirpath)
-            self._copy_contents(build, dirpath, previous)
+        with timer("index"):
+            try:
+                self.save_packages(build)
+            except LookupError:
+                pass
 
-        logger.info("Extracted build: %s", build)
+        if self.dedup:
+            with timer("dedup"):
+                for item in Content:
+                    fs.dedup_tree(self.get_path(build, item), self.objects)
 
-    def _copy_contents(
-        self, build: Build, source: Path, previous: Build | None
+        logger.info(
+            "Extracted build: %s (%.0f%% linked)", build, link_stats.ratio * 100
+        )
+
+        return digest.hexdigest()
+
+    def _extract_streaming(  # pylint: disable=too-many-arguments
+        self,
+        build: Build,
+        byte_stream: Iterable[bytes],
+        link_dests: Sequence[Build],
+        counter: fs.LinkCounter,
+        *,
+        digest: "hashlib._Hash",
+        checksum: str | None,
+        timer: StageTimer,
+    ) -> None:
+        """Download, extract and verify the artifact into a staging directory
+
+        The staging directory is moved into place only once the whole artifact has been
+        extracted and its checksum verified.
+        """
+        byte_stream = fs.prefetch(fs.hashed(byte_stream, digest))
+
+        with (
+            timer("download+extract"),
+            tempfile.TemporaryDirectory(dir=self.temp) as staging,
+        ):
+            try:
+                self._extract_stream(Path(staging), byte_stream, link_dests, counter)
+            except (tarfile.TarError, EOFError) as error:
+                raise StreamExtractError(build) from error
+            verify_checksum(build, digest.hexdigest(), checksum)
+            self._install(build, Path(staging))
+
+    def _download(  # pylint: disable=too-many-arguments
+        self,
+        build: Build,
+        byte_stream: Iterable[bytes],
+        digest: "hashlib._Hash",
+        checksum: str | None,
+        timer: StageTimer,
+    ) -> Path:
+        """Download the artifact to a file, or use the cached one, and verify it
+
+        The (partial) artifact file is locked while it is downloaded to. If another pull
+        holds the lock, or if the byte stream resumes from an offset (its `start`
+        attribute) other than the end of the file, PartialArtifactError is raised.
+
+        `digest` is updated with the whole artifact. Return the path of the artifact.
+        """
+        partial = self.partial_artifact(build)
+
+        if (artifact := self.artifact_cache.get(build)) is not None:
+            logger.info("Using cached artifact for build: %s", build)
+            with artifact.open("rb") as artifact_file:
+                for chunk in fs.read_chunks(artifact_file):
+                    digest.update(chunk)
+        else:
+            # Appended to, as the (partial) artifact from a failed pull is kept
+            with timer("download"), partial.open("a+b") as artifact_file:
+                self._lock_partial_artifact(build, artifact_file, byte_stream)
+                artifact_file.seek(0)
+                for chunk in fs.read_chunks(artifact_file):
+                    digest.update(chunk)
+                fs.save_stream(
+                    fs.prefetch(fs.hashed(byte_stream, digest)), artifact_file
+                )
+            artifact = partial
+
+        try:
+            verify_checksum(build, digest.hexdigest(), checksum)
+        except ArtifactChecksumError:
+            self.discard_partial_artifact(build)
+            self.artifact_cache.discard(build)
+            raise
+
+        if artifact == partial:
+            validator = self.download_validator(build)
+            artifact = self.artifact_cache.add(build, partial, validator) or partial
+
+        return artifact
+
+    def _extract_file(
+        self,
+        build: Build,
+        artifact: Path,
+        link_dests: Sequence[Build],
+        counter: fs.LinkCounter,
+        timer: StageTimer,
     ) -> None:
-        """Copy the build's extracted contents, at source, into Storage"""
+        """Extract the artifact file and copy its contents into Storage"""
+        # Without link_dests the contents are moved, not copied, into Storage. Their
+        # bytes are counted as they are extracted instead
+        filter_ = tarfile.tar_filter if link_dests else fs.counting_filter(counter)
+
+        with tempfile.TemporaryDirectory(dir=self.temp) as artifact_dir:
+            dirpath = Path(artifact_dir)
+
+            try:
+                with timer("extract"):
+                    fs.extract(artifact, dirpath, filter_)
+            except (tarfile.TarError, EOFError, ArtifactChecksumError):
+                # Only a corrupt artifact is discarded, e.g. not when out of disk space
+                self.artifact_cache.discard(build)
+                raise
+            finally:
+                self.discard_partial_artifact(build)
+            with timer("copy"):
+                self._copy_contents(build, dirpath, link_dests, counter)
+
+    def partial_artifact(self, build: Build) -> Path:
+        """Return the path the build's artifact is downloaded to when not streaming
+
+        If the download fails, the partial artifact is kept so that the download can be
+        resumed. It is removed once extracted.
+        """
+        return self.temp / f"{build}.artifact"
+
+    def _lock_partial_artifact(
+        self, build: Build, artifact_file: IO[bytes], byte_stream: Iterable[bytes]
+    ) -> None:
+        """Lock the open partial artifact file for the byte stream to be appended to
+
+        The lock is held until the file is closed. When starting a new download, the
+        byte stream's `validator` attribute (see download_validator()) is saved.
+        """
+        try:
+            fcntl.flock(artifact_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise PartialArtifactError(build, "in use by another pull") from None
+
+        size = os.fstat(artifact_file.fileno()).st_size
+        start = getattr(byte_stream, "start", None)
+
+        if start is not None and start != size:
+            raise PartialArtifactError(build, f"expected {start} bytes, found {size}")
+
+        if not size:
+            validator = self.partial_artifact_validator(build)
+            if isinstance(value := getattr(byte_stream, "validator", None), str):
+                validator.write_text(value, encoding="utf-8")
+            else:
+                validator.unlink(missing_ok=True)
+
+    def partial_artifact_validator(self, build: Build) -> Path:
+        """Return the path the validator of the build's partial artifact is saved to"""
+        return self.temp / f"{build}.artifact.validator"
+
+    def discard_partial_artifact(self, build: Build) -> None:
+        """Remove the build's partial artifact (and its validator), if any"""
+        self.partial_artifact(build).unlink(missing_ok=True)
+        self.partial_artifact_validator(build).unlink(missing_ok=True)
+
+    def purge_partial_artifacts(
+        self, max_age: float = PARTIAL_ARTIFACT_MAX_AGE
+    ) -> None:
+        """Remove the partial artifacts not written to in the last max_age seconds
+
+        Failed pulls keep their partial artifact for a retry to resume from. Those that
+        are never retried would otherwise be left in the temp directory for good.
+        Partial artifacts locked by a pull in progress are left alone.
+        """
+        cutoff = time.time() - max_age
+
+        for path in self.temp.glob("*.artifact"):
+            try:
+                with path.open("rb") as artifact_file:
+                    fcntl.flock(artifact_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+                    if os.fstat(artifact_file.fileno()).st_mtime < cutoff:
+                        logger.info("Removing stale partial artifact: %s", path)
+                        self.discard_partial_artifact(
+                            Build.from_id(path.name.removesuffix(".artifact"))
+                        )
+            except (BlockingIOError, FileNotFoundError):
+                continue
+
+    def download_offset(self, build: Build, *, stream: bool | None = None) -> int:
+        """Return the byte offset to resume downloading the build's artifact from
+
+        That is the size of the partial artifact, if any. Streamed artifacts are always
+        downloaded from the start.
+        """
+        if self.stream if stream is None else stream:
+            return 0
+
+        try:
+            return self.partial_artifact(build).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def download_validator(self, build: Build) -> str | None:
+        """Return the validator (e.g. ETag) the build's partial artifact was served with
+
+        This is for resuming the download with an If-Range request. Return None if
+        there is no partial artifact or it was served without a validator.
+        """
+        if not self.partial_artifact(build).exists():
+            return None
+
+        try:
+            return self.partial_artifact_validator(build).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def _link_dest(self, link_dests: Sequence[Build], item: Content) -> fs.LinkDest:
+        return fs.LinkDest(self.get_path(build, item) for build in link_dests)
+
+    def _extract_stream(
+        self,
+        staging: Path,
+        byte_stream: Iterable[bytes],
+        link_dests: Sequence[Build],
+        counter: fs.LinkCounter,
+    ) -> None:
+        """Extract the artifact byte stream into the staging directory
+
+        Each Content is extracted into its own directory in staging. Files that are
+        unchanged from one of the link_dests builds are hard linked instead of
+        extracted.
+        """
+        destinations = {
+            item.value: (item.value, self._link_dest(link_dests, item))
+            for item in Content
+        }
+        fs.extract_stream(
+            byte_stream, staging, fs.link_dest_filter(destinations, counter)
+        )
+        # The tar reader need not read up to the end of the stream
+        fs.drain(byte_stream)
+
+        for item in Content:
+            if not (src := staging / item.value).is_dir():
+                raise FileNotFoundError(f"Artifact is missing {item.value}: {src}")
+
+    def _install(self, build: Build, staging: Path) -> None:
+        """Move the build's Content from the staging directory into place"""
         for item in Content:
-            src = source / item.value
             dst = self.get_path(build, item)
-            link_dest = self.get_path(previous, item) if previous else None
+            if dst.exists():
+                logger.warning("Destination already exists: %s. Removing", dst)
+                shutil.rmtree(dst)
+
+            os.rename(staging / item.value, dst)
+
+    def _copy_contents(
+        self,
+        build: Build,
+        source: Path,
+        link_dests: Sequence[Build],
+        counter: fs.LinkCounter,
+    ) -> None:
+        """Copy the build's extracted contents, at source, into Storage
+
+        If the Storage's `copy_threads` is greater than 1, each Content is copied
+        concurrently and files within each Content are copied by a pool of that many
+        threads. If any Content fails to copy, the others are cancelled and an
+        ExceptionGroup of the errors is raised.
+        """
+        if self.copy_threads <= 1:
+            for item in Content:
+                src = source / item.value
+                dst = self.get_path(build, item)
+                link_dest = self._link_dest(link_dests, item)
 
-            fs.copy_path(src, dst, link_dest)
+                fs.copy_path(src, dst, link_dest, counter=counter)
+            return
+
+        cancel = threading.Event()
+
+        def copy(item: Content) -> None:
+            src = source / item.value
+            dst = self.get_path(build, item)
+            link_dest = self._link_dest(link_dests, item)
+
+            try:
+                fs.copy_path(
+                    src,
+                    dst,
+                    link_dest,
+                    workers=self.copy_threads,
+                    cancel=cancel,
+                    counter=counter,
+                )
+            except Exception:
+                cancel.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=len(Content)) as executor:
+            futures = [executor.submit(copy, item) for item in Content]
+
+        errors = [
+            error
+            for future in futures
+            if isinstance(error := future.exception(), Exception)
+            and not isinstance(error, fs.CopyCancelled)
+        ]
+        if errors:
+            raise ExceptionGroup(f"Failed to copy the contents of {build}", errors)
 
     def pulled(self, build: Build) -> bool:
         """Returns True if build has been pulled
@@ -165,10 +874,42 @@ def tag(self, build: Build, tag_name: str) -> None:
 
         name = f"{build.machine}{TAG_SYM}{tag_name}" if tag_name else build.machine
 
+        if self.atomic_publish:
+            self._tag_atomic(build, name)
+            return
+
         for item in Content:
             path = self.root / item.value / name
             fs.symlink(str(build), str(path))
 
+    def _tag_atomic(self, build: Build, name: str) -> None:
+        """Point the builds/ symlink for name to the build's directory
+
+        The Content symlinks are links through it and are only (re)created when they
+        are not already.
+        """
+        build_dir = self.builds / str(build)
+
+        if not build_dir.is_dir():
+            self.builds.mkdir(exist_ok=True)
+            temp = Path(tempfile.mkdtemp(dir=self.temp))
+            for item in Content:
+                (temp / item.value).symlink_to(f"../../{item.value}/{build}")
+            try:
+                temp.rename(build_dir)
+            except OSError:
+                # Created in the meantime
+                shutil.rmtree(temp)
+
+        fs.symlink(str(build), str(self.builds / name))
+
+        for item in Content:
+            path = str(self.root / item.value / name)
+            target = f"../builds/{name}/{item.value}"
+
+            if not (os.path.islink(path) and os.readlink(path) == target):
+                fs.symlink(target, path)
+
     def untag(self, machine: str, tag_name: str = "") -> None:
         """Untag a build.
 
@@ -181,8 +922,10 @@ def untag(self, machine: str, tag_name: str = "") -> None:
         # want to as this will allow us to remove dangling symlinks
         name = f"{machine}{TAG_SYM}{tag_name}" if tag_name else machine
 
-        for item in Content:
-            path = self.root / item.value / name
+        for path in [
+            *(self.root / item.value / name for item in Content),
+            self.builds / name,
+        ]:
             if path.is_symlink():
                 path.unlink()
 
@@ -198,9 +941,13 @@ def get_tags(self, build: Build) -> list[str]:
         if self.published(build):
             tags.append("")
 
-        for path in (self.root / Content.BINPKGS.value).glob(f"{machine}{TAG_SYM}*"):
-            tag = path.name.partition(TAG_SYM)[2]
-            if self.check_symlinks(build, f"{machine}{TAG_SYM}{tag}"):
+        for name in self.symlinks():
+            symlink_machine, tag_sym, tag = name.partition(TAG_SYM)
+            if (
+                tag_sym
+                and symlink_machine == machine
+                and self.check_symlinks(build, name)
+            ):
                 tags.append(tag)
 
         tags.sort()
@@ -225,10 +972,7 @@ def resolve_tag(self, tag: str) -> Build:
         # In order for this tag to resolve, all the content has to exist and point to
         # the same build and the build has to exist in storage
         target_builds = set()
-        for item in Content:
-            symlink = self.root / item.value / tag
-            target = symlink.resolve()
-
+        for target in self.symlinks().get(tag, ()):
             if not target.exists():
                 break
 
@@ -240,7 +984,8 @@ def resolve_tag(self, tag: str) -> Build:
             if len(target_builds) != 1:
                 break
         else:
-            return Build(machine, target_builds.pop())
+            if target_builds:
+                return Build(machine, target_builds.pop())
 
         raise FileNotFoundError(f"Tag is broken or does not exist: {tag!r}")
 
@@ -269,14 +1014,92 @@ def check_symlinks(self, build: Build, name: str) -> bool:
 
         Symlinks have to exist for all `Content`.
         """
-        return all(
-            fs.check_symlink(
-                str(self.root.joinpath(item.value, name)),
-                str(self.get_path(build, item)),
-            )
-            for item in Content
+        targets = self.symlinks().get(name)
+
+        return targets is not None and all(
+            str(target) == str(self.get_path(build, item))
+            for target, item in zip(targets, Content)
         )
 
+    def symlinks(self) -> Mapping[str, tuple[Path, ...]]:
+        """Return the (resolved) targets of the symlinks in Storage
+
+        Keys are the symlink names (e.g. "lighthouse", "lighthouse@stable") and values
+        are the real paths of the symlinks for each `Content`. Only names that are
+        symlinks for all `Content` are included.
+
+        The result is cached until the binpkgs directory changes (any symlink creation
+        or removal changes its mtime). With atomic publishing, re-tagging only changes
+        the builds directory so its mtime is also taken into account. The cache is not
+        used if the scan was within SYMLINKS_SETTLE_NS of the mtime, as a change after
+        the scan could have left the mtime as it was.
+        """
+        binpkgs = self.root / Content.BINPKGS.value
+        directories = [binpkgs, self.builds] if self.atomic_publish else [binpkgs]
+        mtimes = tuple(directory.stat().st_mtime_ns for directory in directories)
+
+        with self._symlinks_lock:
+            if self._symlinks is not None:
+                cached_mtimes, scanned_ns, cached = self._symlinks
+
+                if (
+                    cached_mtimes == mtimes
+                    and scanned_ns - max(mtimes) > SYMLINKS_SETTLE_NS
+                ):
+                    return cached
+
+            scanned_ns = time.time_ns()
+            symlinks: dict[str, tuple[Path, ...]] = {}
+            for entry in os.scandir(binpkgs):
+                if not entry.is_symlink():
+                    continue
+                paths = [self.root / item.value / entry.name for item in Content]
+                if all(path.is_symlink() for path in paths):
+                    symlinks[entry.name] = tuple(
+                        Path(os.path.realpath(path)) for path in paths
+                    )
+
+            self._symlinks = (mtimes, scanned_ns, symlinks)
+
+            return symlinks
+
+    def snapshot(self) -> StorageSnapshot:
+        """Return a StorageSnapshot of the builds and symlinks in Storage
+
+        This does a single os.scandir() pass over each `Content` directory. Only
+        symlinks are resolved.
+        """
+        builds: dict[Content, frozenset[str]] = {}
+        symlinks: dict[Content, dict[str, str]] = {}
+        broken: dict[Content, frozenset[str]] = {}
+
+        for item in Content:
+            directory = str(self.root / item.value)
+            with os.scandir(directory) as entries:
+                names = {entry.name: entry.is_symlink() for entry in entries}
+
+            builds[item] = frozenset(
+                name
+                for name, is_symlink in names.items()
+                if "." in name and not is_symlink
+            )
+            symlinks[item] = {
+                name: os.path.realpath(os.path.join(directory, name))
+                for name, is_symlink in names.items()
+                if is_symlink
+            }
+            broken[item] = frozenset(
+                name
+                for name, target in symlinks[item].items()
+                if not (
+                    os.path.basename(target) in names
+                    if os.path.dirname(target) == directory
+                    else os.path.exists(target)
+                )
+            )
+
+        return StorageSnapshot(builds=builds, symlinks=symlinks, broken=broken)
+
     def repos(self, build: Build) -> set[str]:
         """Return the repos for this (pulled) build"""
         if not self.pulled(build):
@@ -286,16 +1109,69 @@ def repos(self, build: Build) -> set[str]:
 
         return {path.name for path in repos_path.iterdir() if path.is_dir()}
 
-    def delete(self, build: Build) -> None:
+    def delete(self, build: Build, *, keep_partial: bool = False) -> None:
         """Delete files/dirs associated with build
 
+        The build's directories are (atomically) moved into the trash directory so this
+        returns quickly. They are actually removed by empty_trash().
+
+        The build's partial artifact is also removed unless `keep_partial` is True, e.g.
+        so that a retried pull can resume downloading it.
+
         Does not fix dangling symlinks.
         """
+        self.metadata_cache.discard(build)
+
+        if not keep_partial:
+            self.discard_partial_artifact(build)
+
+        self.trash.mkdir(exist_ok=True)
+        token = uuid.uuid4().hex
+
         for item in Content:
-            shutil.rmtree(self.get_path(build, item), ignore_errors=True)
+            path = self.get_path(build, item)
+
+            try:
+                path.rename(self.trash / f"{build}.{item.value}.{token}")
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                # Content on a different filesystem than the trash
+                if error.errno != errno.EXDEV:
+                    raise
+                shutil.rmtree(path, ignore_errors=True)
+
+        if (build_dir := self.builds / str(build)).is_dir():
+            shutil.rmtree(build_dir)
+
+    def empty_trash(self) -> None:
+        """Remove the contents of the trash directory at idle I/O priority
+
+        If deduplication is enabled, objects that are referenced only by the trash are
+        removed from the object store. Stale partial artifacts are also removed (see
+        purge_partial_artifacts()).
+        """
+        self.purge_partial_artifacts()
+
+        if not (trash := list(self.trash.glob("*"))):
+            return
+
+        if self.dedup:
+            fs.release_objects(trash, self.objects)
+
+        for path in trash:
+            fs.remove_tree(path)
 
     def package_index_file(self, build: Build) -> IO[str]:
-        """Return a file object for the Packages index file"""
+        """Return a file object for the Packages index file
+
+        Deprecated. Use get_packages() or parse_packages() instead.
+        """
+        warnings.warn(
+            "package_index_file() is deprecated. Use get_packages() instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         package_index_path = self.get_path(build, Content.BINPKGS) / "Packages"
 
         if not package_index_path.exists():
@@ -305,81 +1181,326 @@ def package_index_file(self, build: Build) -> IO[str]:
         return package_index_path.open(encoding="utf-8")
 
     def get_packages(self, build: Build) -> list[Package]:
-        """Return the list of packages for this build"""
-        with self.package_index_file(build) as package_index_file:
-            # Skip preamble (for now)
-            while package_index_file.readline().rstrip():
-                pass
+        """Return the list of packages for this build
+
+        Packages are read from the build's pre-parsed packages file (see
+        save_packages()) when it is up to date with the Packages index. Otherwise the
+        index itself is parsed. Either way the result is cached (in-process) keyed on the
+        Packages file's inode, mtime and size.
+        """
+        build = Build(build.machine, build.build_id)
+
+        return list(self._get_packages(build, self._packages_key(build)))
+
+    def get_package(self, build: Build, cpv: str, build_id: int) -> Package:
+        """Return the build's package with the given cpv and (binpkg) build_id
+
+        Lookups are done against a hash index of the build's packages. The index is
+        built from the same (cached) packages that get_packages() returns, so the
+        Packages index is not parsed when the pre-parsed packages file is up to date.
+
+        If the package does not exist, raise LookupError.
+        """
+        build = Build(build.machine, build.build_id)
+        index = self._get_package_index(build, self._packages_key(build))
+
+        try:
+            return index[cpv, build_id]
+        except KeyError:
+            raise LookupError(f"{cpv}-{build_id} not found in {build}") from None
+
+    def _packages_key(self, build: Build) -> tuple[int, int, int]:
+        """Return the cache key (inode, mtime, size) of the build's Packages index"""
+        path = self.get_path(build, Content.BINPKGS) / "Packages"
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            logger.warning("Build %s is missing package index", build)
+            raise LookupError(f"{path} is missing") from None
+
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @lru_cache(maxsize=PACKAGES_CACHE_SIZE)
+    def _get_package_index(
+        self, build: Build, key: tuple[int, int, int]
+    ) -> dict[tuple[str, int], Package]:
+        return {(p.cpv, p.build_id): p for p in self._get_packages(build, key)}
+
+    @lru_cache(maxsize=PACKAGES_CACHE_SIZE)
+    def _get_packages(
+        self, build: Build, key: tuple[int, int, int]
+    ) -> tuple[Package, ...]:
+        path = self.get_path(build, Content.AUX) / PACKAGES_FILENAME
 
-            return list(make_packages(package_index_file, build))
+        try:
+            json = orjson.loads(path.read_bytes())  # pylint: disable=no-member
+        except (FileNotFoundError, orjson.JSONDecodeError):  # pylint: disable=no-member
+            json = None
+
+        # The pre-parsed packages file is valid if the Packages mtime and size match
+        if json and json["packages_stat"] == list(key[1:]):
+            return tuple(Package.from_row(row, build) for row in json["packages"])
+
+        return tuple(self._parse_packages(build))
+
+    def _parse_packages(self, build: Build) -> list[Package]:
+        """Parse the build's Packages index (mmap-ed)"""
+        path = self.get_path(build, Content.BINPKGS) / "Packages"
+
+        try:
+            index = path.open("rb")
+        except FileNotFoundError:
+            logger.warning("Build %s is missing package index", build)
+            raise LookupError(f"{path} is missing") from None
+
+        with index:
+            if os.fstat(index.fileno()).st_size == 0:
+                return []
+
+            with mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return list(parse_packages(buffer, build))
+
+    def save_packages(self, build: Build) -> None:
+        """Save the build's parsed Packages index to the build's aux directory
+
+        This is a compact JSON file that get_packages() can read instead of parsing
+        the Packages index.
+        """
+        index = self.get_path(build, Content.BINPKGS) / "Packages"
+        path = self.get_path(build, Content.AUX) / PACKAGES_FILENAME
+        stat = index.stat()
+
+        packages = [package.row() for package in self._parse_packages(build)]
+
+        json = {"packages_stat": [stat.st_mtime_ns, stat.st_size], "packages": packages}
+        fs.write_atomic(path, orjson.dumps(json))  # pylint: disable=no-member
+
+    def set_delta(
+        self, build: Build, previous: Build, changes: Iterable[Change]
+    ) -> None:
+        """Save the build's package changes since the previous build
+
+        The delta is saved to the build's aux directory along with the stats of both
+        builds' Packages indexes, so that get_delta() can tell when it is out of date.
+        """
+        path = self.get_path(build, Content.AUX) / DELTA_FILENAME
+        stats = [self._packages_key(b)[1:] for b in (previous, build)]
+        json = {
+            "previous": previous.id,
+            "packages_stat": stats,
+            "changes": [[c.status.value, *c.package.row()] for c in changes],
+        }
+        fs.write_atomic(path, orjson.dumps(json))  # pylint: disable=no-member
+
+    def get_delta(self, build: Build) -> tuple[Build, list[Change]]:
+        """Return the previous build and the package changes saved by set_delta()
+
+        Removed packages belong to the previous build and added packages to the build.
+        If the build has no delta, or either build's Packages index has changed since it
+        was saved, raise LookupError.
+        """
+        build = Build(build.machine, build.build_id)
+        path = self.get_path(build, Content.AUX) / DELTA_FILENAME
+
+        try:
+            json = orjson.loads(path.read_bytes())  # pylint: disable=no-member
+        except (FileNotFoundError, orjson.JSONDecodeError):  # pylint: disable=no-member
+            raise LookupError(f"{build} has no package delta") from None
+
+        previous = Build.from_id(json["previous"])
+        stats = [list(self._packages_key(b)[1:]) for b in (previous, build)]
+
+        if json["packages_stat"] != stats:
+            raise LookupError(f"The package delta of {build} is out of date")
+
+        changes: list[Change] = []
+        for value, *row in json["changes"]:
+            status = ChangeState(value)
+            package = Package.from_row(
+                row, previous if status is ChangeState.REMOVED else build
+            )
+            changes.append(Change(package.cpvb(), status, package))
+
+        return previous, changes
 
     def get_metadata(self, build: Build) -> GBPMetadata:
         """Read binpkg/gbp.json and return GBPMetadata instance
 
+        Metadata are cached (see MetadataCache) so the file is only re-read when it
+        changes.
+
         If the file does not exist (e.g. not pulled), raise LookupError
         """
         path = self.get_path(build, Content.BINPKGS) / GBP_METADATA_FILENAME
 
         try:
-            json = orjson.loads(path.read_bytes())  # pylint: disable=no-member
+            with path.open("rb") as metadata_file:
+                stat = os.fstat(metadata_file.fileno())
+                key = (stat.st_mtime_ns, stat.st_size)
+
+                if metadata := self.metadata_cache.get(build, key):
+                    return metadata
+
+                json = orjson.loads(metadata_file.read())  # pylint: disable=no-member
         except FileNotFoundError:
             raise LookupError(
                 f"{GBP_METADATA_FILENAME} does not exist for {build}"
             ) from None
 
-        return GBPMetadata(
-            build_duration=json["build_duration"],
-            packages=PackageMetadata(
-                total=json["packages"]["total"],
-                size=json["packages"]["size"],
-                built=[
-                    Package(
-                        build_id=built["build_id"],
-                        build_time=built["build_time"],
-                        cpv=built["cpv"],
-                        path=built["path"],
-                        repo=built["repo"],
-                        size=built["size"],
-                        build=Build(machine=build.machine, build_id=build.build_id),
-                    )
-                    for built in json["packages"]["built"]
-                ],
-            ),
-        )
+        metadata = make_metadata(json, build)
+        self.metadata_cache.set(build, key, metadata)
+
+        return metadata
+
+    def get_link_stats(self, build: Build) -> LinkStats:
+        """Return the bytes hard linked vs. copied when the build was pulled
+
+        If the build was not pulled or was pulled before these were recorded, raise
+        LookupError.
+        """
+        path = self.get_path(build, Content.AUX) / LINK_STATS_FILENAME
+
+        try:
+            json = orjson.loads(path.read_bytes())  # pylint: disable=no-member
+        except FileNotFoundError:
+            raise LookupError(
+                f"{LINK_STATS_FILENAME} does not exist for {build}"
+            ) from None
+
+        return LinkStats(linked=json["linked"], copied=json["copied"])
 
     def set_metadata(self, build: Build, metadata: GBPMetadata) -> None:
         """Save metadata to "gbp.json" in the binpkgs directory"""
         path = self.get_path(build, Content.BINPKGS) / GBP_METADATA_FILENAME
         path.write_bytes(orjson.dumps(metadata))  # pylint: disable=no-member
+        self.metadata_cache.discard(build)
+
+
+def verify_checksum(build: Build, digest: str, checksum: str | None) -> None:
+    """Raise ArtifactChecksumError if the digest does not match the given checksum
+
+    If there is no checksum to verify against, do nothing.
+    """
+    if checksum is not None and digest != checksum.lower():
+        raise ArtifactChecksumError(build, checksum, digest)
+
+
+def make_metadata(json: dict[str, Any], build: Build) -> GBPMetadata:
+    """Given the (decoded) contents of gbp.json, return a GBPMetadata object"""
+    return GBPMetadata(
+        build_duration=json["build_duration"],
+        packages=PackageMetadata(
+            total=json["packages"]["total"],
+            size=json["packages"]["size"],
+            built=tuple(
+                Package(
+                    build_id=built["build_id"],
+                    build_time=built["build_time"],
+                    cpv=built["cpv"],
+                    path=built["path"],
+                    repo=built["repo"],
+                    size=built["size"],
+                    build=Build(machine=build.machine, build_id=build.build_id),
+                )
+                for built in json["packages"]["built"]
+            ),
+        ),
+        artifact_sha256=json.get("artifact_sha256"),
+    )
 
 
 def make_package_from_lines(lines: Iterable[str], build: Build) -> Package:
-    """Given the appropriate lines from Packages, return a Package object"""
-    package_info = {
-        name.lower(): value.rstrip()
-        for (name, value) in (string.namevalue(line, ":") for line in lines)
-    }
+    """Given the appropriate lines from Packages, return a Package object
 
-    try:
-        return Package(
-            cpv=package_info["cpv"],
-            repo=package_info["repo"],
-            path=package_info["path"],
-            build_id=int(package_info["build_id"]),
-            size=int(package_info["size"]),
-            build_time=int(package_info["build_time"]),
-            build=Build(machine=build.machine, build_id=build.build_id),
-        )
-    except KeyError as error:
-        raise ValueError(
-            f"Package lines missing {error.args[0].upper()} value"
-        ) from None
+    Deprecated. Use parse_packages() instead.
+    """
+    warnings.warn(
+        "make_package_from_lines() is deprecated. Use parse_packages() instead",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    fields: dict[bytes, bytes] = {}
+
+    for line in lines:
+        name, _, value = line.encode().partition(b":")
+        fields[name.strip().upper()] = value.strip()
+
+    return package_from_fields(fields, Build(build.machine, build.build_id))
 
 
 def make_packages(package_index_file: IO[str], build: Build) -> Iterable[Package]:
     """Yield Packages from Package index file
 
     Assumes file pointer is after the preamble.
+
+    Deprecated. Use parse_packages() instead.
+    """
+    warnings.warn(
+        "make_packages() is deprecated. Use parse_packages() instead",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    # The leading blank line is an empty preamble
+    yield from parse_packages(f"\n{package_index_file.read()}".encode(), build)
+
+
+def parse_packages(buffer: bytes | mmap.mmap, build: Build) -> Iterable[Package]:
+    """Yield Packages from the (bytes of the) Packages index
+
+    The preamble is skipped. The buffer is scanned line by line, so it is never copied
+    as a whole, and only the values of the fields needed for Package are decoded.
+
+    Raise ValueError if a line is not a "NAME: value" pair or a package is missing a
+    field.
     """
-    for section in utils.string.get_sections(package_index_file):
-        yield make_package_from_lines(section, build)
+    build = Build(machine=build.machine, build_id=build.build_id)
+    fields: dict[bytes, bytes] = {}
+    preamble = True
+    section = False
+    pos, size = 0, len(buffer)
+
+    while pos < size:
+        if (eol := buffer.find(b"\n", pos)) < 0:
+            eol = size
+        line, pos = buffer[pos:eol].strip(), eol + 1
+
+        if not line:
+            # The preamble ends at the first blank line
+            preamble = False
+            if section:
+                yield package_from_fields(fields, build)
+                fields, section = {}, False
+            continue
+
+        if preamble:
+            continue
+
+        name, delim, value = line.partition(b":")
+        if not delim:
+            raise ValueError(f"Invalid line in Packages index: {line.decode()!r}")
+
+        section = True
+        if (name := name.rstrip().upper()) in PACKAGE_FIELDS:
+            fields[name] = value.lstrip()
+
+    if section:
+        yield package_from_fields(fields, build)
+
+
+def package_from_fields(fields: dict[bytes, bytes], build: Build) -> Package:
+    """Given the (byte) field values from Packages, return a Package object"""
+    try:
+        return Package(
+            cpv=fields[b"CPV"].decode(),
+            repo=fields[b"REPO"].decode(),
+            path=fields[b"PATH"].decode(),
+            build_id=int(fields[b"BUILD_ID"]),
+            size=int(fields[b"SIZE"]),
+            build_time=int(fields[b"BUILD_TIME"]),
+            build=build,
+        )
+    except KeyError as error:
+        raise ValueError(
+            f"Package lines missing {error.args[0].decode()} value"
+        ) from None
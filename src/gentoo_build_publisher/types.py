@@ -3,13 +3,17 @@
 import datetime as dt
 from dataclasses import dataclass, field
 from enum import Enum, unique
-from typing import Any, Protocol, Self
+from typing import Any, Protocol, Self, Sequence
 
 from gentoo_build_publisher import utils
 
 # Symbol used to designate a build tag
 TAG_SYM = "@"
 
+# Package fields, in order, of the rows stored in the pre-parsed packages and delta
+# files
+PACKAGE_ROW_FIELDS = ("cpv", "repo", "path", "build_id", "size", "build_time")
+
 
 class InvalidBuild(ValueError):
     """Build not in machine.build_id format"""
@@ -90,6 +94,15 @@ class Package:
     This is a Build, not a BuildRecord
     """
 
+    @classmethod
+    def from_row(cls, row: Sequence[Any], build: Build) -> Self:
+        """Instantiate Package given a row as returned by .row()"""
+        return cls(**dict(zip(PACKAGE_ROW_FIELDS, row, strict=True)), build=build)
+
+    def row(self) -> list[Any]:
+        """Return the package's fields, less the build, as a (JSON-friendly) list"""
+        return [getattr(self, name) for name in PACKAGE_ROW_FIELDS]
+
     def cpvb(self) -> str:
         """return cpv + build id"""
         return f"{self.cpv}-{self.build_id}"
@@ -133,13 +146,33 @@ class Change:
     package: Package
 
 
+@dataclass(frozen=True)
+class PackageHistory:
+    """A package's changes over a range of builds"""
+
+    item: str
+    """The package's cpvb"""
+
+    package: Package
+    """The package as of its last change"""
+
+    added: Build | None
+    """First build in the range the package was added in, if any"""
+
+    removed: Build | None
+    """Last build in the range the package was removed in, if any"""
+
+    builds: tuple[Build, ...]
+    """Builds in the range the package changed in"""
+
+
 @dataclass(frozen=True)
 class PackageMetadata:
     """data structure for a build's package metadata"""
 
     total: int
     size: int
-    built: list[Package]
+    built: tuple[Package, ...]
 
 
 @dataclass(frozen=True)
@@ -153,6 +186,25 @@ class GBPMetadata:
     packages: PackageMetadata
     gbp_hostname: str = utils.get_hostname()
     gbp_version: str = utils.get_version()
+    artifact_sha256: str | None = None
+
+
+@dataclass(frozen=True)
+class LinkStats:
+    """How many bytes of a pulled build were hard linked vs. copied
+
+    Storage writes this to each build's aux directory when the build is pulled.
+    """
+
+    linked: int
+    copied: int
+
+    @property
+    def ratio(self) -> float:
+        """The fraction of the build's bytes that were hard linked"""
+        total = self.linked + self.copied
+
+        return self.linked / total if total else 0.0
 
 
 class CacheProtocol(Protocol):
@@ -1,18 +1,135 @@
 """Filesystem Operations"""
 
+import errno
+import hashlib
+import io
+import itertools
 import logging
 import os
+import queue
 import shutil
+import signal
+import stat as statlib
+import subprocess
 import tarfile
-from contextlib import contextmanager
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from functools import cache
 from pathlib import Path
-from typing import IO, Callable, Generator, Iterable, TypeVar
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    TypeVar,
+    cast,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from hashlib import _Hash
+
+    from _typeshed import WriteableBuffer
 
 _T = TypeVar("_T", bytes, str)
+BUFSIZE = 64 * 1024
+PREFETCH_SIZE = 8  # items (e.g. download chunks)
+type TarFilter = Callable[[tarfile.TarInfo, str], tarfile.TarInfo | None]
+
+# Magic numbers of the compression formats we can decompress
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gz",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zst",
+}
+# External (multi-threaded) decompressors for each compression format
+DECOMPRESSORS = {
+    "gz": ("pigz", "-dc"),
+    "xz": ("xz", "-dc", "-T0"),
+    "zst": ("zstd", "-dc", "-T0"),
+}
+MAGIC_SIZE = max(len(magic) for magic in COMPRESSION_MAGIC)
 
 logger = logging.getLogger(__name__)
 
 
+class UnsupportedCompressionError(Exception):
+    """The archive's compression can be decompressed neither by Python nor externally"""
+
+
+class CopyCancelled(Exception):
+    """The copy was cancelled before it could complete"""
+
+
+class FileStat(NamedTuple):
+    """The parts of a (regular) file's stat used for rsync-style quick checks"""
+
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+class LinkCounter:  # pylint: disable=too-few-public-methods
+    """Thread-safe tally of the bytes hard linked from a link-dest vs. copied"""
+
+    def __init__(self) -> None:
+        self.linked = 0
+        self.copied = 0
+        self._lock = threading.Lock()
+
+    def add(self, size: int, *, linked: bool) -> None:
+        """Add size bytes to the linked or copied tally"""
+        with self._lock:
+            if linked:
+                self.linked += size
+            else:
+                self.copied += size
+
+
+class LinkDest:
+    """An ordered list of link-dest candidates, like rsync's repeatable --link-dest
+
+    A candidate tree is only scanned (see stat_index()) once a file has not been found
+    in the candidates before it.
+    """
+
+    def __init__(self, roots: Iterable[Path]) -> None:
+        self.roots = list(roots)
+        self._indexes: list[dict[str, FileStat]] = []
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.roots)
+
+    def find(self, relative: str, size: int, mtime_ns: int) -> str | None:
+        """Return the path of the first candidate's file that passes the quick check
+
+        relative is the file's path relative to the candidate roots. If no candidate
+        has a matching file, return None.
+        """
+        for i, root in enumerate(self.roots):
+            target = self._index(i).get(relative)
+
+            if target and target.size == size and target.mtime_ns == mtime_ns:
+                return os.path.join(root, relative)
+
+        return None
+
+    def _index(self, i: int) -> dict[str, FileStat]:
+        with self._lock:
+            while len(self._indexes) <= i:
+                self._indexes.append(stat_index(self.roots[len(self._indexes)]))
+
+            return self._indexes[i]
+
+
 def init_root(root: Path, subdirs: list[str] | None) -> None:
     """Initialize storage root, if necessary"""
     root.mkdir(parents=True, exist_ok=True)
@@ -21,19 +138,331 @@ def init_root(root: Path, subdirs: list[str] | None) -> None:
         root.joinpath(subdir).mkdir(exist_ok=True)
 
 
-def extract(infile: Path, outdir: Path) -> None:
+def extract(
+    infile: Path, outdir: Path, filter_: TarFilter = tarfile.tar_filter
+) -> None:
     """Extract the given (compressed) tarfile into the given directory
 
     The directory is created if it does not exist.
+
+    The compression (gzip, xz or zstd) is detected from the file's contents. If an
+    external decompressor for it (see DECOMPRESSORS) is installed, the file is
+    decompressed by it in a separate process, otherwise it is decompressed by Python.
+
+    `filter_` is the tarfile extraction filter to use.
     """
     logger.info("Extracting %s to %s", infile, outdir)
+    name = compression(infile)
 
-    with tarfile.open(infile, mode="r") as tar_file:
-        tar_file.extractall(outdir, filter="tar")
+    if (command := decompressor(name)) is None:
+        check_decompressible(name)
+        with tarfile.open(infile, mode="r") as tar_file:
+            tar_file.extractall(outdir, filter=filter_)
+    else:
+        extract_with(command, infile, outdir, filter_)
 
     logger.info("Extracted %s to %s", infile, outdir)
 
 
+def extract_with(
+    command: tuple[str, ...],
+    infile: Path,
+    outdir: Path,
+    filter_: TarFilter = tarfile.tar_filter,
+) -> None:
+    """Extract the compressed tarfile piped through the given decompressor command
+
+    If the decompressor fails, raise tarfile.ReadError with what it wrote to stderr.
+    """
+    with infile.open("rb") as stdin:
+        _extract_with(command, stdin, outdir, filter_)
+
+
+def extract_stream_with(
+    command: tuple[str, ...],
+    stream: Iterable[bytes],
+    outdir: Path,
+    filter_: TarFilter = tarfile.tar_filter,
+) -> None:
+    """Extract the compressed tar byte stream piped through the given decompressor
+
+    The stream is fed to the decompressor from a separate thread. If the stream raises,
+    that exception is re-raised rather than the error of the (then truncated)
+    decompression.
+    """
+    errors: list[Exception] = []
+
+    def feed(pipe: IO[bytes]) -> None:
+        try:
+            for chunk in stream:
+                pipe.write(chunk)
+        except BrokenPipeError:
+            # The decompressor (or tarfile) gave up first
+            pass
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            errors.append(error)
+        finally:
+            with suppress(BrokenPipeError):
+                pipe.close()
+
+    try:
+        _extract_with(command, subprocess.PIPE, outdir, filter_, feed=feed)
+    except (tarfile.TarError, EOFError):
+        if not errors:
+            raise
+
+    if errors:
+        raise errors[0]
+
+
+def _extract_with(
+    command: tuple[str, ...],
+    stdin: IO[bytes] | int,
+    outdir: Path,
+    filter_: TarFilter = tarfile.tar_filter,
+    *,
+    feed: Callable[[IO[bytes]], None] | None = None,
+) -> None:
+    """Extract the tar archive the decompressor command writes to stdout
+
+    If `feed` is given it is called, in a separate thread, with the decompressor's stdin
+    pipe.
+    """
+    tar_error: tarfile.TarError | EOFError | None = None
+    feeder: threading.Thread | None = None
+
+    # stderr goes to a file rather than a pipe so the decompressor can never block on
+    # it while we are reading its stdout
+    with tempfile.TemporaryFile() as stderr:
+        with subprocess.Popen(
+            command, stdin=stdin, stdout=subprocess.PIPE, stderr=stderr
+        ) as process:
+            assert process.stdout is not None
+
+            if feed is not None:
+                feeder = threading.Thread(target=feed, args=(process.stdin,))
+                feeder.start()
+
+            try:
+                with tarfile.open(fileobj=process.stdout, mode="r|") as tar_file:
+                    tar_file.extractall(outdir, filter=filter_)
+
+                # Drain any trailing padding so the decompressor does not die of SIGPIPE
+                while process.stdout.read(BUFSIZE):
+                    pass
+            except (tarfile.TarError, EOFError) as error:
+                tar_error = error
+            finally:
+                if feeder is not None:
+                    # If we gave up early, this makes the decompressor, and in turn the
+                    # feeder, give up too
+                    process.stdout.close()
+                    feeder.join()
+
+        # If tarfile gave up first, the decompressor dies of SIGPIPE. That's not its
+        # failure
+        if process.returncode and not (
+            tar_error and process.returncode == -signal.SIGPIPE
+        ):
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip()
+            raise tarfile.ReadError(
+                f"{command[0]} exited with status {process.returncode}: {message}"
+            ) from tar_error
+
+    if tar_error is not None:
+        raise tar_error
+
+
+def compression(path: Path) -> str | None:
+    """Return the compression format of the given file, by its magic number
+
+    Returns one of the values of COMPRESSION_MAGIC or None if the format is not
+    recognized.
+    """
+    with path.open("rb") as fp:
+        return compression_from_magic(fp.read(MAGIC_SIZE))
+
+
+def stream_compression(stream: Iterable[bytes]) -> tuple[str | None, Iterator[bytes]]:
+    """Return the compression format of the given byte stream, by its magic number
+
+    Also return an iterator over the whole stream, including the bytes read to detect
+    its format.
+    """
+    iterator = iter(stream)
+    head: list[bytes] = []
+
+    while sum(map(len, head)) < MAGIC_SIZE:
+        if (chunk := next(iterator, None)) is None:
+            break
+        head.append(chunk)
+
+    return compression_from_magic(b"".join(head)), itertools.chain(head, iterator)
+
+
+def compression_from_magic(head: bytes) -> str | None:
+    """Return the compression format of the data starting with the given bytes"""
+    for magic, name in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return name
+
+    return None
+
+
+def check_decompressible(name: str | None) -> None:
+    """Raise UnsupportedCompressionError if Python can't decompress the given format
+
+    This is for when there is no external decompressor for it. For example, Python
+    before 3.14 cannot decompress zstd.
+    """
+    if name is not None and name not in tarfile.TarFile.OPEN_METH:
+        raise UnsupportedCompressionError(
+            f"Cannot decompress {name} archives: {DECOMPRESSORS[name][0]} is not"
+            " installed"
+        )
+
+
+@cache
+def decompressor(name: str | None) -> tuple[str, ...] | None:
+    """Return the command to decompress the given compression format to stdout
+
+    If the format has no external decompressor or it is not installed, return None.
+    """
+    if name is None or (command := DECOMPRESSORS.get(name)) is None:
+        return None
+
+    if (path := shutil.which(command[0])) is None:
+        return None
+
+    return (path, *command[1:])
+
+
+def extract_stream(
+    stream: Iterable[bytes], outdir: Path, filter_: TarFilter = tarfile.tar_filter
+) -> None:
+    """Extract the given (compressed) tar byte stream into the given directory
+
+    Unlike extract(), the archive is never written to disk. It is read, decompressed and
+    extracted as the bytes arrive. Raises tarfile.TarError (or EOFError) if the stream
+    is not a (complete) tar archive.
+
+    As with extract(), the stream is decompressed by an external decompressor if one is
+    installed for its compression.
+
+    `filter_` is the tarfile extraction filter to use.
+    """
+    logger.info("Extracting stream to %s", outdir)
+    name, stream = stream_compression(stream)
+
+    if (command := decompressor(name)) is None:
+        check_decompressible(name)
+        with tarfile.open(fileobj=ByteStreamReader(stream), mode="r|*") as tar_file:
+            tar_file.extractall(outdir, filter=filter_)
+    else:
+        extract_stream_with(command, stream, outdir, filter_)
+
+    logger.info("Extracted stream to %s", outdir)
+
+
+class ByteStreamReader(io.RawIOBase):
+    """Read-only file object over an iterable of bytes
+
+    Allows byte streams (e.g. HTTP responses) to be consumed by things like tarfile.
+    """
+
+    def __init__(self, stream: Iterable[bytes]) -> None:
+        super().__init__()
+        self._stream = iter(stream)
+        self._chunk = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: "WriteableBuffer") -> int:
+        while not self._chunk:
+            try:
+                self._chunk = memoryview(next(self._stream))
+            except StopIteration:
+                return 0
+
+        view = memoryview(buffer).cast("B")
+        size = min(len(view), len(self._chunk))
+        view[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+
+        return size
+
+
+def prefetch(
+    iterable: Iterable[_T], maxsize: int = PREFETCH_SIZE
+) -> Generator[_T, None, None]:
+    """Iterate over iterable, reading up to maxsize items ahead in a separate thread
+
+    This lets the producer (e.g. a network download) run concurrently with the consumer
+    (e.g. extraction). Exceptions raised by the producer are re-raised in the consumer.
+    If the consumer stops early the producer stops after its current item.
+    """
+    items: queue.Queue[tuple[_T | None, Exception | None, bool]] = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item: tuple[_T | None, Exception | None, bool]) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None, False)):
+                    return
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            put((None, error, True))
+        else:
+            put((None, None, True))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item, error, done = items.get()
+            if error is not None:
+                raise error
+            if done:
+                return
+            yield cast(_T, item)
+    finally:
+        stop.set()
+
+
+def hashed(stream: Iterable[bytes], digest: "_Hash") -> Generator[bytes, None, None]:
+    """Pass the byte stream through, updating the digest with each chunk
+
+    This hashes the stream as it is consumed, without having to read it again.
+    """
+    for chunk in stream:
+        digest.update(chunk)
+        yield chunk
+
+
+def read_chunks(
+    fileobj: IO[bytes], size: int = BUFSIZE
+) -> Generator[bytes, None, None]:
+    """Read and yield the (rest of the) file in chunks of the given size"""
+    while chunk := fileobj.read(size):
+        yield chunk
+
+
+def drain(stream: Iterable[bytes]) -> None:
+    """Consume the rest of the byte stream"""
+    for _ in stream:
+        pass
+
+
 def save_stream(stream: Iterable[_T], outfile: IO[_T]) -> None:
     """Given the byte stream, save and buffer it to given outfile
 
@@ -43,72 +472,365 @@ def save_stream(stream: Iterable[_T], outfile: IO[_T]) -> None:
     outfile.flush()
 
 
-def copy_path(src: Path, dst: Path, link_dest: Path | None) -> None:
+def copy_path(  # pylint: disable=too-many-arguments
+    src: Path,
+    dst: Path,
+    link_dest: LinkDest,
+    *,
+    workers: int = 1,
+    cancel: threading.Event | None = None,
+    counter: LinkCounter | None = None,
+) -> None:
     """Copy the given src path into the given dst path
 
-    If link_dest is given, use its files and, when possible, create hard links
-    from link_dest build's files to build's when they are the same file.
+    Files that pass the quick check against one of the link_dest candidates are hard
+    linked from that candidate instead of being copied. If there are no candidates, src
+    is simply moved to dst.
 
     If dst already exists, remove it before copying.
+
+    If `workers` is greater than 1, files are copied/linked in parallel by a pool of that
+    many threads. If the `cancel` Event is set, copying stops and CopyCancelled is
+    raised. Conversely, if a file fails to copy, `cancel` is set.
+
+    If `counter` is given, the bytes linked and copied are added to it. When src is
+    moved nothing is counted, as that would take another walk of the tree. Count its
+    bytes as it is extracted instead (see counting_filter()).
     """
     if dst.exists():
         logger.warning("Destination already exists: %s. Removing", dst)
         shutil.rmtree(dst)
 
-    if link_dest is not None:
-        copy = copy_or_link(link_dest, dst)
+    if not link_dest:
+        # Not os.renames() as that would prune src's (now empty) parent directories
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(src, dst)
+        return
+
+    cancel = cancel or threading.Event()
+    copy = copy_or_link(link_dest, dst, cancel=cancel, counter=counter)
+
+    if workers <= 1:
         shutil.copytree(src, dst, symlinks=True, copy_function=copy)
-    else:
-        os.renames(src, dst)
+        return
 
+    futures: list[Future[None]] = []
 
-def quick_check(file1: str, file2: str) -> bool:
-    """Do an rsync-style quick check. Return true if files appear identical"""
-    try:
-        stat1 = os.stat(file1, follow_symlinks=False)
-        stat2 = os.stat(file2, follow_symlinks=False)
-    except FileNotFoundError:
-        return False
+    def task(src_: str, dst_: str) -> None:
+        try:
+            copy(src_, dst_)
+        except BaseException:
+            cancel.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def submit(src_: str, dst_: str) -> None:
+            if cancel.is_set():
+                raise CopyCancelled(dst_)
+            futures.append(executor.submit(task, src_, dst_))
+
+        try:
+            shutil.copytree(src, dst, symlinks=True, copy_function=submit)
+        except CopyCancelled:
+            pass
 
-    return stat1.st_mtime == stat2.st_mtime and stat1.st_size == stat2.st_size
+    for future in futures:
+        if (error := future.exception()) and not isinstance(error, CopyCancelled):
+            raise error
 
+    if cancel.is_set():
+        raise CopyCancelled(dst)
 
-def copy_or_link(link_dest: Path, dst_root: Path) -> Callable[[str, str], None]:
+    # copytree copied the directories' stats before the pool wrote into them
+    for dirpath, _, _ in os.walk(dst, topdown=False):
+        shutil.copystat(src / os.path.relpath(dirpath, dst), dirpath)
+
+
+def stat_index(root: Path) -> dict[str, FileStat]:
+    """Return a map of the regular files under root to their FileStat
+
+    The keys are the files' paths relative to root. The tree is scanned in a single
+    recursive pass using os.scandir(). If root does not exist, return an empty dict.
+    """
+    index: dict[str, FileStat] = {}
+    stack = [(str(root), "")]
+
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f"{prefix}{entry.name}/"))
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    index[f"{prefix}{entry.name}"] = FileStat(
+                        stat.st_size, stat.st_mtime_ns, stat.st_ino
+                    )
+
+    return index
+
+
+def copy_or_link(
+    link_dest: LinkDest,
+    dst_root: Path,
+    *,
+    cancel: threading.Event | None = None,
+    counter: LinkCounter | None = None,
+) -> Callable[[str, str], None]:
     """Create a shutil.copytree copy_function that uses rsync's link_dest logic
 
-    Utilize shutil.copy2 (the default copy_function) when the quick_check() fails,
-    otherwise instead of copying create a (hard) link from source to destination.
+    Utilize shutil.copy2 (the default copy_function) when the quick check fails against
+    all of the link_dest candidates, otherwise instead of copying create a (hard) link
+    from the first matching candidate to the destination.
+
+    The link_dest trees are scanned up front (see stat_index()) so that only the source
+    file needs to be stat-ed when copying.
+
+    If the `cancel` Event is given and set, the copy_function raises CopyCancelled.
+
+    If `counter` is given, the bytes linked and copied are added to it.
 
     https://docs.python.org/3/library/shutil.html#shutil.copytree
     """
+    prefix_len = len(os.path.join(dst_root, ""))
 
     def copy(src: str, dst: str, follow_symlinks: bool = True) -> None:
-        relative = Path(dst).relative_to(dst_root)
-        target = str(link_dest / relative)
-        if quick_check(src, target):
+        if cancel is not None and cancel.is_set():
+            raise CopyCancelled(dst)
+
+        stat = os.stat(src, follow_symlinks=False)
+        target = link_dest.find(dst[prefix_len:], stat.st_size, stat.st_mtime_ns)
+
+        if target is not None:
             os.link(target, dst, follow_symlinks=follow_symlinks)
         else:
             shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
 
+        if counter is not None:
+            counter.add(stat.st_size, linked=target is not None)
+
     return copy
 
 
-def symlink(source: str, target: str) -> None:
-    """If target is a symlink remove it. If it otherwise exists raise an error"""
-    if os.path.islink(target):
-        os.unlink(target)
-    elif os.path.exists(target):
-        raise EnvironmentError(f"{target} exists but is not a symlink")
+def link_dest_filter(
+    destinations: Mapping[str, tuple[str, LinkDest]], counter: LinkCounter | None = None
+) -> TarFilter:
+    """Create a tarfile extraction filter that relocates members and uses link_dest
 
-    os.symlink(source, target)
+    `destinations` maps the names of the archive's top-level directories to a
+    (dst, link_dest) pair. dst is relative to the extraction directory. Each member is
+    relocated from its top-level directory into the respective dst. Members outside of
+    the given top-level directories are skipped.
 
+    Regular files whose counterpart in one of the link_dest candidates passes the
+    rsync-style quick check (size and mtime) are hard linked from the first such
+    candidate instead of being extracted. This way the bytes of unchanged files are
+    never written.
 
-def check_symlink(symlink_: str, target: str) -> bool:
-    """Return True if the given symlinks point to the given target"""
-    if not os.path.islink(symlink_):
-        return False
+    If `counter` is given, the bytes linked and extracted are added to it.
+    """
+
+    def relocate(name: str) -> tuple[str, str, str] | None:
+        top, _, rest = name.removeprefix("./").partition("/")
+
+        if top not in destinations:
+            return None
+
+        dst = destinations[top][0]
+
+        return os.path.join(dst, rest) if rest else dst, top, rest
+
+    def filter_(member: tarfile.TarInfo, path: str) -> tarfile.TarInfo | None:
+        if (relocated := relocate(member.name)) is None:
+            return None
+
+        name, top, relative = relocated
+
+        if member.isreg():
+            link_dest = destinations[top][1]
+            target = link_dest.find(relative, member.size, int(member.mtime * 10**9))
+
+            if counter is not None:
+                counter.add(member.size, linked=target is not None)
+
+            if target is not None:
+                dst = os.path.join(path, name)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.link(target, dst)
+                return None
+
+        linkname = member.linkname
+        if member.islnk() and (link := relocate(linkname)):
+            linkname = link[0]
+
+        return tarfile.tar_filter(
+            member.replace(name=name, linkname=linkname, deep=False), path
+        )
+
+    return filter_
 
-    return os.path.realpath(symlink_) == target
+
+def counting_filter(
+    counter: LinkCounter, filter_: TarFilter = tarfile.tar_filter
+) -> TarFilter:
+    """Wrap the tarfile extraction filter to add the bytes extracted to the counter
+
+    The sizes of the regular files extracted are added as copied.
+    """
+
+    def counting_filter_(member: tarfile.TarInfo, path: str) -> tarfile.TarInfo | None:
+        if (member_ := filter_(member, path)) is not None and member_.isreg():
+            counter.add(member_.size, linked=False)
+
+        return member_
+
+    return counting_filter_
+
+
+def object_path(objects: Path, path: str, stat: os.stat_result) -> str:
+    """Return the path of the content-addressed object for the file at path
+
+    Objects are keyed by the SHA-256 digest of the file's contents. Because hard links
+    share their inode's metadata, the key also includes the file's mode and mtime so
+    that linking a file to its object never changes the file's attributes.
+    """
+    with open(path, "rb") as fp:
+        digest = hashlib.file_digest(fp, "sha256").hexdigest()
+
+    mode = statlib.S_IMODE(stat.st_mode)
+
+    return os.path.join(
+        objects, digest[:2], f"{digest[2:]}-{mode:o}-{stat.st_mtime_ns}"
+    )
+
+
+def dedup_tree(root: Path, objects: Path) -> None:
+    """Hard link every regular file under root to its object in the objects store
+
+    Files not yet in the store are added to it. Files that are already hard links (for
+    example files linked from a link-dest) are assumed to already be deduplicated and
+    are skipped. If an object has reached the filesystem's link limit the file is left
+    as is.
+    """
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path, follow_symlinks=False)
+
+            if not statlib.S_ISREG(stat.st_mode) or stat.st_nlink > 1:
+                continue
+
+            obj = object_path(objects, path, stat)
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+
+            try:
+                os.link(path, obj)
+            except FileExistsError:
+                pass
+            else:
+                continue
+
+            tmp = f"{path}.dedup~"
+            try:
+                os.link(obj, tmp)
+            except FileNotFoundError:
+                # The object was released (concurrently) out from under us
+                continue
+            except OSError as error:
+                if error.errno != errno.EMLINK:
+                    raise
+                logger.warning("Link limit reached for %s. Not deduplicating", obj)
+                continue
+
+            os.replace(tmp, path)
+
+
+def release_objects(roots: Iterable[Path], objects: Path) -> None:
+    """Remove the objects that are referenced only by files under the given roots
+
+    This is to be called before the roots are removed. Only the files whose links are
+    all within the roots (plus the object) are hashed.
+    """
+    files: dict[int, tuple[str, os.stat_result]] = {}
+    links: Counter[int] = Counter()
+
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path, follow_symlinks=False)
+
+                if statlib.S_ISREG(stat.st_mode):
+                    files.setdefault(stat.st_ino, (path, stat))
+                    links[stat.st_ino] += 1
+
+    for inode, (path, stat) in files.items():
+        if stat.st_nlink != links[inode] + 1:
+            continue
+
+        obj = object_path(objects, path, stat)
+        try:
+            if os.stat(obj).st_ino == inode:
+                os.unlink(obj)
+        except FileNotFoundError:
+            pass
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write data to the file at path, atomically replacing it if it exists
+
+    The file's previous inode (which may be hard linked elsewhere) is left untouched.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def remove_tree(path: Path) -> None:
+    """Remove the directory tree at path at idle I/O priority
+
+    Uses ionice(1) and rm(1) when they are available, otherwise (or if they fail)
+    shutil.rmtree(). Errors are ignored.
+    """
+    if (ionice := shutil.which("ionice")) and (rm := shutil.which("rm")):
+        command = [ionice, "-c", "3", rm, "-rf", "--", str(path)]
+
+        if subprocess.run(command, check=False).returncode == 0:
+            return
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def symlink(source: str, target: str) -> None:
+    """If target is a symlink replace it. If it otherwise exists raise an error
+
+    The symlink is created under a temporary name and renamed over the target, so the
+    target is never missing.
+    """
+    if not os.path.islink(target) and os.path.exists(target):
+        raise EnvironmentError(f"{target} exists but is not a symlink")
+
+    temp = f"{target}.{uuid.uuid4().hex}~"
+    os.symlink(source, temp)
+
+    try:
+        os.replace(temp, target)
+    except OSError:
+        os.unlink(temp)
+        raise
 
 
 @contextmanager
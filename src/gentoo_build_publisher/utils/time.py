@@ -1,6 +1,10 @@
 """Utilities for dealing with time and dates"""
 
 import datetime as dt
+import threading
+import time as timelib
+from contextlib import contextmanager
+from typing import Generator
 
 LOCAL_TIMEZONE = dt.datetime.now().astimezone().tzinfo
 SECONDS_PER_DAY = 86400
@@ -54,3 +58,29 @@ def as_date(time: dt.datetime) -> str:
 def as_date_and_time(time: dt.datetime) -> str:
     """Return the date and time in the locale's format"""
     return time.strftime("%b %-d %H:%M")
+
+
+class StageTimer:
+    """Accumulate the (wall clock) durations of named stages of a process
+
+    Stages may be timed concurrently from different threads.
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, stage: str) -> Generator[None, None, None]:
+        """Time the body of the with statement as the given stage"""
+        start = timelib.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = timelib.perf_counter() - start
+            with self._lock:
+                self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+
+    def __str__(self) -> str:
+        return ", ".join(f"{stage}: {secs:.2f}s" for stage, secs in self.stages.items())
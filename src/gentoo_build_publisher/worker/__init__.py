@@ -6,11 +6,15 @@
 
 import requests.exceptions
 
+from gentoo_build_publisher.jenkins import ArtifactChangedError
 from gentoo_build_publisher.settings import Settings
+from gentoo_build_publisher.storage import ArtifactChecksumError
 
 HTTP_NOT_FOUND = 404
 PUBLISH_FATAL_EXCEPTIONS = (requests.exceptions.HTTPError,)
 PULL_RETRYABLE_EXCEPTIONS = (
+    ArtifactChangedError,
+    ArtifactChecksumError,
     EOFError,
     requests.exceptions.ConnectionError,
     requests.exceptions.HTTPError,
@@ -36,16 +36,24 @@ def pull_build(build_id: str, *, note: str | None, tags: list[str] | None) -> No
     If `tags` is given, then the build will be assigned the given tags.
     """
     from gentoo_build_publisher import publisher
+    from gentoo_build_publisher.storage import PartialArtifactError
     from gentoo_build_publisher.types import Build
-    from gentoo_build_publisher.worker import logger
+    from gentoo_build_publisher.worker import PULL_RETRYABLE_EXCEPTIONS, logger
 
     build = Build.from_id(build_id)
 
     try:
         publisher.pull(build, note=note, tags=tags)
-    except Exception:
+    except PartialArtifactError:
+        # Another worker is pulling the build. Leave it (and its record) alone
+        logger.warning("Build %s is being pulled by another worker", build)
+        raise
+    except Exception as error:
         logger.exception("Failed to pull build %s", build)
-        publisher.delete(build)
+        # Unless the failure is permanent, a retry resumes the partial download
+        publisher.delete(
+            build, keep_partial=isinstance(error, PULL_RETRYABLE_EXCEPTIONS)
+        )
         raise
 
 
@@ -61,3 +69,12 @@ def delete_build(build_id: str) -> None:
 
     publisher.delete(build)
     logger.info("Deleted build: %s", build)
+
+
+def empty_trash() -> None:
+    """Remove deleted builds from storage"""
+    from gentoo_build_publisher import publisher
+    from gentoo_build_publisher.worker import logger
+
+    logger.info("Emptying the storage trash")
+    publisher.storage.empty_trash()
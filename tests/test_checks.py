@@ -171,6 +171,73 @@ def test_check_tmpdir_nonempty(self, fixtures: Fixtures) -> None:
         self.assertEqual(console.stderr, f"Warning: {tmp} is not empty.\n")
 
 
+@given(testkit.console, testkit.publisher)
+class TrashBacklogTests(TestCase):
+    def test_trash_not_empty(self, fixtures: Fixtures) -> None:
+        storage = fixtures.publisher.storage
+        storage.trash.joinpath("babette.1.binpkgs.x").mkdir(parents=True)
+        storage.trash.joinpath("babette.1.binpkgs.x", "Packages").write_bytes(b"test")
+
+        console = fixtures.console
+        result = checks.trash_backlog(console)
+
+        self.assertEqual(result, (0, 1))
+        self.assertIn("has 4 bytes awaiting removal.", console.stderr)
+
+    def test_trash_empty(self, fixtures: Fixtures) -> None:
+        result = checks.trash_backlog(fixtures.console)
+
+        self.assertEqual(result, (0, 0))
+
+
+@given(testkit.console, testkit.publisher)
+class OrphanedObjectsTests(TestCase):
+    def test_unreferenced_object(self, fixtures: Fixtures) -> None:
+        storage = fixtures.publisher.storage
+        objects = storage.objects / "ab"
+        objects.mkdir(parents=True)
+        referenced = objects / "referenced"
+        referenced.write_bytes(b"referenced")
+        (storage.temp / "build-file").hardlink_to(referenced)
+        unreferenced = objects / "unreferenced"
+        unreferenced.write_bytes(b"unreferenced")
+
+        console = fixtures.console
+        result = checks.orphaned_objects(console)
+
+        self.assertEqual(result, (0, 1))
+        self.assertEqual(
+            console.stderr, f"Warning: object {unreferenced} is not referenced.\n"
+        )
+
+    def test_no_object_store(self, fixtures: Fixtures) -> None:
+        result = checks.orphaned_objects(fixtures.console)
+
+        self.assertEqual(result, (0, 0))
+
+
+@given(testkit.console, testkit.publisher)
+class ArtifactCacheTests(TestCase):
+    def test_reports_size(self, fixtures: Fixtures) -> None:
+        cache = fixtures.publisher.storage.artifact_cache
+        cache.maxsize = 1024
+        cache.path.mkdir()
+        cache.path.joinpath("babette.1").write_bytes(b"test")
+
+        console = fixtures.console
+        result = checks.artifact_cache(console)
+
+        self.assertEqual(result, (0, 0))
+        self.assertIn("uses 4 of 1024 bytes.", console.stderr)
+
+    def test_disabled(self, fixtures: Fixtures) -> None:
+        console = fixtures.console
+        result = checks.artifact_cache(console)
+
+        self.assertEqual(result, (0, 0))
+        self.assertEqual(console.stderr, "")
+
+
 def build_with_missing_content(content: Content, publisher: BuildPublisher) -> Build:
     build = BuildFactory()
     publisher.pull(build)
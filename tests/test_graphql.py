@@ -3,6 +3,7 @@
 # pylint: disable=missing-docstring,too-many-lines,unused-argument
 import datetime as dt
 from typing import Any
+from unittest import mock
 
 from unittest_fixtures import Fixtures, fixture, given, params, where
 
@@ -107,6 +108,31 @@ def test(self, fixtures: Fixtures) -> None:
 
         assert_data(self, result, expected)
 
+    def test_record_is_fetched_once_per_request(self, fixtures: Fixtures) -> None:
+        build = BuildFactory()
+        publisher = fixtures.publisher
+        publisher.pull(build)
+        records = publisher.repo.build_records
+
+        query = """
+        query ($id: ID!) {
+          build(id: $id) {
+            built
+            completed
+            keep
+            logs
+            notes
+            submitted
+            packageDetail { cpv }
+          }
+        }
+        """
+        with mock.patch.object(records, "get", wraps=records.get) as get:
+            result = graphql(fixtures.client, query, variables={"id": build.id})
+
+        self.assertFalse(result.get("errors"))
+        get.assert_called_once_with(build)
+
     def test_packages(self, fixtures: Fixtures) -> None:
         # given the pulled build with packages
         build = BuildFactory()
@@ -549,6 +575,66 @@ def test_diff_with_package(self, fixtures: Fixtures) -> None:
         assert_data(self, result, expected)
 
 
+@given(testkit.tmpdir, testkit.publisher, diff_query_builds, testkit.client)
+class DiffRangeQueryTestCase(TestCase):
+    """Tests for the diffRange query"""
+
+    query = """
+    query ($machine: String!, $from: ID!, $to: ID!) {
+      diffRange(machine: $machine, from: $from, to: $to) {
+        item
+        package { cpv }
+        added { id }
+        removed { id }
+        builds { id }
+      }
+    }
+    """
+
+    def test(self, fixtures: Fixtures) -> None:
+        left = fixtures.diff_query_builds["left"]
+        right = fixtures.diff_query_builds["right"]
+        variables = {
+            "machine": left.machine,
+            "from": left.build_id,
+            "to": right.build_id,
+        }
+        result = graphql(fixtures.client, self.query, variables=variables)
+
+        expected = {
+            "diffRange": [
+                {
+                    "item": "app-arch/tar-1.34-1",
+                    "package": {"cpv": "app-arch/tar-1.34"},
+                    "added": None,
+                    "removed": {"id": right.id},
+                    "builds": [{"id": right.id}],
+                },
+                {
+                    "item": "app-arch/tar-1.35-1",
+                    "package": {"cpv": "app-arch/tar-1.35"},
+                    "added": {"id": right.id},
+                    "removed": None,
+                    "builds": [{"id": right.id}],
+                },
+            ]
+        }
+        assert_data(self, result, expected)
+
+    def test_should_return_error_when_build_does_not_exist(
+        self, fixtures: Fixtures
+    ) -> None:
+        left = fixtures.diff_query_builds["left"]
+        variables = {"machine": left.machine, "from": left.build_id, "to": "bogus"}
+        result = graphql(fixtures.client, self.query, variables=variables)
+
+        self.assertEqual(result["data"], None)
+        self.assertEqual(
+            result["errors"][0]["message"],
+            f"Build does not exist: {left.machine}.bogus",
+        )
+
+
 @given(testkit.tmpdir, testkit.publisher, testkit.client, pf=testkit.cpv_generator)
 class MachinesQueryTestCase(TestCase):
     """Tests for the machines query"""
@@ -2,6 +2,7 @@
 
 # pylint: disable=missing-class-docstring,missing-function-docstring
 import dataclasses as dc
+import hashlib
 import io
 import json
 import os
@@ -16,6 +17,7 @@
 from gbp_testkit.helpers import MockJenkins, test_data
 from gentoo_build_publisher.jenkins import (
     COPY_ARTIFACT_PLUGIN,
+    ArtifactChangedError,
     Jenkins,
     JenkinsConfig,
     JenkinsMetadata,
@@ -73,6 +75,134 @@ def test_download_artifact_with_no_auth(self) -> None:
             "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz", stream=True
         )
 
+    def test_download_artifact_resumes_when_connection_drops(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        jenkins.jenkins_session.disconnects = [100, 50]
+
+        with self.assertLogs("gentoo_build_publisher.jenkins", "WARNING") as logs:
+            content = b"".join(jenkins.download_artifact(build))
+
+        url = "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz"
+        self.assertEqual(content, jenkins.jenkins_session.artifacts[URL(url).path])
+        self.assertEqual(len(logs.output), 2)
+        etag = f'"{jenkins.artifact_sha256(build)[:16]}"'
+        self.assertEqual(
+            jenkins.mock_get.call_args_list,
+            [
+                mock.call(url, stream=True),
+                mock.call(
+                    url, stream=True, headers={"Range": "bytes=100-", "If-Range": etag}
+                ),
+                mock.call(
+                    url, stream=True, headers={"Range": "bytes=150-", "If-Range": etag}
+                ),
+            ],
+        )
+
+    def test_download_artifact_raises_when_artifact_changes_mid_download(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        jenkins.jenkins_session.disconnects = [100]
+        stream = iter(jenkins.download_artifact(build))
+        path = jenkins.url.artifact(build).path
+        jenkins.jenkins_session.artifacts[path] = b"rebuilt artifact"
+
+        with (
+            self.assertRaises(ArtifactChangedError),
+            self.assertLogs("gentoo_build_publisher.jenkins", "WARNING"),
+        ):
+            b"".join(stream)
+
+    def test_download_artifact_gives_up(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        jenkins.jenkins_session.disconnects = [10] * 6
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            with self.assertLogs("gentoo_build_publisher.jenkins", "WARNING"):
+                b"".join(jenkins.download_artifact(build))
+
+    def test_download_artifact_from_offset(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        data = b"".join(jenkins.download_artifact(build))
+
+        content = b"".join(jenkins.download_artifact(build, start=100))
+
+        self.assertEqual(content, data[100:])
+        jenkins.mock_get.assert_called_with(
+            "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz",
+            stream=True,
+            headers={"Range": "bytes=100-"},
+        )
+
+    def test_download_artifact_with_validator(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        stream = jenkins.download_artifact(build)
+        data = b"".join(stream)
+
+        resumed = jenkins.download_artifact(
+            build, start=100, validator=stream.validator
+        )
+
+        self.assertEqual(stream.validator, f'"{jenkins.artifact_sha256(build)[:16]}"')
+        self.assertEqual((resumed.start, resumed.validator), (100, stream.validator))
+        self.assertEqual(b"".join(resumed), data[100:])
+        jenkins.mock_get.assert_called_with(
+            "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz",
+            stream=True,
+            headers={"Range": "bytes=100-", "If-Range": stream.validator},
+        )
+
+    def test_download_artifact_raises_when_artifact_changed(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        b"".join(jenkins.download_artifact(build))
+
+        with self.assertRaises(ArtifactChangedError):
+            jenkins.download_artifact(build, start=100, validator='"stale"')
+
+    def test_download_artifact_from_offset_when_range_not_supported(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        jenkins.jenkins_session.range_support = False
+        data = b"".join(jenkins.download_artifact(build))
+
+        content = b"".join(jenkins.download_artifact(build, start=100))
+
+        self.assertEqual(content, data[100:])
+
+    def test_download_artifact_from_end(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        data = b"".join(jenkins.download_artifact(build))
+
+        content = b"".join(jenkins.download_artifact(build, start=len(data)))
+
+        self.assertEqual(content, b"")
+
+    def test_get_artifact_checksum(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        data = b"".join(jenkins.download_artifact(build))
+
+        checksum = jenkins.get_artifact_checksum(build)
+
+        self.assertEqual(checksum, hashlib.sha256(data).hexdigest())
+        jenkins.mock_get.assert_called_with(
+            "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz.sha256"
+        )
+
+    def test_get_artifact_checksum_when_not_published(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        jenkins.jenkins_session.checksums = False
+        b"".join(jenkins.download_artifact(build))
+
+        self.assertIs(jenkins.get_artifact_checksum(build), None)
+
     @mock.patch.dict(os.environ, {}, clear=True)
     def test_from_settings(self) -> None:
         """.from_settings() should return an instance instantiated from settings"""
@@ -183,6 +313,24 @@ def test_project_root_bogus_jenkins_base(self) -> None:
         self.assertEqual(jenkins.project_root, ProjectPath("i/think/this/is/invalid"))
 
 
+class GetArtifactValidatorTestCase(TestCase):
+    """Tests for the Jenkins.get_artifact_validator method"""
+
+    def test(self) -> None:
+        build = Build("babette", "193")
+        jenkins = MockJenkins(JENKINS_CONFIG)
+        stream = jenkins.download_artifact(build)
+        b"".join(stream)
+
+        validator = jenkins.get_artifact_validator(build)
+
+        self.assertEqual(validator, stream.validator)
+        jenkins.session.head.assert_called_with(
+            "https://jenkins.invalid/job/babette/193/artifact/build.tar.gz",
+            allow_redirects=True,
+        )
+
+
 class ProjectPathExistsTestCase(TestCase):
     url = "https://jenkins.invalid/job/Gentoo/job/repos/job/marduk"
 
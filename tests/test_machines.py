@@ -1,6 +1,8 @@
 """Tests for the machines module"""
 
 # pylint: disable=missing-docstring
+from unittest import mock
+
 from unittest_fixtures import Fixtures, fixture, given, where
 
 import gbp_testkit.fixtures as testkit
@@ -48,6 +50,26 @@ def test_empty_db(self, fixtures: Fixtures) -> None:
         self.assertEqual(machine_info.latest_build, None)
         self.assertEqual(machine_info.published_build, None)
 
+    def test_published_build_does_not_check_each_build(
+        self, fixtures: Fixtures
+    ) -> None:
+        publisher = fixtures.publisher
+        publisher.publish(fixtures.build1)
+        publisher.pull(fixtures.build2)
+        machine_info = MachineInfo("foo")
+
+        with mock.patch.object(publisher.storage, "published") as published:
+            self.assertEqual(machine_info.published_build, fixtures.build1)
+
+        published.assert_not_called()
+
+    def test_published_build_without_record(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.publish(fixtures.build1)
+        publisher.repo.build_records.delete(fixtures.build1)
+
+        self.assertEqual(MachineInfo("foo").published_build, None)
+
     def test_builds_property(self, fixtures: Fixtures) -> None:
         publisher = fixtures.publisher
         # Given the "foo" builds
@@ -82,6 +104,23 @@ def test_tags_property_shows_tags_across_machines_builds(
         # Then it has the the tags for all builds
         self.assertEqual(machine_info.tags, ["stable", "testing"])
 
+    def test_tags_property_with_snapshot(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = BuildFactory.create_batch(3, machine="foo")
+        for build in builds:
+            publisher.pull(build)
+
+        publisher.publish(builds[1])
+        publisher.tag(builds[-1], "testing")
+        publisher.tag(builds[0], "stable")
+        other = BuildFactory(machine="bar")
+        publisher.pull(other)
+        publisher.tag(other, "stable")
+
+        machine_info = MachineInfo("foo", snapshot=publisher.storage.snapshot())
+
+        self.assertEqual(machine_info.tags, ["stable", "testing"])
+
 
 @fixture()
 def builds_fixture(_fixtures: Fixtures, count: int = 4) -> list[Build]:
@@ -1,8 +1,10 @@
 """Tests for the GBP publisher"""
 
-# pylint: disable=missing-docstring,unused-argument
+# pylint: disable=missing-docstring,too-many-lines,unused-argument
 import datetime as dt
+import threading
 from dataclasses import replace
+from typing import Any
 from unittest import TestCase, mock
 from zoneinfo import ZoneInfo
 
@@ -13,11 +15,19 @@
 from gbp_testkit.factories import BuildFactory, BuildRecordFactory
 from gbp_testkit.helpers import BUILD_LOGS, ts
 from gentoo_build_publisher.build_publisher import BuildPublisher
-from gentoo_build_publisher.records import BuildRecord
+from gentoo_build_publisher.jenkins import JenkinsMetadata
+from gentoo_build_publisher.records import BuildRecord, RecordNotFound
 from gentoo_build_publisher.records.memory import RecordDB
 from gentoo_build_publisher.settings import Settings
 from gentoo_build_publisher.signals import dispatcher
-from gentoo_build_publisher.types import Build, Content, GBPMetadata, Package
+from gentoo_build_publisher.storage import ArtifactChecksumError
+from gentoo_build_publisher.types import (
+    Build,
+    ChangeState,
+    Content,
+    GBPMetadata,
+    Package,
+)
 from gentoo_build_publisher.utils.time import utctime
 
 
@@ -145,6 +155,217 @@ def test_build_timestamps(self, fixtures: Fixtures) -> None:
         self.assertEqual(record.submitted, ts("2024-01-19 05:05:49", ct))
         self.assertEqual(record.completed, ts("2024-01-19 05:05:49", ct))
 
+    def test_pull_streaming(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.storage.stream = True
+
+        publisher.pull(fixtures.build)
+
+        self.assertIs(publisher.pulled(fixtures.build), True)
+
+    def test_pull_falls_back_when_streaming_fails(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+        publisher.storage.stream = True
+        jenkins = publisher.jenkins
+        data = jenkins.artifact_builder.get_artifact(build).getvalue()
+        truncated = [data[: len(data) // 2]]
+
+        with mock.patch.object(
+            jenkins,
+            "download_artifact",
+            side_effect=[truncated, jenkins.download_artifact(build)],
+        ) as download_artifact:
+            publisher.pull(build)
+
+        self.assertEqual(download_artifact.call_count, 2)
+        self.assertIs(publisher.pulled(build), True)
+
+    def test_pull_resumes_partial_download(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+        jenkins = publisher.jenkins
+        data = b"".join(jenkins.download_artifact(build))
+        publisher.storage.partial_artifact(build).write_bytes(data[:100])
+
+        publisher.pull(build)
+
+        self.assertIs(publisher.pulled(build), True)
+        jenkins.session.get.assert_any_call(
+            str(jenkins.url.artifact(build)),
+            stream=True,
+            headers={"Range": "bytes=100-"},
+        )
+
+    def test_pull_restarts_download_when_artifact_changed(
+        self, fixtures: Fixtures
+    ) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        jenkins = publisher.jenkins
+        b"".join(jenkins.download_artifact(build))
+        storage.partial_artifact(build).write_bytes(b"stale artifact")
+        storage.partial_artifact_validator(build).write_text('"stale"')
+
+        with self.assertLogs("gentoo_build_publisher.build_publisher", "WARNING"):
+            publisher.pull(build)
+
+        self.assertIs(publisher.pulled(build), True)
+        self.assertIs(storage.partial_artifact_validator(build).exists(), False)
+        jenkins.session.get.assert_any_call(
+            str(jenkins.url.artifact(build)),
+            stream=True,
+            headers={"Range": "bytes=14-", "If-Range": '"stale"'},
+        )
+
+    def test_pull_reuses_cached_artifact_after_failure(
+        self, fixtures: Fixtures
+    ) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+        cache = publisher.storage.artifact_cache
+        cache.maxsize = 1024 * 1024
+        cache.path.mkdir()
+        jenkins = publisher.jenkins
+
+        with mock.patch.object(jenkins, "get_logs", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                publisher.pull(build)
+        publisher.delete(build)
+
+        self.assertIn(build, cache)
+
+        with mock.patch.object(
+            jenkins, "download_artifact", wraps=jenkins.download_artifact
+        ) as download_artifact:
+            publisher.pull(build)
+
+        download_artifact.assert_not_called()
+        self.assertIs(publisher.pulled(build), True)
+        self.assertNotIn(build, cache)
+
+    def test_pull_downloads_artifact_replaced_since_cached(
+        self, fixtures: Fixtures
+    ) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+        cache = publisher.storage.artifact_cache
+        cache.maxsize = 1024 * 1024
+        cache.path.mkdir()
+        jenkins = publisher.jenkins
+
+        with mock.patch.object(jenkins, "get_logs", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                publisher.pull(build)
+        publisher.delete(build)
+        jenkins.artifact_builder.build(build, "app-misc/rebuilt-1")
+        jenkins.jenkins_session.artifacts[jenkins.url.artifact(build).path] = (
+            jenkins.artifact_builder.get_artifact(build).getvalue()
+        )
+
+        with mock.patch.object(
+            jenkins, "download_artifact", wraps=jenkins.download_artifact
+        ) as download_artifact:
+            publisher.pull(build)
+
+        download_artifact.assert_called_once()
+        self.assertIn(
+            "app-misc/rebuilt-1",
+            [package.cpv for package in publisher.get_packages(build)],
+        )
+
+    def test_pull_records_artifact_digest(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+
+        publisher.pull(build)
+
+        self.assertEqual(
+            publisher.storage.get_metadata(build).artifact_sha256,
+            publisher.jenkins.artifact_sha256(build),
+        )
+
+    def test_pull_with_checksum_mismatch(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        publisher = fixtures.publisher
+
+        with mock.patch.object(
+            publisher.jenkins, "get_artifact_checksum", return_value="0" * 64
+        ):
+            with self.assertRaises(ArtifactChecksumError):
+                publisher.pull(build)
+
+        self.assertIs(publisher.storage.pulled(build), False)
+
+    def test_pull_logs_stage_timings(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+
+        with self.assertLogs("gentoo_build_publisher.build_publisher") as logs:
+            publisher.pull(fixtures.build)
+
+        message = logs.output[-1]
+        self.assertIn(f"Pulled build {fixtures.build} (", message)
+        for stage in ["metadata", "logs", "download", "extract", "copy", "record"]:
+            self.assertIn(f"{stage}: ", message)
+
+    def test_pull_fetches_metadata_and_logs_during_extraction(
+        self, fixtures: Fixtures
+    ) -> None:
+        publisher = fixtures.publisher
+        jenkins = publisher.jenkins
+        fetched = threading.Barrier(3, timeout=10)
+
+        def get_metadata(build: Build) -> JenkinsMetadata:
+            fetched.wait()
+            return JenkinsMetadata(duration=124, timestamp=0)
+
+        def get_logs(build: Build) -> str:
+            fetched.wait()
+            return "logs"
+
+        def extract_artifact(*args: Any, **kwargs: Any) -> None:
+            # Would time out if metadata and logs were fetched after extraction
+            fetched.wait()
+            extract(*args, **kwargs)
+
+        extract = publisher.storage.extract_artifact
+
+        with (
+            mock.patch.object(jenkins, "get_metadata", side_effect=get_metadata),
+            mock.patch.object(jenkins, "get_logs", side_effect=get_logs),
+            mock.patch.object(
+                publisher.storage, "extract_artifact", side_effect=extract_artifact
+            ),
+        ):
+            publisher.pull(fixtures.build)
+
+        self.assertEqual(publisher.record(fixtures.build).logs, "logs")
+
+    def test_link_dests(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = BuildFactory.create_batch(6)
+        stable, published, _old, recent1, recent2, previous = builds
+        for build in builds:
+            publisher.pull(build)
+        publisher.publish(published)
+        publisher.tag(stable, "stable")
+        record = publisher.record(BuildFactory())
+
+        link_dests = publisher.link_dests(record)
+
+        self.assertEqual(link_dests, [previous, published, stable, recent2, recent1])
+
+    def test_link_dests_skips_builds_not_pulled(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        previous = BuildFactory()
+        publisher.pull(previous)
+        publisher.storage.delete(previous)
+
+        link_dests = publisher.link_dests(publisher.record(BuildFactory()))
+
+        self.assertEqual(link_dests, [])
+
     def test_pull_with_note(self, fixtures: Fixtures) -> None:
         publisher = fixtures.publisher
         publisher.pull(fixtures.build, note="This is a test")
@@ -189,6 +410,239 @@ def test_diff_binpkgs_should_be_empty_if_left_and_right_are_equal(
         self.assertEqual(diff, [])
         self.assertEqual(publisher.get_packages.call_count, 0)
 
+    def test_diff_binpkgs(self, fixtures: Fixtures) -> None:
+        left = fixtures.build
+        right = BuildFactory()
+        publisher = fixtures.publisher
+
+        def package(cpv: str, build: Build) -> Package:
+            return Package(
+                cpv=cpv,
+                repo="gentoo",
+                path="",
+                build_id=1,
+                size=0,
+                build_time=0,
+                build=build,
+            )
+
+        packages = {
+            left: [
+                package(cpv, left)
+                for cpv in ["sys-libs/zlib-1.3", "app-arch/tar-1.34", "dev-lang/go-1"]
+            ],
+            right: [
+                package(cpv, right)
+                for cpv in ["dev-lang/go-1", "app-misc/foo-1", "app-arch/tar-1.35"]
+            ],
+        }
+
+        with mock.patch.object(publisher, "get_packages", side_effect=packages.get):
+            diff = [*publisher.diff_binpkgs(left, right)]
+
+        self.assertEqual(
+            [(change.item, change.status) for change in diff],
+            [
+                ("app-arch/tar-1.34-1", ChangeState.REMOVED),
+                ("app-arch/tar-1.35-1", ChangeState.ADDED),
+                ("app-misc/foo-1-1", ChangeState.ADDED),
+                ("sys-libs/zlib-1.3-1", ChangeState.REMOVED),
+            ],
+        )
+        self.assertEqual(diff[0].package, packages[left][1])
+        self.assertEqual(diff[1].package, packages[right][2])
+
+    def test_pull_saves_package_delta(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 2)
+        # pylint: disable=protected-access
+        expected = list(publisher._compare_packages(builds[0], builds[1]))
+
+        previous, changes = publisher.storage.get_delta(builds[1])
+
+        self.assertEqual(previous, builds[0])
+        self.assertEqual(changes, expected)
+
+    def test_diff_binpkgs_composes_deltas(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 4)
+        pairs = [(builds[0], builds[1]), (builds[0], builds[3]), (builds[3], builds[1])]
+        # pylint: disable=protected-access
+        expected = [list(publisher._compare_packages(*pair)) for pair in pairs]
+
+        with mock.patch.object(publisher, "_compare_packages") as compare_packages:
+            diffs = [list(publisher.diff_binpkgs(*pair)) for pair in pairs]
+
+        compare_packages.assert_not_called()
+        self.assertEqual(diffs, expected)
+        self.assertTrue(all(diffs))
+
+    def test_diff_binpkgs_compares_when_delta_chain_is_too_long(
+        self, fixtures: Fixtures
+    ) -> None:
+        # pylint: disable=protected-access
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 3)
+
+        with mock.patch("gentoo_build_publisher.build_publisher.DELTA_CHAIN_MAX", 1):
+            with mock.patch.object(
+                publisher, "_compare_packages", wraps=publisher._compare_packages
+            ) as compare_packages:
+                diff = list(publisher.diff_binpkgs(builds[0], builds[2]))
+
+        compare_packages.assert_called_once_with(builds[0], builds[2])
+        self.assertTrue(diff)
+
+    def test_diff_binpkgs_stops_at_first_missing_delta(
+        self, fixtures: Fixtures
+    ) -> None:
+        # pylint: disable=protected-access
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 3)
+        get_delta = publisher.storage.get_delta
+
+        def get_delta_side_effect(build: Build) -> Any:
+            if build == builds[1]:
+                raise LookupError(build)
+            return get_delta(build)
+
+        with (
+            mock.patch.object(
+                publisher.storage, "get_delta", side_effect=get_delta_side_effect
+            ) as mock_get_delta,
+            mock.patch.object(
+                publisher, "_compare_packages", wraps=publisher._compare_packages
+            ) as compare_packages,
+        ):
+            diff = list(publisher.diff_binpkgs(builds[2], builds[0]))
+
+        self.assertEqual(
+            mock_get_delta.call_args_list, [mock.call(builds[2]), mock.call(builds[1])]
+        )
+        compare_packages.assert_called_once_with(builds[2], builds[0])
+        self.assertTrue(diff)
+
+    def test_diff_range(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 4)
+        machine = builds[0].machine
+
+        with mock.patch.object(publisher, "_compare_packages") as compare_packages:
+            history = list(
+                publisher.diff_range(machine, builds[0].build_id, builds[3].build_id)
+            )
+
+        compare_packages.assert_not_called()
+        self.assertEqual(
+            [entry.item for entry in history],
+            [
+                "app-misc/bar-0-1",
+                "app-misc/bar-1-1",
+                "app-misc/bar-2-1",
+                "app-misc/bar-3-1",
+                "app-misc/foo-0-1",
+                "app-misc/foo-1-1",
+                "app-misc/foo-2-1",
+                "app-misc/foo-3-1",
+            ],
+        )
+        foo_0, foo_1, foo_3 = history[4], history[5], history[7]
+        self.assertEqual(
+            (foo_0.added, foo_0.removed, foo_0.builds), (None, builds[1], (builds[1],))
+        )
+        self.assertEqual(
+            (foo_1.added, foo_1.removed, foo_1.builds),
+            (builds[1], builds[2], (builds[1], builds[2])),
+        )
+        self.assertEqual(foo_1.package.build, builds[1])
+        self.assertEqual(
+            (foo_3.added, foo_3.removed, foo_3.builds), (builds[3], None, (builds[3],))
+        )
+
+    def test_diff_range_backwards(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 3)
+        machine = builds[0].machine
+
+        history = list(
+            publisher.diff_range(machine, builds[2].build_id, builds[0].build_id)
+        )
+        foo_1 = next(entry for entry in history if entry.item == "app-misc/foo-1-1")
+
+        self.assertEqual(
+            (foo_1.added, foo_1.removed, foo_1.builds),
+            (builds[1], builds[0], (builds[1], builds[0])),
+        )
+
+    def test_diff_range_backwards_reads_each_delta_once(
+        self, fixtures: Fixtures
+    ) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 3)
+        machine = builds[0].machine
+
+        with mock.patch.object(
+            publisher.storage, "get_delta", wraps=publisher.storage.get_delta
+        ) as get_delta:
+            list(publisher.diff_range(machine, builds[2].build_id, builds[0].build_id))
+
+        self.assertEqual(
+            get_delta.call_args_list, [mock.call(builds[2]), mock.call(builds[1])]
+        )
+
+    def test_diff_range_same_build_is_empty(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        build = pull_builds_with_changes(publisher, 1)[0]
+
+        history = list(
+            publisher.diff_range(build.machine, build.build_id, build.build_id)
+        )
+
+        self.assertEqual(history, [])
+
+    def test_diff_range_does_not_load_every_record(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 3)
+        machine = builds[0].machine
+        records = publisher.repo.build_records
+
+        with mock.patch.object(records, "for_machine") as for_machine:
+            history = list(
+                publisher.diff_range(machine, builds[0].build_id, builds[2].build_id)
+            )
+
+        for_machine.assert_not_called()
+        self.assertTrue(history)
+
+    def test_diff_range_raises_when_build_is_not_completed(
+        self, fixtures: Fixtures
+    ) -> None:
+        publisher = fixtures.publisher
+        build = pull_builds_with_changes(publisher, 1)[0]
+        incomplete = publisher.repo.build_records.save(
+            BuildRecordFactory(machine=build.machine)
+        )
+
+        with self.assertRaises(RecordNotFound) as context:
+            list(
+                publisher.diff_range(build.machine, build.build_id, incomplete.build_id)
+            )
+
+        self.assertEqual(
+            context.exception.args[0], Build(build.machine, incomplete.build_id)
+        )
+
+    def test_diff_range_raises_when_build_does_not_exist(
+        self, fixtures: Fixtures
+    ) -> None:
+        publisher = fixtures.publisher
+        build = pull_builds_with_changes(publisher, 1)[0]
+
+        with self.assertRaises(RecordNotFound) as context:
+            list(publisher.diff_range(build.machine, build.build_id, "bogus"))
+
+        self.assertEqual(context.exception.args[0], Build(build.machine, "bogus"))
+
     def test_tags_returns_the_list_of_tags_except_empty_tag(
         self, fixtures: Fixtures
     ) -> None:
@@ -291,7 +745,9 @@ def test_build_metadata_without_json(self, fixtures: Fixtures) -> None:
         assert build.completed and build.built
         duration = int((build.completed - build.built).total_seconds())
         expected = replace(
-            publisher.storage.get_metadata(build), build_duration=duration
+            publisher.storage.get_metadata(build),
+            build_duration=duration,
+            artifact_sha256=None,
         )
         gbp_json = publisher.storage.get_path(build, Content.BINPKGS) / "gbp.json"
         gbp_json.unlink()
@@ -449,6 +905,23 @@ def test_tagged_minus(self, fixtures: Fixtures) -> None:
             publisher.record(previous_build), publisher.resolve_tag(f"{machine}@test-1")
         )
 
+    def test_tagged_minus_n_is_a_single_lookup(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        builds = pull_builds_with_changes(publisher, 4)
+        machine = builds[0].machine
+        publisher.tag(builds[3], "test")
+        records = publisher.repo.build_records
+
+        with mock.patch.object(records, "previous") as previous:
+            with mock.patch.object(
+                records, "nth_previous", wraps=records.nth_previous
+            ) as nth_previous:
+                resolved = publisher.resolve_tag(f"{machine}@test-3")
+
+        self.assertEqual(publisher.record(builds[0]), resolved)
+        previous.assert_not_called()
+        nth_previous.assert_called_once_with(publisher.record(builds[3]), 3)
+
     def test_no_tag_sym(self, fixtures: Fixtures) -> None:
         publisher = fixtures.publisher
         build = fixtures.build
@@ -520,6 +993,24 @@ def handler(build: Build) -> None:
         self.assertFalse(called)
 
 
+def pull_builds_with_changes(publisher: BuildPublisher, count: int) -> list[Build]:
+    """Pull count consecutive builds of a machine, each adding and removing a package"""
+    artifact_builder = publisher.jenkins.artifact_builder
+    builds: list[Build] = []
+    package = None
+
+    for i in range(count):
+        build = BuildFactory()
+        if package is not None:
+            artifact_builder.remove(build, package)
+        package = artifact_builder.build(build, f"app-misc/foo-{i}")
+        artifact_builder.build(build, f"app-misc/bar-{i}")
+        publisher.pull(build)
+        builds.append(build)
+
+    return builds
+
+
 @fixture()
 def prepull_events(_fixtures: Fixtures) -> FixtureContext[list[Build]]:
     events: list[Build] = []
@@ -574,7 +1065,11 @@ def test_pull_single(self, fixtures: Fixtures) -> None:
         expected = (
             record,
             packages,
-            publisher.gbp_metadata(publisher.jenkins.get_metadata(new_build), packages),
+            publisher.gbp_metadata(
+                publisher.jenkins.get_metadata(new_build),
+                packages,
+                artifact_sha256=publisher.jenkins.artifact_sha256(new_build),
+            ),
         )
         self.assertEqual(fixtures.postpull_events, [expected])
         self.assertEqual(fixtures.prepull_events, [new_build])
@@ -593,13 +1088,21 @@ def test_pull_multi(self, fixtures: Fixtures) -> None:
         event1 = (
             record1,
             packages,
-            publisher.gbp_metadata(publisher.jenkins.get_metadata(record1), packages),
+            publisher.gbp_metadata(
+                publisher.jenkins.get_metadata(record1),
+                packages,
+                artifact_sha256=publisher.jenkins.artifact_sha256(record1),
+            ),
         )
         packages = publisher.storage.get_packages(record2)
         event2 = (
             record2,
             packages,
-            publisher.gbp_metadata(publisher.jenkins.get_metadata(record2), packages),
+            publisher.gbp_metadata(
+                publisher.jenkins.get_metadata(record2),
+                packages,
+                artifact_sha256=publisher.jenkins.artifact_sha256(record2),
+            ),
         )
         self.assertEqual(fixtures.prepull_events, [build1, build2])
         self.assertEqual(fixtures.postpull_events, [event1, event2])
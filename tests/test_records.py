@@ -171,6 +171,85 @@ def test_next_second_built_before_first(self, fixtures: Fixtures) -> None:
 
         self.assertEqual(records.next(build1), None)
 
+    def test_nth_previous_and_nth_next(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        builds = [
+            records.save(
+                BuildRecordFactory(
+                    built=dt.datetime.fromtimestamp(1662310204 + i * 3600, dt.UTC),
+                    completed=dt.datetime.fromtimestamp(1662310304 + i * 3600, dt.UTC),
+                )
+            )
+            for i in range(5)
+        ]
+
+        self.assertEqual(records.nth_previous(builds[4], 1).id, builds[3].id)
+        self.assertEqual(records.nth_previous(builds[4], 3).id, builds[1].id)
+        self.assertEqual(records.nth_previous(builds[4], 4).id, builds[0].id)
+        self.assertIsNone(records.nth_previous(builds[4], 5))
+        self.assertEqual(records.nth_next(builds[0], 1).id, builds[1].id)
+        self.assertEqual(records.nth_next(builds[1], 3).id, builds[4].id)
+        self.assertIsNone(records.nth_next(builds[1], 4))
+
+    def test_nth_previous_skips_incomplete(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        builds = [
+            records.save(
+                BuildRecordFactory(
+                    built=dt.datetime.fromtimestamp(1662310204 + i * 3600, dt.UTC),
+                    completed=(
+                        dt.datetime.fromtimestamp(1662310304 + i * 3600, dt.UTC)
+                        if i != 1
+                        else None
+                    ),
+                )
+            )
+            for i in range(3)
+        ]
+
+        self.assertEqual(records.nth_previous(builds[2], 1).id, builds[0].id)
+        self.assertEqual(
+            records.nth_previous(builds[2], 1, completed=False).id, builds[1].id
+        )
+        self.assertIsNone(records.nth_previous(builds[2], 2))
+
+    def test_nth_raises_when_n_is_not_positive(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        build = records.save(BuildRecordFactory())
+
+        with self.assertRaises(ValueError):
+            records.nth_previous(build, 0)
+
+        with self.assertRaises(ValueError):
+            records.nth_next(build, -1)
+
+    def test_recent(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        builds = [
+            records.save(
+                BuildRecordFactory(
+                    machine="lighthouse",
+                    completed=(
+                        dt.datetime.fromtimestamp(1662310304 + i * 3600, dt.UTC)
+                        if i != 3
+                        else None
+                    ),
+                )
+            )
+            for i in range(5)
+        ]
+        records.save(
+            BuildRecordFactory(machine="anchor", completed=ts("2025-01-01 00:00:00"))
+        )
+
+        recent = records.recent("lighthouse", 3)
+
+        self.assertEqual(
+            [record.id for record in recent], [builds[4].id, builds[2].id, builds[1].id]
+        )
+        self.assertEqual(len(records.recent("lighthouse", 10)), 4)
+        self.assertEqual(records.recent("bogus", 3), [])
+
     def test_latest_with_completed_true(self, fixtures: Fixtures) -> None:
         records = fixtures.records
         build1 = BuildRecordFactory(
@@ -265,6 +344,54 @@ def test_count(self, fixtures: Fixtures) -> None:
         self.assertEqual(records.count("bogus"), 0)
 
 
+@uf.given(records=build_records_fixture)
+@uf.where(records__backend=uf.Param(lambda fixtures: fixtures.backend))
+@uf.params(backend=("django", "memory"))
+class RecordDBBetweenTestCase(TestCase):
+    def test_between(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        builds = [
+            records.save(
+                BuildRecordFactory(
+                    machine="lighthouse",
+                    built=dt.datetime.fromtimestamp(1662310204 + i * 3600, dt.UTC),
+                    completed=(
+                        dt.datetime.fromtimestamp(1662310304 + i * 3600, dt.UTC)
+                        if i != 2
+                        else None
+                    ),
+                )
+            )
+            for i in range(5)
+        ]
+        records.save(
+            BuildRecordFactory(
+                machine="anchor",
+                built=builds[2].built,
+                completed=ts("2025-01-01 00:00:00"),
+            )
+        )
+
+        between = records.between(builds[1], builds[3])
+
+        self.assertEqual(
+            [record.id for record in between], [builds[1].id, builds[3].id]
+        )
+        self.assertEqual(
+            [record.id for record in records.between(builds[1], builds[3], False)],
+            [builds[1].id, builds[2].id, builds[3].id],
+        )
+        self.assertEqual(records.between(builds[3], builds[1]), [])
+
+    def test_between_raises_when_not_built(self, fixtures: Fixtures) -> None:
+        records = fixtures.records
+        build1 = records.save(BuildRecordFactory(built=ts("2025-01-01 00:00:00")))
+        build2 = records.save(BuildRecordFactory(built=None))
+
+        with self.assertRaises(ValueError):
+            records.between(build1, build2)
+
+
 class BuildRecordsTestCase(TestCase):
     def test_django(self) -> None:
         settings = Settings(
@@ -1,12 +1,20 @@
 """Tests for the storage type"""
 
-# pylint: disable=missing-class-docstring,missing-function-docstring
+# pylint: disable=missing-class-docstring,missing-function-docstring,too-many-lines
+import errno
+import fcntl
+import hashlib
+import io
 import json
+import mmap
 import os
 import tarfile
 from dataclasses import replace
 from pathlib import Path
+from typing import Iterator
+from unittest import mock
 
+import requests
 from unittest_fixtures import Fixtures, fixture, given
 
 import gbp_testkit.fixtures as testkit
@@ -19,17 +27,28 @@
 from gentoo_build_publisher.settings import Settings
 from gentoo_build_publisher.storage import (
     INVALID_TEST_PATH,
+    PARTIAL_ARTIFACT_MAX_AGE,
+    SYMLINKS_SETTLE_NS,
+    ArtifactCache,
+    ArtifactChecksumError,
+    MetadataCache,
+    PartialArtifactError,
     Storage,
+    StreamExtractError,
     make_package_from_lines,
     make_packages,
+    parse_packages,
 )
 from gentoo_build_publisher.types import (
     Build,
+    Change,
+    ChangeState,
     Content,
     GBPMetadata,
     Package,
     PackageMetadata,
 )
+from gentoo_build_publisher.utils import fs
 
 from . import lib
 
@@ -281,6 +300,89 @@ def test_deletes_expected_directories(self, fixtures: Fixtures) -> None:
             with self.subTest(directory=directory):
                 self.assertIs(os.path.exists(directory), False)
 
+    def test_deletes_partial_artifact(self, fixtures: Fixtures) -> None:
+        build = Build("babette", "19")
+        storage = Storage(fixtures.tmpdir / "root")
+
+        for keep_partial in [True, False]:
+            with self.subTest(keep_partial=keep_partial):
+                storage.partial_artifact(build).write_bytes(b"partial")
+                storage.partial_artifact_validator(build).write_text('"etag"')
+
+                storage.delete(build, keep_partial=keep_partial)
+
+                self.assertIs(storage.partial_artifact(build).exists(), keep_partial)
+                self.assertIs(
+                    storage.partial_artifact_validator(build).exists(), keep_partial
+                )
+
+
+@given(testkit.build, testkit.storage, jenkins_fixture)
+class StorageTrashTestCase(TestCase):
+    """Tests for Storage.delete and Storage.empty_trash"""
+
+    def test_delete_moves_build_to_trash(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        storage.delete(build)
+
+        self.assertIs(storage.pulled(build), False)
+        trashed = sorted(path.name.split(".")[2] for path in storage.trash.iterdir())
+        self.assertEqual(trashed, sorted(content.value for content in Content))
+
+    def test_empty_trash(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+        storage.delete(build)
+
+        storage.empty_trash()
+
+        self.assertEqual(list(storage.trash.iterdir()), [])
+
+    def test_empty_trash_removes_stale_partial_artifacts(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = fixtures.storage
+        stale, fresh, locked = (
+            Build("babette", "1"),
+            Build("babette", "2"),
+            Build("babette", "3"),
+        )
+        for build in [stale, fresh, locked]:
+            storage.partial_artifact(build).write_bytes(b"partial")
+            storage.partial_artifact_validator(build).write_text('"etag"')
+        for build in [stale, locked]:
+            age(storage.partial_artifact(build), PARTIAL_ARTIFACT_MAX_AGE + 60)
+
+        with storage.partial_artifact(locked).open("rb") as partial:
+            fcntl.flock(partial, fcntl.LOCK_EX)
+            storage.empty_trash()
+
+        self.assertIs(storage.partial_artifact(stale).exists(), False)
+        self.assertIs(storage.partial_artifact_validator(stale).exists(), False)
+        self.assertIs(storage.partial_artifact(fresh).exists(), True)
+        self.assertIs(storage.partial_artifact(locked).exists(), True)
+
+    def test_empty_trash_without_trash(self, fixtures: Fixtures) -> None:
+        fixtures.storage.empty_trash()
+
+        self.assertIs(fixtures.storage.trash.exists(), False)
+
+    def test_delete_across_filesystems(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+        error = OSError(errno.EXDEV, "Invalid cross-device link")
+
+        with mock.patch.object(Path, "rename", side_effect=error):
+            storage.delete(build)
+
+        self.assertIs(storage.pulled(build), False)
+        self.assertEqual(list(storage.trash.iterdir()), [])
+
 
 @given(testkit.build, testkit.storage, jenkins_fixture)
 class StorageExtractArtifactTestCase(TestCase):
@@ -333,6 +435,373 @@ def test_uses_hard_link_if_previous_build_exists(self, fixtures: Fixtures) -> No
         self.assertEqual(package_index.stat().st_nlink, 2)
 
 
+@given(testkit.build, testkit.storage, jenkins_fixture)
+class StoragePartialArtifactTestCase(TestCase):
+    def test_partial_artifact_is_kept_when_download_fails(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        fixtures.jenkins.jenkins_session.disconnects = [50] * 6
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        self.assertIs(storage.pulled(build), False)
+        self.assertEqual(storage.partial_artifact(build).stat().st_size, 300)
+        self.assertEqual(storage.download_offset(build), 300)
+
+    def test_resumes_from_partial_artifact(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        jenkins = fixtures.jenkins
+        jenkins.jenkins_session.disconnects = [50] * 6
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            storage.extract_artifact(build, jenkins.download_artifact(build))
+
+        start = storage.download_offset(build)
+        validator = storage.download_validator(build)
+        storage.extract_artifact(
+            build, jenkins.download_artifact(build, start=start, validator=validator)
+        )
+
+        self.assertIs(storage.pulled(build), True)
+        self.assertIs(storage.partial_artifact(build).exists(), False)
+        self.assertIs(storage.partial_artifact_validator(build).exists(), False)
+        self.assertEqual(
+            jenkins.session.get.call_args.kwargs["headers"],
+            {"Range": "bytes=300-", "If-Range": validator},
+        )
+
+    def test_saves_validator_of_partial_artifact(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        fixtures.jenkins.jenkins_session.disconnects = [50] * 6
+        stream = fixtures.jenkins.download_artifact(build)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            storage.extract_artifact(build, stream)
+
+        self.assertEqual(storage.download_validator(build), stream.validator)
+
+        storage.partial_artifact(build).unlink()
+        self.assertIs(storage.download_validator(build), None)
+
+    def test_raises_when_partial_artifact_in_use(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        with storage.partial_artifact(build).open("a+b") as partial:
+            fcntl.flock(partial, fcntl.LOCK_EX)
+
+            with self.assertRaises(PartialArtifactError):
+                storage.extract_artifact(
+                    build, fixtures.jenkins.download_artifact(build)
+                )
+
+    def test_raises_when_partial_artifact_changed(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        jenkins = fixtures.jenkins
+        b"".join(jenkins.download_artifact(build))
+        stream = jenkins.download_artifact(build, start=100)
+
+        with self.assertRaises(PartialArtifactError):
+            storage.extract_artifact(build, stream)
+
+        self.assertIs(storage.pulled(build), False)
+
+    def test_partial_artifact_is_removed_when_extract_fails(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        with self.assertRaises(tarfile.TarError):
+            storage.extract_artifact(build, [b"this is not a tarball"])
+
+        self.assertIs(storage.partial_artifact(build).exists(), False)
+        self.assertEqual(storage.download_offset(build), 0)
+
+    def test_download_offset_is_zero_when_streaming(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.partial_artifact(build).write_bytes(b"partial")
+
+        self.assertEqual(storage.download_offset(build), 7)
+        self.assertEqual(storage.download_offset(build, stream=True), 0)
+
+
+@given(testkit.build, jenkins_fixture, storage=lambda f: Storage(f.tmpdir, stream=True))
+class StorageStreamExtractArtifactTestCase(TestCase):
+    """Tests for Storage.extract_artifact when streaming"""
+
+    def test_extracts_bytesteam_and_content(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        self.assertIs(storage.pulled(build), True)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_does_not_save_artifact_to_temp_file(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        with mock.patch("gentoo_build_publisher.storage.fs.save_stream") as save_stream:
+            storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        save_stream.assert_not_called()
+
+    def test_uses_hard_link_if_previous_build_exists(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        previous_build = Build("babette", "19")
+        timestamp = jenkins.artifact_builder.timer
+        storage.extract_artifact(
+            previous_build, jenkins.download_artifact(previous_build)
+        )
+        current_build = Build("babette", "20")
+
+        # Reverse time so we have duplicate mtimes
+        jenkins.artifact_builder.timer = timestamp
+        storage.extract_artifact(
+            current_build,
+            jenkins.download_artifact(current_build),
+            previous=previous_build,
+        )
+
+        self.assertIs(storage.pulled(current_build), True)
+        package_index = storage.get_path(current_build, Content.BINPKGS) / "Packages"
+        self.assertEqual(package_index.stat().st_nlink, 2)
+        self.assertTrue(
+            package_index.samefile(
+                storage.get_path(previous_build, Content.BINPKGS) / "Packages"
+            )
+        )
+
+    def test_raises_stream_extract_error(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+
+        with self.assertRaises(StreamExtractError):
+            storage.extract_artifact(build, [data[: len(data) // 2]])
+
+        self.assertIs(storage.pulled(build), False)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_failure_part_way_leaves_nothing_behind(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+
+        def dropped_connection() -> Iterator[bytes]:
+            yield data[: len(data) // 2]
+            raise requests.exceptions.ConnectionError("connection dropped")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            storage.extract_artifact(build, dropped_connection())
+
+        for content in Content:
+            self.assertIs(storage.get_path(build, content).exists(), False)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+        storage.extract_artifact(build, [data])
+
+        self.assertIs(storage.pulled(build), True)
+
+    def test_stream_false_overrides(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        with mock.patch(
+            "gentoo_build_publisher.storage.fs.extract_stream"
+        ) as extract_stream:
+            storage.extract_artifact(
+                build, fixtures.jenkins.download_artifact(build), stream=False
+            )
+
+        extract_stream.assert_not_called()
+        self.assertIs(storage.pulled(build), True)
+
+
+@given(
+    testkit.build, jenkins_fixture, storage=lambda f: Storage(f.tmpdir, copy_threads=4)
+)
+class StorageParallelCopyTestCase(TestCase):
+    """Tests for Storage.extract_artifact with copy_threads"""
+
+    def test_uses_hard_link_if_previous_build_exists(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        previous_build = Build("babette", "19")
+        timestamp = jenkins.artifact_builder.timer
+        storage.extract_artifact(
+            previous_build, jenkins.download_artifact(previous_build)
+        )
+        current_build = Build("babette", "20")
+        jenkins.artifact_builder.timer = timestamp
+
+        storage.extract_artifact(
+            current_build,
+            jenkins.download_artifact(current_build),
+            previous=previous_build,
+        )
+
+        self.assertIs(storage.pulled(current_build), True)
+        package_index = storage.get_path(current_build, Content.BINPKGS) / "Packages"
+        self.assertEqual(package_index.stat().st_nlink, 2)
+
+    def test_errors_are_aggregated(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        previous_build = Build("babette", "19")
+        storage.extract_artifact(
+            previous_build, jenkins.download_artifact(previous_build)
+        )
+        current_build = Build("babette", "20")
+
+        with mock.patch(
+            "gentoo_build_publisher.utils.fs.shutil.copy2", side_effect=OSError("full")
+        ):
+            with self.assertRaises(ExceptionGroup) as context:
+                storage.extract_artifact(
+                    current_build,
+                    jenkins.download_artifact(current_build),
+                    previous=previous_build,
+                )
+
+        self.assertTrue(context.exception.exceptions)
+        for error in context.exception.exceptions:
+            self.assertIsInstance(error, OSError)
+
+
+@given(testkit.build, testkit.storage, jenkins_fixture)
+class StorageLinkStatsTestCase(TestCase):
+    """Tests for the Storage.get_link_stats() method"""
+
+    def test(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        previous = fixtures.build
+        timestamp = jenkins.artifact_builder.timer
+        storage.extract_artifact(previous, jenkins.download_artifact(previous))
+        build = Build(previous.machine, f"{previous.build_id}1")
+        jenkins.artifact_builder.timer = timestamp
+        storage.extract_artifact(build, jenkins.download_artifact(build), previous)
+
+        stats = storage.get_link_stats(previous)
+        self.assertEqual(stats.linked, 0)
+        self.assertGreater(stats.copied, 0)
+
+        stats = storage.get_link_stats(build)
+        self.assertEqual(stats.copied, 0)
+        self.assertGreater(stats.linked, 0)
+        self.assertEqual(stats.ratio, 1.0)
+
+    def test_counts_copied_bytes_without_link_dests(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+
+        for stream in [False, True]:
+            with self.subTest(stream=stream):
+                build = Build("babette", str(int(stream)))
+                data = b"".join(jenkins.download_artifact(build))
+                with tarfile.open(fileobj=io.BytesIO(data)) as tar_file:
+                    size = sum(member.size for member in tar_file if member.isreg())
+
+                with mock.patch.object(fs, "stat_index") as stat_index:
+                    storage.extract_artifact(build, [data], stream=stream)
+
+                stat_index.assert_not_called()
+                self.assertEqual(storage.get_link_stats(build).copied, size)
+
+    def test_links_from_first_matching_candidate(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        timestamp = jenkins.artifact_builder.timer
+        builds = [Build("babette", str(i)) for i in range(3)]
+        for build in builds[1:]:
+            jenkins.artifact_builder.timer = timestamp
+            storage.extract_artifact(build, jenkins.download_artifact(build))
+
+        jenkins.artifact_builder.timer = timestamp
+        storage.extract_artifact(
+            builds[0], jenkins.download_artifact(builds[0]), builds[:0:-1]
+        )
+
+        package_index = storage.get_path(builds[0], Content.BINPKGS) / "Packages"
+        self.assertTrue(
+            package_index.samefile(
+                storage.get_path(builds[2], Content.BINPKGS) / "Packages"
+            )
+        )
+
+    def test_when_not_recorded(self, fixtures: Fixtures) -> None:
+        with self.assertRaises(LookupError):
+            fixtures.storage.get_link_stats(fixtures.build)
+
+
+@given(jenkins_fixture, storage=lambda f: Storage(f.tmpdir, dedup=True))
+class StorageDedupTestCase(TestCase):
+    """Tests for Storage with dedup enabled"""
+
+    def pull_identical_builds(self, fixtures: Fixtures) -> tuple[Build, Build]:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        timestamp = jenkins.artifact_builder.timer
+        builds = (Build("babette", "19"), Build("lighthouse", "1"))
+
+        for build in builds:
+            jenkins.artifact_builder.timer = timestamp
+            storage.extract_artifact(build, jenkins.download_artifact(build))
+
+        return builds
+
+    def test_links_identical_files_across_machines(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build1, build2 = self.pull_identical_builds(fixtures)
+
+        package_index1 = storage.get_path(build1, Content.BINPKGS) / "Packages"
+        package_index2 = storage.get_path(build2, Content.BINPKGS) / "Packages"
+
+        self.assertTrue(package_index1.samefile(package_index2))
+        self.assertEqual(package_index1.stat().st_nlink, 3)
+
+    def test_delete_releases_unreferenced_objects(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build1, build2 = self.pull_identical_builds(fixtures)
+        package_index = storage.get_path(build2, Content.BINPKGS) / "Packages"
+
+        storage.delete(build1)
+        storage.empty_trash()
+
+        self.assertEqual(package_index.stat().st_nlink, 2)
+
+        storage.delete(build2)
+        storage.empty_trash()
+
+        self.assertEqual(
+            [path for path in storage.objects.rglob("*") if path.is_file()], []
+        )
+
+    def test_empty_trash_releases_objects_of_all_trashed_builds(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = fixtures.storage
+
+        for build in self.pull_identical_builds(fixtures):
+            storage.delete(build)
+        storage.empty_trash()
+
+        self.assertEqual(
+            [path for path in storage.objects.rglob("*") if path.is_file()], []
+        )
+
+
 @given(testkit.publisher, testkit.build)
 class StorageGetPackagesTestCase(TestCase):
     """tests for the Storage.get_packages() method"""
@@ -367,6 +836,107 @@ def test_should_raise_lookuperror_when_index_file_missing(
             publisher.storage.get_packages(fixtures.build)
 
 
+@given(testkit.publisher, testkit.build)
+class StorageGetPackageTestCase(TestCase):
+    """tests for the Storage.get_package() method"""
+
+    def test(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+
+        package = publisher.storage.get_package(
+            fixtures.build, "app-crypt/gpgme-1.14.0", 1
+        )
+
+        self.assertEqual(package, publisher.storage.get_packages(fixtures.build)[3])
+
+    def test_when_package_does_not_exist(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+
+        with self.assertRaises(LookupError):
+            publisher.storage.get_package(fixtures.build, "app-crypt/gpgme-1.14.0", 2)
+
+    def test_when_index_file_missing(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+
+        with self.assertRaises(LookupError):
+            publisher.storage.get_package(fixtures.build, "app-crypt/gpgme-1.14.0", 1)
+
+    def test_does_not_parse_index(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        storage._get_packages.cache_clear()  # pylint: disable=protected-access
+
+        with mock.patch("gentoo_build_publisher.storage.parse_packages") as parse:
+            storage.get_package(fixtures.build, "app-crypt/gpgme-1.14.0", 1)
+
+        parse.assert_not_called()
+
+
+@given(testkit.publisher, testkit.build)
+class StorageSavePackagesTestCase(TestCase):
+    """tests for the Storage.save_packages() method"""
+
+    def test_saved_when_pulled(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+
+        path = storage.get_path(fixtures.build, Content.AUX) / "gbp-packages.json"
+        saved = json.loads(path.read_bytes())
+
+        self.assertEqual(len(saved["packages"]), len(PACKAGE_INDEX))
+        self.assertEqual(
+            saved["packages"][3],
+            [
+                "app-crypt/gpgme-1.14.0",
+                "gentoo",
+                "app-crypt/gpgme/gpgme-1.14.0-1.gpkg.tar",
+                1,
+                484,
+                0,
+            ],
+        )
+
+    def test_get_packages_does_not_parse_index(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        expected = storage.get_packages(fixtures.build)
+        storage._get_packages.cache_clear()  # pylint: disable=protected-access
+
+        with mock.patch("gentoo_build_publisher.storage.parse_packages") as parse:
+            packages = storage.get_packages(fixtures.build)
+
+        parse.assert_not_called()
+        self.assertEqual(packages, expected)
+
+    def test_get_packages_parses_index_when_changed(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        index = storage.get_path(fixtures.build, Content.BINPKGS) / "Packages"
+        lines = index.read_text(encoding="utf-8").split("\n")
+        index.write_text("\n".join(lines[:-9]) + "\n", encoding="utf-8")
+
+        packages = storage.get_packages(fixtures.build)
+
+        self.assertEqual(len(packages), len(PACKAGE_INDEX) - 1)
+
+    def test_get_packages_is_cached(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        storage.get_packages(fixtures.build)
+
+        with mock.patch("gentoo_build_publisher.storage.orjson.loads") as loads:
+            storage.get_packages(publisher.record(fixtures.build))
+
+        loads.assert_not_called()
+
+
 @fixture(testkit.publisher)
 def timestamp_fixture(fixtures: Fixtures) -> int:
     publisher = fixtures.publisher
@@ -400,7 +970,7 @@ def test_should_return_gbpmetadata_when_gbp_json_exists(
             packages=PackageMetadata(
                 total=7,
                 size=3807,
-                built=[
+                built=(
                     Package(
                         cpv="dev-libs/cyrus-sasl-2.1.28-r1",
                         repo="gentoo",
@@ -428,8 +998,9 @@ def test_should_return_gbpmetadata_when_gbp_json_exists(
                         build_time=fixtures.timestamp + 30,
                         build=fixtures.build,
                     ),
-                ],
+                ),
             ),
+            artifact_sha256=publisher.jenkins.artifact_sha256(fixtures.build),
         )
         self.assertEqual(metadata, expected)
 
@@ -479,7 +1050,7 @@ def test(self, fixtures: Fixtures) -> None:
         package_metadata = PackageMetadata(
             total=666,
             size=666,
-            built=[
+            built=(
                 Package(
                     cpv="sys-foo/bar-1.0",
                     repo="marduk",
@@ -488,8 +1059,8 @@ def test(self, fixtures: Fixtures) -> None:
                     size=666,
                     build_time=0,
                     build=fixtures.build,
-                )
-            ],
+                ),
+            ),
         )
         gbp_metadata = GBPMetadata(build_duration=666, packages=package_metadata)
         publisher.storage.set_metadata(fixtures.build, gbp_metadata)
@@ -498,6 +1069,7 @@ def test(self, fixtures: Fixtures) -> None:
             result = json.load(json_file)
 
         expected = {
+            "artifact_sha256": None,
             "build_duration": 666,
             "gbp_hostname": utils.get_hostname(),
             "gbp_version": utils.get_version(),
@@ -523,6 +1095,419 @@ def test(self, fixtures: Fixtures) -> None:
         self.assertEqual(result, expected)
 
 
+@given(testkit.publisher, testkit.build)
+class StorageMetadataCacheTestCase(TestCase):
+    """tests for the caching of Storage.get_metadata()"""
+
+    def test_reads_file_once(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        storage.metadata_cache.clear()
+        expected = storage.get_metadata(fixtures.build)
+
+        with mock.patch("gentoo_build_publisher.storage.orjson.loads") as loads:
+            metadata = storage.get_metadata(publisher.record(fixtures.build))
+
+        loads.assert_not_called()
+        self.assertEqual(metadata, expected)
+        info = storage.metadata_cache.info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_cached_packages_are_immutable(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        metadata = storage.get_metadata(fixtures.build)
+
+        self.assertIsInstance(metadata.packages.built, tuple)
+        self.assertIs(storage.get_metadata(fixtures.build), metadata)
+
+    def test_invalidated_when_file_changes(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        metadata = storage.get_metadata(fixtures.build)
+        path = storage.get_path(fixtures.build, Content.BINPKGS) / "gbp.json"
+        stat = path.stat()
+        path.write_bytes(
+            path.read_bytes().replace(b'"build_duration":124', b'"build_duration":666')
+        )
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        metadata = replace(metadata, build_duration=666)
+
+        self.assertEqual(storage.get_metadata(fixtures.build), metadata)
+
+    def test_invalidated_by_set_metadata(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        metadata = replace(storage.get_metadata(fixtures.build), build_duration=666)
+
+        with mock.patch.object(storage.metadata_cache, "discard") as discard:
+            storage.set_metadata(fixtures.build, metadata)
+
+        discard.assert_called_once_with(fixtures.build)
+        self.assertEqual(storage.get_metadata(fixtures.build), metadata)
+
+    def test_invalidated_by_delete(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build)
+        storage = publisher.storage
+        storage.get_metadata(fixtures.build)
+
+        storage.delete(fixtures.build)
+
+        self.assertEqual(storage.metadata_cache.info().currsize, 0)
+        with self.assertRaises(LookupError):
+            storage.get_metadata(fixtures.build)
+
+
+@given(testkit.build, testkit.storage, jenkins_fixture)
+class StorageChecksumTestCase(TestCase):
+    def test_returns_digest(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+        checksum = hashlib.sha256(data).hexdigest()
+
+        digest = fixtures.storage.extract_artifact(build, [data], checksum=checksum)
+
+        self.assertEqual(digest, checksum)
+        self.assertIs(fixtures.storage.pulled(build), True)
+
+    def test_returns_digest_when_streaming(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+        checksum = hashlib.sha256(data).hexdigest()
+        chunks = [data[i : i + 16] for i in range(0, len(data), 16)]
+
+        digest = fixtures.storage.extract_artifact(
+            build, chunks, stream=True, checksum=checksum.upper()
+        )
+
+        self.assertEqual(digest, checksum)
+        self.assertIs(fixtures.storage.pulled(build), True)
+
+    def test_mismatch_raises_before_extracting(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+
+        with mock.patch.object(fs, "extract") as extract:
+            with self.assertRaises(ArtifactChecksumError):
+                storage.extract_artifact(build, [data], checksum="0" * 64)
+
+        extract.assert_not_called()
+        self.assertIs(storage.pulled(build), False)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_mismatch_when_streaming_never_installs_build(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+
+        with (
+            mock.patch.object(storage, "_install") as install,
+            mock.patch.object(storage, "delete") as delete,
+            self.assertRaises(ArtifactChecksumError),
+        ):
+            storage.extract_artifact(build, [data], stream=True, checksum="0" * 64)
+
+        install.assert_not_called()
+        delete.assert_not_called()
+        for content in Content:
+            self.assertIs(storage.get_path(build, content).exists(), False)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_digest_includes_partial_artifact(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+        storage.partial_artifact(build).write_bytes(data[:100])
+
+        digest = storage.extract_artifact(
+            build, [data[100:]], checksum=hashlib.sha256(data).hexdigest()
+        )
+
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+
+
+@given(testkit.build, testkit.storage, jenkins_fixture)
+class StorageArtifactCacheTestCase(TestCase):
+    def test_caches_downloaded_artifact(self, fixtures: Fixtures) -> None:
+        storage = Storage(fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024)
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+
+        storage.extract_artifact(build, [data])
+
+        self.assertIs(storage.pulled(build), True)
+        self.assertEqual(storage.artifact_cache.get(build).read_bytes(), data)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_caches_validator_of_downloaded_artifact(self, fixtures: Fixtures) -> None:
+        storage = Storage(fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024)
+        build = fixtures.build
+        stream = fixtures.jenkins.download_artifact(build)
+
+        storage.extract_artifact(build, stream)
+
+        self.assertEqual(storage.artifact_cache.validator(build), stream.validator)
+
+    def test_extracts_from_cache(self, fixtures: Fixtures) -> None:
+        storage = Storage(fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024)
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+        storage.delete(build)
+
+        with self.assertLogs("gentoo_build_publisher.storage") as logs:
+            storage.extract_artifact(build, mock.Mock(side_effect=AssertionError))
+
+        self.assertIs(storage.pulled(build), True)
+        self.assertIn(f"Using cached artifact for build: {build}", logs.output[1])
+
+    def test_extracts_from_cache_when_streaming(self, fixtures: Fixtures) -> None:
+        storage = Storage(
+            fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024, stream=True
+        )
+        build = fixtures.build
+        storage.extract_artifact(
+            build, fixtures.jenkins.download_artifact(build), stream=False
+        )
+        storage.delete(build)
+
+        storage.extract_artifact(build, mock.Mock(side_effect=AssertionError))
+
+        self.assertIs(storage.pulled(build), True)
+
+    def test_discards_corrupt_artifact(self, fixtures: Fixtures) -> None:
+        storage = Storage(fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024)
+        build = fixtures.build
+
+        with self.assertRaises(tarfile.TarError):
+            storage.extract_artifact(build, [b"this is not a tarball"])
+
+        self.assertNotIn(build, storage.artifact_cache)
+        self.assertEqual(list(storage.temp.iterdir()), [])
+
+    def test_keeps_artifact_when_extract_fails_otherwise(
+        self, fixtures: Fixtures
+    ) -> None:
+        storage = Storage(fixtures.tmpdir / "cached", artifact_cache_size=1024 * 1024)
+        build = fixtures.build
+        data = b"".join(fixtures.jenkins.download_artifact(build))
+        error = OSError(errno.ENOSPC, "No space left on device")
+
+        with (
+            mock.patch.object(fs, "extract", side_effect=error),
+            self.assertRaises(OSError),
+        ):
+            storage.extract_artifact(build, [data])
+
+        self.assertEqual(storage.artifact_cache.get(build).read_bytes(), data)
+
+    def test_disabled_by_default(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        self.assertIs(storage.artifact_cache.get(build), None)
+        self.assertIs(storage.artifact_cache.path.exists(), False)
+
+
+@given(testkit.tmpdir)
+class ArtifactCacheTestCase(TestCase):
+    def artifact(self, path: Path, size: int) -> Path:
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_add_and_get(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        build = Build("babette", "1")
+        artifact = self.artifact(fixtures.tmpdir / "artifact", 10)
+
+        path = cache.add(build, artifact)
+
+        self.assertEqual(path, cache_dir / "babette.1")
+        self.assertIs(artifact.exists(), False)
+        self.assertEqual(cache.get(build), path)
+        self.assertIn(build, cache)
+        self.assertEqual(cache.size(), 10)
+
+    def test_evicts_least_recently_used(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        builds = [Build("babette", str(i)) for i in range(3)]
+
+        for build in builds[:2]:
+            cache.add(build, self.artifact(fixtures.tmpdir / "artifact", 40))
+        os.utime(cache.get(builds[1]), ns=(0, 0))
+        cache.get(builds[0])
+        cache.add(builds[2], self.artifact(fixtures.tmpdir / "artifact", 40))
+
+        self.assertIn(builds[0], cache)
+        self.assertNotIn(builds[1], cache)
+        self.assertIn(builds[2], cache)
+        self.assertEqual(cache.size(), 80)
+
+    def test_does_not_add_artifacts_too_large(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        build = Build("babette", "1")
+        artifact = self.artifact(fixtures.tmpdir / "artifact", 101)
+
+        self.assertIs(cache.add(build, artifact), None)
+        self.assertIs(artifact.exists(), True)
+        self.assertNotIn(build, cache)
+
+    def test_disabled(self, fixtures: Fixtures) -> None:
+        cache = ArtifactCache(fixtures.tmpdir / "artifacts")
+        build = Build("babette", "1")
+        artifact = self.artifact(fixtures.tmpdir / "artifact", 0)
+
+        self.assertIs(cache.add(build, artifact), None)
+        self.assertIs(cache.get(build), None)
+        self.assertEqual(cache.size(), 0)
+
+    def test_get_with_validator(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        build = Build("babette", "1")
+        path = cache.add(build, self.artifact(fixtures.tmpdir / "artifact", 10), '"v1"')
+
+        self.assertEqual(cache.validator(build), '"v1"')
+        self.assertEqual(cache.get(build, '"v1"'), path)
+        self.assertEqual(cache.get(build), path)
+        self.assertIs(cache.get(build, '"v2"'), None)
+        self.assertNotIn(build, cache)
+        self.assertIs(cache.validator(build), None)
+
+    def test_get_with_validator_when_cached_without(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        build = Build("babette", "1")
+        cache.add(build, self.artifact(fixtures.tmpdir / "artifact", 10))
+
+        self.assertIs(cache.get(build, '"v1"'), None)
+        self.assertNotIn(build, cache)
+
+    def test_evicts_validators(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 50)
+        builds = [Build("babette", str(i)) for i in range(2)]
+
+        for build in builds:
+            cache.add(build, self.artifact(fixtures.tmpdir / "artifact", 40), '"v"')
+
+        self.assertEqual(
+            sorted(path.name for path in cache_dir.iterdir()),
+            ["babette.1", "babette.1.validator"],
+        )
+        self.assertEqual(cache.size(), 40)
+
+    def test_discard(self, fixtures: Fixtures) -> None:
+        cache_dir = fixtures.tmpdir / "artifacts"
+        cache_dir.mkdir()
+        cache = ArtifactCache(cache_dir, 100)
+        build = Build("babette", "1")
+        cache.add(build, self.artifact(fixtures.tmpdir / "artifact", 10))
+
+        cache.discard(build)
+        cache.discard(build)
+
+        self.assertNotIn(build, cache)
+
+
+@given(testkit.publisher, build2=testkit.build, build1=testkit.build)
+class StorageDeltaTestCase(TestCase):
+    def test_set_and_get(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build1, build2 = fixtures.build1, fixtures.build2
+        publisher.jenkins.artifact_builder.build(build2, "app-misc/foo-1")
+        publisher.pull(build1)
+        publisher.pull(build2)
+        package = storage.get_package(build2, "app-misc/foo-1", 1)
+        changes = [Change("app-misc/foo-1-1", ChangeState.ADDED, package)]
+
+        storage.set_delta(build2, build1, changes)
+
+        self.assertEqual(storage.get_delta(build2), (build1, changes))
+
+    def test_no_delta(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        publisher.pull(fixtures.build1)
+
+        with self.assertRaises(LookupError):
+            publisher.storage.get_delta(fixtures.build1)
+
+    def test_out_of_date(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build1, build2 = fixtures.build1, fixtures.build2
+        publisher.pull(build1)
+        publisher.pull(build2)
+        storage.set_delta(build2, build1, [])
+        index = storage.get_path(build1, Content.BINPKGS) / "Packages"
+        index.write_bytes(index.read_bytes() + b"\n")
+
+        with self.assertRaises(LookupError):
+            storage.get_delta(build2)
+
+
+@given(testkit.build)
+class MetadataCacheTestCase(TestCase):
+    def test_evicts_least_recently_used(self, fixtures: Fixtures) -> None:
+        metadata = GBPMetadata(
+            build_duration=1, packages=PackageMetadata(total=0, size=0, built=())
+        )
+        cache = MetadataCache(maxsize=100)
+        builds = BuildFactory.create_batch(3)
+
+        cache.set(builds[0], (1, 40), metadata)
+        cache.set(builds[1], (1, 40), metadata)
+        cache.get(builds[0], (1, 40))
+        cache.set(builds[2], (1, 40), metadata)
+
+        self.assertIs(cache.get(builds[0], (1, 40)), metadata)
+        self.assertIsNone(cache.get(builds[1], (1, 40)))
+        self.assertIs(cache.get(builds[2], (1, 40)), metadata)
+        self.assertEqual(cache.info().currsize, 80)
+
+    def test_does_not_cache_entries_larger_than_maxsize(
+        self, fixtures: Fixtures
+    ) -> None:
+        metadata = GBPMetadata(
+            build_duration=1, packages=PackageMetadata(total=0, size=0, built=())
+        )
+        cache = MetadataCache(maxsize=100)
+
+        cache.set(fixtures.build, (1, 101), metadata)
+
+        self.assertIsNone(cache.get(fixtures.build, (1, 101)))
+        self.assertEqual(cache.info().currsize, 0)
+
+    def test_stale_key_is_a_miss(self, fixtures: Fixtures) -> None:
+        metadata = GBPMetadata(
+            build_duration=1, packages=PackageMetadata(total=0, size=0, built=())
+        )
+        cache = MetadataCache()
+        cache.set(fixtures.build, (1, 10), metadata)
+
+        self.assertIsNone(cache.get(fixtures.build, (2, 10)))
+        self.assertEqual(cache.info().misses, 1)
+
+
 @given(testkit.publisher)
 class StorageReposTestCase(TestCase):
     def test(self, fixtures: Fixtures) -> None:
@@ -689,6 +1674,214 @@ def test_get_path_with_published_tag(self, fixtures: Fixtures) -> None:
         self.assertEqual(expected, path)
 
 
+@given(
+    testkit.build,
+    jenkins_fixture,
+    storage=lambda f: Storage(f.tmpdir, atomic_publish=True),
+)
+class StorageAtomicPublishTestCase(TestCase):
+    """Tests for Storage.tag/publish with atomic publishing"""
+
+    def test_tag(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+
+        storage.tag(build, "prod")
+
+        name = f"{build.machine}@prod"
+        self.assertEqual(os.readlink(storage.builds / name), str(build))
+        for item in Content:
+            path = storage.root / item.value / name
+            self.assertEqual(os.readlink(path), f"../builds/{name}/{item.value}")
+            self.assertEqual(path.resolve(), storage.get_path(build, item))
+        self.assertEqual(storage.get_tags(build), ["prod"])
+        self.assertEqual(storage.resolve_tag(name), build)
+
+    def test_retag_is_a_single_rename(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        jenkins = fixtures.jenkins
+        build1 = fixtures.build
+        build2 = Build(build1.machine, f"{build1.build_id}1")
+        storage.extract_artifact(build1, jenkins.download_artifact(build1))
+        storage.extract_artifact(build2, jenkins.download_artifact(build2))
+        storage.publish(build1)
+
+        with mock.patch.object(fs, "symlink", wraps=fs.symlink) as symlink:
+            storage.publish(build2)
+
+        symlink.assert_called_once_with(
+            str(build2), str(storage.builds / build1.machine)
+        )
+        self.assertFalse(storage.published(build1))
+        self.assertTrue(storage.published(build2))
+
+    def test_untag(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+        storage.tag(build, "prod")
+
+        storage.untag(build.machine, "prod")
+
+        self.assertEqual(storage.get_tags(build), [])
+        self.assertEqual(list(storage.builds.glob("*@*")), [])
+        self.assertEqual(storage.snapshot().broken[Content.BINPKGS], set())
+
+    def test_delete(self, fixtures: Fixtures) -> None:
+        storage = fixtures.storage
+        build = fixtures.build
+        storage.extract_artifact(build, fixtures.jenkins.download_artifact(build))
+        storage.publish(build)
+
+        storage.delete(build)
+
+        self.assertFalse((storage.builds / str(build)).exists())
+        self.assertFalse(storage.published(build))
+
+
+@given(testkit.publisher)
+class StorageSnapshotTestCase(TestCase):
+    """Tests for the Storage.snapshot method"""
+
+    def test(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build1 = BuildFactory()
+        build2 = BuildFactory()
+        publisher.pull(build1)
+        publisher.pull(build2)
+        storage.publish(build2)
+        storage.tag(build1, "stable")
+        storage.get_path(build1, Content.REPOS).rename(storage.temp / "repos")
+
+        snapshot = storage.snapshot()
+
+        self.assertFalse(snapshot.pulled(build1))
+        self.assertEqual(snapshot.missing(build1), [Content.REPOS])
+        self.assertTrue(snapshot.pulled(build2))
+        self.assertEqual(snapshot.builds[Content.REPOS], {build2.id})
+        self.assertEqual(
+            snapshot.symlinks[Content.BINPKGS][build2.machine],
+            str(storage.get_path(build2, Content.BINPKGS)),
+        )
+        self.assertEqual(snapshot.broken[Content.REPOS], {f"{build1.machine}@stable"})
+        self.assertEqual(snapshot.broken[Content.BINPKGS], set())
+        self.assertEqual(
+            snapshot.tags(build1.machine), {"": build2.id, "stable": build1.id}
+        )
+
+    def test_inconsistent_tags(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build1 = BuildFactory()
+        build2 = BuildFactory()
+        publisher.pull(build1)
+        publisher.pull(build2)
+        storage.tag(build1, "stable")
+        symlink = storage.get_path(build1, Content.REPOS, tag="stable")
+        symlink.unlink()
+        symlink.symlink_to(storage.get_path(build2, Content.REPOS))
+
+        snapshot = storage.snapshot()
+
+        self.assertEqual(
+            snapshot.targets(f"{build1.machine}@stable"), {build1.id, build2.id}
+        )
+        self.assertEqual(snapshot.tags(build1.machine), {})
+
+
+def age(path: Path, seconds: int = 60) -> None:
+    """Set the path's mtime to the given number of seconds ago"""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+
+@given(testkit.publisher, testkit.build)
+class StorageSymlinksTestCase(TestCase):
+    """Tests for the Storage.symlinks method"""
+
+    def test(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build = fixtures.build
+        publisher.pull(build)
+        storage.publish(build)
+        storage.tag(build, "prod")
+
+        symlinks = storage.symlinks()
+
+        expected = tuple(storage.get_path(build, item) for item in Content)
+        self.assertEqual(
+            symlinks, {build.machine: expected, f"{build.machine}@prod": expected}
+        )
+
+    def test_partial_symlinks_are_excluded(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build = fixtures.build
+        publisher.pull(build)
+        storage.tag(build, "prod")
+        storage.get_path(build, Content.REPOS, tag="prod").unlink()
+
+        self.assertEqual(storage.symlinks(), {})
+
+    def test_cached_until_binpkgs_changes(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build = fixtures.build
+        publisher.pull(build)
+        storage.publish(build)
+        age(storage.root / "binpkgs")
+        storage.symlinks()
+
+        with mock.patch("gentoo_build_publisher.storage.os.scandir") as scandir:
+            self.assertTrue(storage.published(build))
+            self.assertEqual(storage.get_tags(build), [""])
+            self.assertEqual(storage.resolve_tag(f"{build.machine}@"), build)
+
+        scandir.assert_not_called()
+
+        storage.tag(build, "prod")
+
+        self.assertEqual(storage.get_tags(build), ["", "prod"])
+
+    def test_second_lookup_inside_window_uses_cache(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build = fixtures.build
+        publisher.pull(build)
+        storage.publish(build)
+        mtime = (storage.root / "binpkgs").stat().st_mtime_ns
+        scanned = mtime + SYMLINKS_SETTLE_NS + 1
+
+        with mock.patch(
+            "gentoo_build_publisher.storage.time.time_ns", return_value=scanned
+        ):
+            storage.symlinks()
+
+        with mock.patch(
+            "gentoo_build_publisher.storage.time.time_ns", return_value=scanned + 1
+        ):
+            with mock.patch("gentoo_build_publisher.storage.os.scandir") as scandir:
+                self.assertTrue(storage.published(build))
+
+        scandir.assert_not_called()
+
+    def test_not_cached_when_binpkgs_recently_changed(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        storage = publisher.storage
+        build = fixtures.build
+        publisher.pull(build)
+        storage.publish(build)
+        storage.symlinks()
+
+        with mock.patch(
+            "gentoo_build_publisher.storage.os.scandir", return_value=iter([])
+        ):
+            self.assertFalse(storage.published(build))
+
+
 @given(testkit.publisher)
 class StorageResolveTagTestCase(TestCase):
     """Tests for the Storage.resolve_tag method"""
@@ -775,35 +1968,133 @@ def test_resolve_published_tag(self, fixtures: Fixtures) -> None:
 
 @given(testkit.build)
 class MakePackageFromLinesTestCase(TestCase):
-    """Tests for the make_package_from_lines method"""
+    """Tests for the (deprecated) make_package_from_lines function"""
 
     def test(self, fixtures: Fixtures) -> None:
-        result = make_package_from_lines(lib.PACKAGE_LINES, fixtures.build)
+        with self.assertWarns(DeprecationWarning):
+            result = make_package_from_lines(lib.PACKAGE_LINES, fixtures.build)
 
-        self.assertIsInstance(result, Package)
+        index = "\n" + "\n".join(lib.PACKAGE_LINES)
+        self.assertEqual([result], list(parse_packages(index.encode(), fixtures.build)))
 
     def test_when_line_missing(self, fixtures: Fixtures) -> None:
         lines = [line for line in lib.PACKAGE_LINES if not line.startswith("CPV:")]
 
-        with self.assertRaises(ValueError) as context:
+        with (
+            self.assertRaises(ValueError) as context,
+            self.assertWarns(DeprecationWarning),
+        ):
             make_package_from_lines(lines, fixtures.build)
 
         self.assertEqual(context.exception.args[0], "Package lines missing CPV value")
 
 
-@given(testkit.publisher, testkit.build)
+@given(testkit.publisher)
 class MakePackagesTestCase(TestCase):
-    """Tests for the make_packages method"""
+    """Tests for the (deprecated) make_packages function"""
 
     def test(self, fixtures: Fixtures) -> None:
         build = BuildFactory()
         publisher = fixtures.publisher
         publisher.pull(build)
-        index_file = publisher.storage.get_path(build, Content.BINPKGS) / "Packages"
 
-        with index_file.open(encoding="UTF-8") as opened_index_file:
-            while opened_index_file.readline().strip():  # skip preamble
-                pass
-            packages = [*make_packages(opened_index_file, fixtures.build)]
+        with self.assertWarns(DeprecationWarning):
+            with publisher.storage.package_index_file(build) as index_file:
+                while index_file.readline().strip():  # skip preamble
+                    pass
+                with self.assertWarns(DeprecationWarning):
+                    packages = [*make_packages(index_file, build)]
+
+        self.assertEqual(packages, publisher.storage.get_packages(build))
+
+    def test_package_index_file_when_missing(self, fixtures: Fixtures) -> None:
+        build = BuildFactory()
+
+        with self.assertRaises(LookupError), self.assertWarns(DeprecationWarning):
+            fixtures.publisher.storage.package_index_file(build)
+
+
+@given(testkit.build)
+class ParsePackagesTestCase(TestCase):
+    """Tests for the parse_packages function"""
+
+    def package(self, build: Build, cpv: str) -> Package:
+        return Package(
+            cpv=cpv,
+            repo="gentoo",
+            path="x11-themes/gnome-backgrounds/gnome-backgrounds-43-r1-4.gpkg.tar",
+            build_id=3,
+            size=32530181,
+            build_time=1666772558,
+            build=build,
+        )
+
+    def test(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        lines = "\n".join(lib.PACKAGE_LINES)
+        other = lines.replace("CPV: x11-themes/gnome-backgrounds-43-r1", "CPV: a/b-1")
+        index = f"ARCH: amd64\nPACKAGES: 2\n\n{lines}\n\n{other}\n"
+
+        packages = list(parse_packages(index.encode(), build))
+
+        self.assertEqual(
+            packages,
+            [
+                self.package(build, "x11-themes/gnome-backgrounds-43-r1"),
+                self.package(build, "a/b-1"),
+            ],
+        )
+
+    def test_extra_whitespace(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        lines = "\n".join(f"  {line}  " for line in lib.PACKAGE_LINES)
+        index = f"ARCH: amd64\n  \n\n\n{lines}\n \n\n"
+
+        packages = list(parse_packages(index.encode(), build))
+
+        self.assertEqual(
+            packages, [self.package(build, "x11-themes/gnome-backgrounds-43-r1")]
+        )
+
+    def test_without_preamble(self, fixtures: Fixtures) -> None:
+        build = fixtures.build
+        lines = "\n".join(lib.PACKAGE_LINES)
+
+        self.assertEqual(
+            list(parse_packages(f"\n{lines}\n".encode(), build)),
+            [self.package(build, "x11-themes/gnome-backgrounds-43-r1")],
+        )
+        # The first section is the preamble
+        self.assertEqual(list(parse_packages(lines.encode(), build)), [])
+        self.assertEqual(list(parse_packages(b"", build)), [])
+
+    def test_when_line_missing(self, fixtures: Fixtures) -> None:
+        lines = [line for line in lib.PACKAGE_LINES if not line.startswith("CPV:")]
+        index = "\n" + "\n".join(lines)
+
+        with self.assertRaises(ValueError) as context:
+            list(parse_packages(index.encode(), fixtures.build))
+
+        self.assertEqual(context.exception.args[0], "Package lines missing CPV value")
+
+    def test_malformed_line(self, fixtures: Fixtures) -> None:
+        lines = "\n".join([*lib.PACKAGE_LINES, "this is not a field"])
+        index = f"ARCH: amd64\n\n{lines}\n"
+
+        with self.assertRaises(ValueError) as context:
+            list(parse_packages(index.encode(), fixtures.build))
+
+        self.assertEqual(
+            context.exception.args[0],
+            "Invalid line in Packages index: 'this is not a field'",
+        )
+
+    def test_mmap(self, fixtures: Fixtures) -> None:
+        lines = "\n".join(lib.PACKAGE_LINES)
+        index = f"ARCH: amd64\n\n{lines}"
+
+        with mmap.mmap(-1, len(index)) as buffer:
+            buffer.write(index.encode())
+            packages = list(parse_packages(buffer, fixtures.build))
 
-        self.assertEqual(len(packages), 4)
+        self.assertEqual(packages, list(parse_packages(index.encode(), fixtures.build)))
@@ -5,7 +5,7 @@
 
 from unittest_fixtures import Fixtures, params
 
-from gentoo_build_publisher.types import Build, ChangeState, InvalidBuild
+from gentoo_build_publisher.types import Build, ChangeState, InvalidBuild, Package
 
 
 class BuildTestCase(TestCase):
@@ -30,6 +30,39 @@ def test_repr(self) -> None:
         self.assertEqual("Build('babette.16')", repr(build))
 
 
+class PackageTests(TestCase):
+    def test_row_round_trip(self) -> None:
+        build = Build("babette", "16")
+        package = Package(
+            cpv="app-arch/tar-1.35",
+            repo="gentoo",
+            path="app-arch/tar/tar-1.35-1.gpkg.tar",
+            build_id=1,
+            size=1024,
+            build_time=1700000000,
+            build=build,
+        )
+
+        row = package.row()
+
+        self.assertEqual(
+            row,
+            [
+                "app-arch/tar-1.35",
+                "gentoo",
+                "app-arch/tar/tar-1.35-1.gpkg.tar",
+                1,
+                1024,
+                1700000000,
+            ],
+        )
+        self.assertEqual(Package.from_row(row, build), package)
+
+    def test_from_row_with_wrong_length(self) -> None:
+        with self.assertRaises(ValueError):
+            Package.from_row(["app-arch/tar-1.35", "gentoo"], Build("babette", "16"))
+
+
 @params(
     old=(None, "xx", None, "xx", "xx"),
     new=(None, "xx", "xx", None, "xy"),
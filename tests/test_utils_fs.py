@@ -1,6 +1,17 @@
 # pylint: disable=missing-docstring
+import datetime as dt
+import gzip
+import hashlib
+import io
 import os
 import shutil
+import subprocess
+import tarfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+from unittest import mock
 
 from unittest_fixtures import Fixtures, given
 
@@ -48,41 +59,627 @@ def test(self, fixtures: Fixtures) -> None:
             self.assertIs(path.is_dir(), True)
 
 
-@given(file=lambda f: str(create_file(f.tmpdir / "foo", b"test", TIMESTAMP)))
+def make_tarfile(path: Path, mode: str) -> Path:
+    with tarfile.open(path, mode) as tar_file:
+        tar_info = tarfile.TarInfo("binpkgs/Packages")
+        tar_info.size = 4
+        tar_file.addfile(tar_info, io.BytesIO(b"test"))
+
+    return path
+
+
 @given(testkit.tmpdir)
-class QuickCheckTestCase(TestCase):
-    """Tests for the quick_check() helper method"""
+class ExtractCompressedTestCase(TestCase):
+    def test_xz(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar.xz", "x:xz")
+        extracted = fixtures.tmpdir / "extracted"
 
-    def test(self, fixtures: Fixtures) -> None:
-        other = str(create_file(fixtures.tmpdir / "bar", b"xxxx", TIMESTAMP))
+        fs.extract(path, extracted)
+
+        self.assertEqual((extracted / "binpkgs/Packages").read_bytes(), b"test")
+
+    def test_external_decompressor(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar.gz", "x:gz")
+        extracted = fixtures.tmpdir / "extracted"
+
+        popen = mock.Mock(wraps=subprocess.Popen)
+
+        with mock.patch.object(fs, "decompressor", return_value=("gzip", "-dc")):
+            with mock.patch.object(fs.subprocess, "Popen", popen):
+                fs.extract(path, extracted)
+
+        popen.assert_called_once()
+        self.assertEqual(popen.call_args.args, (("gzip", "-dc"),))
+        self.assertEqual((extracted / "binpkgs/Packages").read_bytes(), b"test")
+
+    def test_external_decompressor_fails(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar.gz", "x:gz")
+        path.write_bytes(path.read_bytes()[:-20])
 
-        result = fs.quick_check(fixtures.file, other)
+        with self.assertRaises(tarfile.TarError) as context:
+            fs.extract_with(("gzip", "-dc"), path, fixtures.tmpdir / "extracted")
 
-        self.assertIs(result, True)
+        self.assertIn("gzip exited with status 1", str(context.exception))
+        self.assertIn("unexpected end of file", str(context.exception))
 
-    def test_should_return_false_when_file_does_not_exist(
+    def test_corrupt_tarfile_with_external_decompressor(
         self, fixtures: Fixtures
     ) -> None:
-        other = str(fixtures.tmpdir / "bogus")
+        path = fixtures.tmpdir / "test.tar.gz"
+        path.write_bytes(gzip.compress(b"this is not a tar file" * 100_000))
+
+        with self.assertRaises(tarfile.ReadError) as context:
+            fs.extract_with(("gzip", "-dc"), path, fixtures.tmpdir / "extracted")
+
+        self.assertNotIn("gzip exited", str(context.exception))
+
+    def test_without_external_decompressor(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar.gz", "x:gz")
+        extracted = fixtures.tmpdir / "extracted"
+
+        with mock.patch.object(fs, "decompressor", return_value=None):
+            with mock.patch.object(fs, "extract_with") as extract_with:
+                fs.extract(path, extracted)
+
+        extract_with.assert_not_called()
+        self.assertEqual((extracted / "binpkgs/Packages").read_bytes(), b"test")
+
+
+@given(testkit.tmpdir)
+class CompressionTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        for mode, expected in [("gz", "gz"), ("xz", "xz"), ("", None)]:
+            with self.subTest(mode=mode):
+                path = fixtures.tmpdir / f"test.{mode}"
+                make_tarfile(path, f"w:{mode}")
+
+                self.assertEqual(fs.compression(path), expected)
+
+    def test_zstd(self, fixtures: Fixtures) -> None:
+        path = fixtures.tmpdir / "test.tar.zst"
+        path.write_bytes(b"\x28\xb5\x2f\xfd" + b"\0" * 10)
+
+        self.assertEqual(fs.compression(path), "zst")
+
+    def test_zstd_without_decompressor(self, fixtures: Fixtures) -> None:
+        path = fixtures.tmpdir / "test.tar.zst"
+        path.write_bytes(b"\x28\xb5\x2f\xfd" + b"\0" * 10)
+        extracted = fixtures.tmpdir / "extracted"
+
+        # As with Python < 3.14
+        with (
+            mock.patch.object(fs, "decompressor", return_value=None),
+            mock.patch.object(tarfile.TarFile, "OPEN_METH", {"tar": "taropen"}),
+        ):
+            with self.assertRaises(fs.UnsupportedCompressionError) as context:
+                fs.extract(path, extracted)
+            with self.assertRaises(fs.UnsupportedCompressionError):
+                fs.extract_stream([path.read_bytes()], extracted)
+
+        self.assertEqual(
+            str(context.exception),
+            "Cannot decompress zst archives: zstd is not installed",
+        )
+
+
+class StreamCompressionTestCase(TestCase):
+    def test(self) -> None:
+        chunks = [b"\xfd7z", b"", b"XZ\x00", b"rest", b"of the stream"]
+
+        name, stream = fs.stream_compression(iter(chunks))
+
+        self.assertEqual(name, "xz")
+        self.assertEqual(b"".join(stream), b"".join(chunks))
+
+    def test_empty_stream(self) -> None:
+        name, stream = fs.stream_compression([])
+
+        self.assertIsNone(name)
+        self.assertEqual(list(stream), [])
+
+
+class DecompressorTestCase(TestCase):
+    def test(self) -> None:
+        with mock.patch.object(fs.shutil, "which", return_value="/usr/bin/pigz"):
+            command = fs.decompressor.__wrapped__("gz")
+
+        self.assertEqual(command, ("/usr/bin/pigz", "-dc"))
+
+    def test_not_installed(self) -> None:
+        with mock.patch.object(fs.shutil, "which", return_value=None):
+            self.assertIsNone(fs.decompressor.__wrapped__("zst"))
+
+    def test_unknown_format(self) -> None:
+        self.assertIsNone(fs.decompressor(None))
+
+
+@given(testkit.tmpdir, testkit.publisher)
+class ExtractStreamTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        build = BuildFactory()
+        byte_stream = publisher.jenkins.artifact_builder.get_artifact(build)
+
+        extracted = fixtures.tmpdir / "extracted"
+        fs.extract_stream(byte_stream, extracted)
+
+        for content in Content:
+            path = extracted / content.value
+            self.assertIs(path.is_dir(), True)
+
+    def test_truncated_stream(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        build = BuildFactory()
+        data = publisher.jenkins.artifact_builder.get_artifact(build).getvalue()
+
+        with self.assertRaises((tarfile.TarError, EOFError)):
+            fs.extract_stream([data[: len(data) // 2]], fixtures.tmpdir / "extracted")
+
+
+@given(testkit.tmpdir, testkit.publisher)
+class ExtractStreamWithTestCase(TestCase):
+    """Tests for extract_stream() with an external decompressor"""
+
+    def test(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        data = publisher.jenkins.artifact_builder.get_artifact(
+            BuildFactory()
+        ).getvalue()
+        extracted = fixtures.tmpdir / "extracted"
+
+        with (
+            mock.patch.object(fs, "decompressor", return_value=("gzip", "-dc")),
+            mock.patch.object(fs.subprocess, "Popen", wraps=subprocess.Popen) as popen,
+        ):
+            fs.extract_stream(
+                [data[i : i + 1000] for i in range(0, len(data), 1000)], extracted
+            )
+
+        self.assertEqual(popen.call_args.args, (("gzip", "-dc"),))
+        for content in Content:
+            self.assertIs((extracted / content.value).is_dir(), True)
+
+    def test_reraises_stream_error(self, fixtures: Fixtures) -> None:
+        publisher = fixtures.publisher
+        data = publisher.jenkins.artifact_builder.get_artifact(
+            BuildFactory()
+        ).getvalue()
+
+        def stream() -> Iterator[bytes]:
+            yield data[: len(data) // 2]
+            raise ConnectionError("dropped")
+
+        with mock.patch.object(fs, "decompressor", return_value=("gzip", "-dc")):
+            with self.assertRaises(ConnectionError):
+                fs.extract_stream(stream(), fixtures.tmpdir / "extracted")
+
+    def test_corrupt_tar_stream(self, fixtures: Fixtures) -> None:
+        data = gzip.compress(b"this is not a tar file" * 100_000)
+
+        with mock.patch.object(fs, "decompressor", return_value=("gzip", "-dc")):
+            with self.assertRaises(tarfile.ReadError) as context:
+                fs.extract_stream([data], fixtures.tmpdir / "extracted")
 
-        result = fs.quick_check(fixtures.file, other)
+        self.assertNotIn("gzip exited", str(context.exception))
 
-        self.assertIs(result, False)
+    def test_decompressor_fails(self, fixtures: Fixtures) -> None:
+        data = gzip.compress(b"\0" * 1024)[:-20]
 
-    def test_should_return_false_when_mtimes_differ(self, fixtures: Fixtures) -> None:
-        timestamp2 = ts("2021-10-30 07:10:40")
-        other = str(create_file(fixtures.tmpdir / "bar", b"test", timestamp2))
+        with mock.patch.object(fs, "decompressor", return_value=("gzip", "-dc")):
+            with self.assertRaises(tarfile.ReadError) as context:
+                fs.extract_stream([data], fixtures.tmpdir / "extracted")
+
+        self.assertIn("gzip exited with status 1", str(context.exception))
+
+
+@given(testkit.tmpdir)
+class CountingFilterTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar", "x")
+        counter = fs.LinkCounter()
+
+        fs.extract(path, fixtures.tmpdir / "extracted", fs.counting_filter(counter))
+
+        self.assertEqual((counter.linked, counter.copied), (0, 4))
+
+    def test_skipped_members_are_not_counted(self, fixtures: Fixtures) -> None:
+        path = make_tarfile(fixtures.tmpdir / "test.tar", "x")
+        counter = fs.LinkCounter()
+
+        fs.extract(
+            path,
+            fixtures.tmpdir / "extracted",
+            fs.counting_filter(counter, lambda member, path: None),
+        )
+
+        self.assertEqual(counter.copied, 0)
+
+
+class ByteStreamReaderTestCase(TestCase):
+    def test_read(self) -> None:
+        reader = fs.ByteStreamReader([b"this ", b"", b"is a", b" test"])
+
+        self.assertEqual(reader.read(3), b"thi")
+        self.assertEqual(reader.read(), b"s is a test")
+        self.assertEqual(reader.read(), b"")
+
+    def test_readable(self) -> None:
+        reader = fs.ByteStreamReader([])
+
+        self.assertIs(reader.readable(), True)
+        self.assertIs(reader.seekable(), False)
+
+
+def make_tarball(members: dict[str, bytes], mtime: dt.datetime) -> bytes:
+    tarball = io.BytesIO()
+
+    with tarfile.open(mode="w:gz", fileobj=tarball) as tar_file:
+        for name, content in members.items():
+            tar_info = tarfile.TarInfo(name)
+            tar_info.size = len(content)
+            tar_info.mtime = int(mtime.timestamp())
+            tar_file.addfile(tar_info, io.BytesIO(content))
+
+    return tarball.getvalue()
+
+
+@given(testkit.tmpdir)
+class LinkDestFilterTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        link_dest = tmpdir / "binpkgs" / "babette.1"
+        link_dest.mkdir(parents=True)
+        same = create_file(link_dest / "same", b"same", TIMESTAMP)
+        create_file(link_dest / "changed", b"xxxx", TIMESTAMP)
+        tarball = make_tarball(
+            {
+                "./binpkgs/same": b"same",
+                "binpkgs/changed": b"changed",
+                "binpkgs/new/file": b"new",
+                "other/file": b"other",
+            },
+            TIMESTAMP,
+        )
+        destinations = {"binpkgs": ("binpkgs/babette.2", fs.LinkDest([link_dest]))}
 
-        result = fs.quick_check(fixtures.file, other)
+        fs.extract_stream([tarball], tmpdir, fs.link_dest_filter(destinations))
 
-        self.assertIs(result, False)
+        dst = tmpdir / "binpkgs" / "babette.2"
+        self.assertTrue((dst / "same").samefile(same))
+        self.assertEqual(same.stat().st_nlink, 2)
+        self.assertEqual((dst / "changed").read_bytes(), b"changed")
+        self.assertEqual((dst / "changed").stat().st_nlink, 1)
+        self.assertEqual((dst / "new/file").read_bytes(), b"new")
+        self.assertIs((tmpdir / "other").exists(), False)
 
-    def test_should_return_false_when_sizes_differ(self, fixtures: Fixtures) -> None:
-        other = str(create_file(fixtures.tmpdir / "bar", b"tst", TIMESTAMP))
+    def test_without_link_dest(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        tarball = make_tarball({"binpkgs/file": b"test"}, TIMESTAMP)
+        destinations = {"binpkgs": ("binpkgs/babette.2", fs.LinkDest([]))}
 
-        result = fs.quick_check(fixtures.file, other)
+        fs.extract_stream([tarball], tmpdir, fs.link_dest_filter(destinations))
 
-        self.assertIs(result, False)
+        path = tmpdir / "binpkgs/babette.2/file"
+        self.assertEqual(path.read_bytes(), b"test")
+        self.assertEqual(path.stat().st_mtime, TIMESTAMP.timestamp())
+
+
+@given(testkit.tmpdir)
+class StatIndexTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        root = fixtures.tmpdir / "root"
+        root.joinpath("sub/dir").mkdir(parents=True)
+        file = create_file(root / "foo", b"test", TIMESTAMP)
+        create_file(root / "sub/dir/bar", b"bar", TIMESTAMP)
+        (root / "symlink").symlink_to("foo")
+
+        index = fs.stat_index(root)
+
+        self.assertEqual(set(index), {"foo", "sub/dir/bar"})
+        self.assertEqual(
+            index["foo"],
+            fs.FileStat(4, int(TIMESTAMP.timestamp()) * 10**9, file.stat().st_ino),
+        )
+
+    def test_root_does_not_exist(self, fixtures: Fixtures) -> None:
+        self.assertEqual(fs.stat_index(fixtures.tmpdir / "bogus"), {})
+
+
+@given(testkit.tmpdir)
+class CopyOrLinkTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        for name in ["src", "dst", "link_dest"]:
+            tmpdir.joinpath(name).mkdir()
+        create_file(tmpdir / "link_dest/same", b"same", TIMESTAMP)
+        create_file(tmpdir / "link_dest/changed", b"xxxx", ts("2021-10-30 07:10:40"))
+        copy = fs.copy_or_link(fs.LinkDest([tmpdir / "link_dest"]), tmpdir / "dst")
+
+        for name in ["same", "changed", "new"]:
+            create_file(tmpdir / "src" / name, b"same", TIMESTAMP)
+            copy(str(tmpdir / "src" / name), str(tmpdir / "dst" / name))
+
+        self.assertTrue((tmpdir / "dst/same").samefile(tmpdir / "link_dest/same"))
+        self.assertEqual((tmpdir / "dst/changed").read_bytes(), b"same")
+        self.assertEqual((tmpdir / "dst/changed").stat().st_nlink, 1)
+        self.assertEqual((tmpdir / "dst/new").stat().st_nlink, 1)
+
+
+@given(testkit.tmpdir)
+class LinkDestTestCase(TestCase):
+    def test_find(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        roots = [tmpdir / "first", tmpdir / "second"]
+        for root in roots:
+            root.mkdir()
+            create_file(root / "both", b"both", TIMESTAMP)
+        create_file(roots[1] / "second", b"second", TIMESTAMP)
+        mtime_ns = int(TIMESTAMP.timestamp()) * 10**9
+        link_dest = fs.LinkDest(roots)
+
+        self.assertEqual(link_dest.find("both", 4, mtime_ns), str(roots[0] / "both"))
+        self.assertEqual(
+            link_dest.find("second", 6, mtime_ns), str(roots[1] / "second")
+        )
+        self.assertEqual(link_dest.find("both", 4, mtime_ns + 1), None)
+        self.assertEqual(link_dest.find("bogus", 4, mtime_ns), None)
+
+    def test_bool(self, fixtures: Fixtures) -> None:
+        self.assertIs(bool(fs.LinkDest([])), False)
+        self.assertIs(bool(fs.LinkDest([fixtures.tmpdir])), True)
+
+
+@given(testkit.tmpdir)
+class CopyPathTestCase(TestCase):
+    def make_trees(self, tmpdir: Path) -> tuple[Path, Path, Path]:
+        src = tmpdir / "src"
+        link_dest = tmpdir / "link_dest"
+
+        for path in [src / "sub", link_dest / "sub"]:
+            path.mkdir(parents=True)
+
+        for name in ["same", "sub/same"]:
+            create_file(src / name, b"same", TIMESTAMP)
+            create_file(link_dest / name, b"same", TIMESTAMP)
+        create_file(src / "changed", b"changed", TIMESTAMP)
+        create_file(link_dest / "changed", b"old", TIMESTAMP)
+
+        return src, tmpdir / "dst", link_dest
+
+    def test_without_link_dest_moves_src(self, fixtures: Fixtures) -> None:
+        src, dst, _ = self.make_trees(fixtures.tmpdir)
+
+        fs.copy_path(src, dst, fs.LinkDest([]))
+
+        self.assertIs(src.exists(), False)
+        self.assertEqual((dst / "changed").read_bytes(), b"changed")
+        self.assertIs(fixtures.tmpdir.exists(), True)
+
+    def test_with_workers(self, fixtures: Fixtures) -> None:
+        src, dst, link_dest = self.make_trees(fixtures.tmpdir)
+
+        fs.copy_path(src, dst, fs.LinkDest([link_dest]), workers=4)
+
+        self.assertTrue((dst / "same").samefile(link_dest / "same"))
+        self.assertTrue((dst / "sub/same").samefile(link_dest / "sub/same"))
+        self.assertEqual((dst / "changed").read_bytes(), b"changed")
+        self.assertEqual((dst / "changed").stat().st_nlink, 1)
+
+    def test_workers_preserve_directory_mtimes(self, fixtures: Fixtures) -> None:
+        src, _, link_dest = self.make_trees(fixtures.tmpdir)
+        for path in [src / "sub", src]:
+            os.utime(path, (978307200, 978307200))
+        mtimes = {}
+
+        for workers in [1, 4]:
+            dst = fixtures.tmpdir / f"dst{workers}"
+            fs.copy_path(src, dst, fs.LinkDest([link_dest]), workers=workers)
+            mtimes[workers] = [(dst / name).stat().st_mtime for name in ["", "sub"]]
+
+        self.assertEqual(mtimes[4], mtimes[1])
+        self.assertEqual(mtimes[4], [978307200, 978307200])
+
+    def test_counter(self, fixtures: Fixtures) -> None:
+        src, dst, link_dest = self.make_trees(fixtures.tmpdir)
+        counter = fs.LinkCounter()
+
+        fs.copy_path(src, dst, fs.LinkDest([link_dest]), counter=counter)
+
+        self.assertEqual((counter.linked, counter.copied), (8, 7))
+
+    def test_move_does_not_walk_tree(self, fixtures: Fixtures) -> None:
+        src, dst, _ = self.make_trees(fixtures.tmpdir)
+        counter = fs.LinkCounter()
+
+        with mock.patch.object(fs, "stat_index") as stat_index:
+            fs.copy_path(src, dst, fs.LinkDest([]), counter=counter)
+
+        stat_index.assert_not_called()
+        self.assertEqual((counter.linked, counter.copied), (0, 0))
+        self.assertIs(src.exists(), False)
+
+    def test_cancelled(self, fixtures: Fixtures) -> None:
+        src, dst, link_dest = self.make_trees(fixtures.tmpdir)
+        cancel = threading.Event()
+        cancel.set()
+
+        for workers in [1, 4]:
+            with self.subTest(workers=workers), self.assertRaises(fs.CopyCancelled):
+                fs.copy_path(
+                    src, dst, fs.LinkDest([link_dest]), workers=workers, cancel=cancel
+                )
+
+    def test_error_sets_cancel(self, fixtures: Fixtures) -> None:
+        src, dst, link_dest = self.make_trees(fixtures.tmpdir)
+        cancel = threading.Event()
+
+        with mock.patch.object(fs.shutil, "copy2", side_effect=OSError("full")):
+            with self.assertRaises(OSError):
+                fs.copy_path(
+                    src, dst, fs.LinkDest([link_dest]), workers=4, cancel=cancel
+                )
+
+        self.assertIs(cancel.is_set(), True)
+
+
+@given(testkit.tmpdir)
+class DedupTreeTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        objects = tmpdir / "objects"
+        for name in ["build1", "build2"]:
+            tmpdir.joinpath(name).mkdir()
+            create_file(tmpdir / name / "same", b"same", TIMESTAMP)
+        create_file(tmpdir / "build1/newer", b"same", ts("2021-10-30 07:10:40"))
+
+        fs.dedup_tree(tmpdir / "build1", objects)
+        fs.dedup_tree(tmpdir / "build2", objects)
+
+        self.assertTrue((tmpdir / "build1/same").samefile(tmpdir / "build2/same"))
+        self.assertEqual((tmpdir / "build1/same").stat().st_nlink, 3)
+        self.assertEqual((tmpdir / "build1/newer").stat().st_nlink, 2)
+        self.assertEqual((tmpdir / "build2/same").read_bytes(), b"same")
+        self.assertEqual(
+            (tmpdir / "build2/same").stat().st_mtime, TIMESTAMP.timestamp()
+        )
+        self.assertEqual(
+            list(tmpdir.joinpath("build2").iterdir()), [tmpdir / "build2/same"]
+        )
+
+
+@given(testkit.tmpdir)
+class ReleaseObjectsTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        tmpdir = fixtures.tmpdir
+        objects = tmpdir / "objects"
+        for name in ["build1", "build2"]:
+            tmpdir.joinpath(name).mkdir()
+            create_file(tmpdir / name / "same", b"same", TIMESTAMP)
+            fs.dedup_tree(tmpdir / name, objects)
+        create_file(tmpdir / "build1/unique", b"unique", TIMESTAMP)
+        create_file(tmpdir / "build1/unique-copy", b"unique", TIMESTAMP)
+        fs.dedup_tree(tmpdir / "build1", objects)
+
+        fs.release_objects([tmpdir / "build1"], objects)
+
+        remaining = [path for path in objects.rglob("*") if path.is_file()]
+        self.assertEqual(len(remaining), 1)
+        self.assertTrue(remaining[0].samefile(tmpdir / "build2/same"))
+
+
+@given(testkit.tmpdir)
+class WriteAtomicTestCase(TestCase):
+    def test_does_not_write_through_hard_links(self, fixtures: Fixtures) -> None:
+        path = create_file(fixtures.tmpdir / "file", b"old")
+        os.link(path, fixtures.tmpdir / "link")
+
+        fs.write_atomic(path, b"new")
+
+        self.assertEqual(path.read_bytes(), b"new")
+        self.assertEqual((fixtures.tmpdir / "link").read_bytes(), b"old")
+        self.assertEqual(
+            sorted(fixtures.tmpdir.iterdir()), [path, path.parent / "link"]
+        )
+
+
+@given(testkit.tmpdir)
+class RemoveTreeTestCase(TestCase):
+    def test(self, fixtures: Fixtures) -> None:
+        path = fixtures.tmpdir / "tree"
+        path.joinpath("sub").mkdir(parents=True)
+        create_file(path / "sub/file", b"test")
+
+        fs.remove_tree(path)
+
+        self.assertIs(path.exists(), False)
+
+    def test_without_ionice(self, fixtures: Fixtures) -> None:
+        path = fixtures.tmpdir / "tree"
+        path.mkdir()
+
+        with mock.patch.object(fs.shutil, "which", return_value=None):
+            with mock.patch.object(fs.subprocess, "run") as run:
+                fs.remove_tree(path)
+
+        run.assert_not_called()
+        self.assertIs(path.exists(), False)
+
+
+class PrefetchTestCase(TestCase):
+    def test(self) -> None:
+        chunks = [b"this", b"that", b"the other"]
+
+        self.assertEqual(list(fs.prefetch(iter(chunks), maxsize=1)), chunks)
+
+    def test_reads_ahead(self) -> None:
+        produced: list[bytes] = []
+        done = threading.Event()
+
+        def stream() -> Iterator[bytes]:
+            for chunk in [b"this", b"that", b"the other"]:
+                produced.append(chunk)
+                yield chunk
+            done.set()
+
+        prefetched = fs.prefetch(stream(), maxsize=4)
+
+        self.assertEqual(next(prefetched), b"this")
+        self.assertTrue(done.wait(10))
+        self.assertEqual(len(produced), 3)
+
+    def test_reraises_producer_exception(self) -> None:
+        def stream() -> Iterator[bytes]:
+            yield b"this"
+            raise ConnectionError("Disconnected")
+
+        prefetched = fs.prefetch(stream())
+
+        self.assertEqual(next(prefetched), b"this")
+        with self.assertRaises(ConnectionError):
+            next(prefetched)
+
+    def test_stops_producer_when_consumer_stops(self) -> None:
+        produced = 0
+
+        def stream() -> Iterator[bytes]:
+            nonlocal produced
+            while True:
+                produced += 1
+                yield b"x"
+
+        prefetched = fs.prefetch(stream(), maxsize=2)
+        next(prefetched)
+        prefetched.close()
+        time.sleep(0.3)
+        count = produced
+        time.sleep(0.3)
+
+        self.assertEqual(produced, count)
+
+
+class HashedTestCase(TestCase):
+    def test(self) -> None:
+        chunks = [b"this", b"that", b"the other"]
+        digest = hashlib.sha256()
+
+        self.assertEqual(list(fs.hashed(chunks, digest)), chunks)
+        self.assertEqual(
+            digest.hexdigest(), hashlib.sha256(b"".join(chunks)).hexdigest()
+        )
+
+    def test_drain(self) -> None:
+        digest = hashlib.sha256()
+        stream = fs.hashed([b"this", b"that"], digest)
+        next(stream)
+
+        fs.drain(stream)
+
+        self.assertEqual(digest.hexdigest(), hashlib.sha256(b"thisthat").hexdigest())
+
+    def test_read_chunks(self) -> None:
+        fileobj = io.BytesIO(b"thisthat!")
+
+        self.assertEqual(list(fs.read_chunks(fileobj, 4)), [b"this", b"that", b"!"])
 
 
 @given(testkit.tmpdir)
@@ -103,28 +700,16 @@ def test_raise_exception_when_symlink_target_exists_and_not_symlink(
 
         self.assertEqual(exception.args, (f"{target} exists but is not a symlink",))
 
+    def test_replaces_existing_symlink(self, fixtures: Fixtures) -> None:
+        target = fixtures.tmpdir / "target"
+        target.symlink_to("old")
 
-@given(symlink=lambda fixtures: fixtures.tmpdir / "symlink")
-@given(target=lambda fixtures: create_file(fixtures.tmpdir / "target"))
-@given(testkit.tmpdir)
-class CheckSymlink(TestCase):
-    def test_good_symlink(self, fixtures: Fixtures) -> None:
-        os.symlink(fixtures.target, fixtures.symlink)
-
-        self.assertIs(
-            fs.check_symlink(str(fixtures.symlink), str(fixtures.target)), True
-        )
-
-    def test_symlink_points_to_different_target(self, fixtures: Fixtures) -> None:
-        os.symlink(fixtures.target, fixtures.symlink)
-        other = create_file(fixtures.tmpdir / "other")
-
-        self.assertIs(fs.check_symlink(str(fixtures.symlink), str(other)), False)
-
-    def test_dangling_symlink(self, fixtures: Fixtures) -> None:
-        os.symlink("bogus", fixtures.symlink)
+        with mock.patch.object(fs.os, "unlink") as unlink:
+            fs.symlink("new", str(target))
 
-        self.assertIs(fs.check_symlink(str(fixtures.symlink), "bogus"), False)
+        unlink.assert_not_called()
+        self.assertEqual(os.readlink(target), "new")
+        self.assertEqual(os.listdir(fixtures.tmpdir), ["target"])
 
 
 @given(testkit.tmpdir)
@@ -2,7 +2,7 @@
 
 # pylint: disable=missing-docstring,unused-argument
 import datetime as dt
-from unittest import TestCase
+from unittest import TestCase, mock
 from zoneinfo import ZoneInfo
 
 from unittest_fixtures import Fixtures, given, where
@@ -82,3 +82,28 @@ def test(self) -> None:
 class AsDateAndTimeTests(TestCase):
     def test(self) -> None:
         self.assertEqual(time.as_date_and_time(NOW), "Jan 9 21:05")
+
+
+class StageTimerTests(TestCase):
+    def test(self) -> None:
+        timer = time.StageTimer()
+
+        with mock.patch.object(time.timelib, "perf_counter", side_effect=[0, 2, 2, 3]):
+            with timer("download"):
+                pass
+            with timer("extract"):
+                pass
+
+        self.assertEqual(timer.stages, {"download": 2, "extract": 1})
+        self.assertEqual(str(timer), "download: 2.00s, extract: 1.00s")
+
+    def test_accumulates(self) -> None:
+        timer = time.StageTimer()
+
+        with mock.patch.object(time.timelib, "perf_counter", side_effect=[0, 2, 5, 6]):
+            with timer("copy"):
+                pass
+            with timer("copy"):
+                pass
+
+        self.assertEqual(timer.stages, {"copy": 3})
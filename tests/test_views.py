@@ -446,6 +446,18 @@ def test_when_pkg_does_not_exist(self, fixtures: Fixtures) -> None:
 
         self.assertEqual(response.status_code, 404, response.content)
 
+    def test_when_package_name_does_not_match(self, fixtures: Fixtures) -> None:
+        package = fixtures.artifacts["latest"]
+
+        client = fixtures.client
+        url = (
+            f"/machines/lighthouse/builds/{package.build_id}/"
+            "packages/sys-libs/bogus/pam-1.5.3-1"
+        )
+        response = client.get(url)
+
+        self.assertEqual(response.status_code, 404, response.content)
+
 
 @given(testkit.plugins, testkit.client)
 class AboutViewTests(TestCase):
@@ -15,6 +15,7 @@
 import gbp_testkit.fixtures as testkit
 from gentoo_build_publisher.records import build_records
 from gentoo_build_publisher.settings import Settings
+from gentoo_build_publisher.storage import PartialArtifactError
 from gentoo_build_publisher.types import Build
 from gentoo_build_publisher.worker import (
     Worker,
@@ -124,6 +125,47 @@ def test_should_delete_db_model_when_download_fails(
 
         self.assertFalse(records.exists(Build("oscar", "197")))
 
+    def test_keeps_partial_artifact_when_failure_is_retryable(
+        self, fixtures: Fixtures
+    ) -> None:
+        build_publisher = "gentoo_build_publisher.build_publisher.BuildPublisher"
+
+        for error, keep_partial in [(HTTPError(), True), (RuntimeError(), False)]:
+            with (
+                self.subTest(error=error),
+                mock.patch(f"{build_publisher}.pull", side_effect=error),
+                mock.patch(f"{build_publisher}.delete") as delete,
+                redirect_stderr(io.StringIO()),
+            ):
+                try:
+                    fixtures.worker.run(
+                        tasks.pull_build, "oscar.197", note=None, tags=None
+                    )
+                except type(error):
+                    pass
+
+                delete.assert_called_once_with(
+                    Build("oscar", "197"), keep_partial=keep_partial
+                )
+
+    def test_does_not_delete_build_pulled_by_another_worker(
+        self, fixtures: Fixtures
+    ) -> None:
+        build_publisher = "gentoo_build_publisher.build_publisher.BuildPublisher"
+        error = PartialArtifactError(Build("oscar", "197"), "in use by another pull")
+
+        with (
+            mock.patch(f"{build_publisher}.pull", side_effect=error),
+            mock.patch(f"{build_publisher}.delete") as delete,
+            redirect_stderr(io.StringIO()),
+        ):
+            try:
+                fixtures.worker.run(tasks.pull_build, "oscar.197", note=None, tags=None)
+            except PartialArtifactError:
+                pass
+
+        delete.assert_not_called()
+
 
 @uf.params(backend=("celery", "rq", "sync", "thread"))
 @uf.given(worker_fixture, delete=testkit.patch)
@@ -139,6 +181,20 @@ def test_should_delete_the_build(self, fixtures: Fixtures) -> None:
         fixtures.delete.assert_called_once_with(Build("zulu", "56"))
 
 
+@uf.params(backend=("celery", "rq", "sync", "thread"))
+@uf.given(worker_fixture, empty_trash=testkit.patch)
+@uf.where(empty_trash__target="gentoo_build_publisher.publisher.storage.empty_trash")
+@uf.where(worker__name=uf.Param(lambda fixtures: fixtures.backend))
+class EmptyTrashTestCase(TestCase):
+    """Unit tests for tasks.empty_trash"""
+
+    def test_should_empty_the_trash(self, fixtures: Fixtures) -> None:
+        fixtures.empty_trash.reset_mock()
+        fixtures.worker.run(tasks.empty_trash)
+
+        fixtures.empty_trash.assert_called_once_with()
+
+
 @uf.given(testkit.environ, testkit.settings)
 @uf.where(
     environ={